@@ -0,0 +1,195 @@
+"""
+Item analysis for quizzes: difficulty, discrimination, distractors and
+reliability.
+
+Every statistic reported is a function of a few running sums per question,
+per choice and over submission totals, so the analysis is kept as those sums
+rather than as a student × question matrix. The sums are cached under the
+course's ``content_version``. Each read folds in only the submissions saved
+since the cached state, with one query, then derives the report in time
+proportional to the number of questions, however many attempts the quiz has.
+
+New rows are found by submission id, above the highest id already folded.
+Ids are allocated before commit, so a submission can become visible after
+one with a higher id. The state also records how many first attempts it has
+folded, answered or not; that is checked on every read against an indexed
+count of the quiz's first attempts up to the folded id, and the sums are
+rebuilt when it disagrees (which also drops deleted submissions).
+
+Only first attempts and auto-graded questions are analysed: later attempts
+are no longer independent of the questions, and short answers are scored by
+hand after submission.
+"""
+from itertools import groupby
+from math import sqrt
+
+from django.core.cache import cache
+
+from .grading import AUTO_GRADED_TYPES, get_answer_key
+from .models import QuizSubmission
+
+ANALYSIS_TIMEOUT = 60 * 60 * 24
+FOLD_CHUNK_SIZE = 2000
+
+# Per question: responses, correct, Σ points, Σ points², Σ total, Σ total²,
+# Σ correct × total, Σ points × total.
+N, CORRECT, POINTS, POINTS_SQ, TOTAL, TOTAL_SQ, CORRECT_TOTAL, POINTS_TOTAL = range(8)
+
+
+def analysis_cache_key(quiz):
+    return f'quiz-item-analysis:{quiz.pk}:{quiz.module.course.content_version}'
+
+
+def empty_state():
+    return {
+        'through': 0,
+        'folded': 0,
+        'submissions': 0,
+        'total': 0.0,
+        'total_sq': 0.0,
+        'questions': {},
+        'choices': {},
+    }
+
+
+def first_attempts(quiz):
+    return QuizSubmission.objects.filter(quiz=quiz, attempt_number=1)
+
+
+def fold_submissions(quiz, state):
+    """
+    Add the first attempts saved after ``state['through']`` to ``state``.
+
+    Submissions are read joined to their answers, so an attempt without any
+    auto-graded answers still moves the watermark and the folded count.
+    """
+    analysed = {question.id for question in get_answer_key(quiz) if question.question_type in AUTO_GRADED_TYPES}
+    rows = (
+        first_attempts(quiz)
+        .filter(pk__gt=state['through'])
+        .order_by('pk')
+        .values_list(
+            'pk', 'answers__question_id', 'answers__is_correct', 'answers__points_awarded',
+            'answers__selected_choice_id',
+        )
+        .iterator(chunk_size=FOLD_CHUNK_SIZE)
+    )
+    questions, choices = state['questions'], state['choices']
+    for submission_id, answers in groupby(rows, key=lambda row: row[0]):
+        state['through'] = submission_id
+        state['folded'] += 1
+        answers = [row for row in answers if row[1] in analysed]
+        if not answers:
+            continue
+        total = float(sum(row[3] for row in answers))
+        state['submissions'] += 1
+        state['total'] += total
+        state['total_sq'] += total * total
+        for _, question_id, is_correct, points, choice_id in answers:
+            points = float(points)
+            sums = questions.setdefault(question_id, [0] * 8)
+            sums[N] += 1
+            sums[POINTS] += points
+            sums[POINTS_SQ] += points * points
+            sums[TOTAL] += total
+            sums[TOTAL_SQ] += total * total
+            sums[POINTS_TOTAL] += points * total
+            if is_correct:
+                sums[CORRECT] += 1
+                sums[CORRECT_TOTAL] += total
+            if choice_id is not None:
+                choices[choice_id] = choices.get(choice_id, 0) + 1
+    return state
+
+
+def get_state(quiz):
+    """The cached sums, brought up to date; ``quiz.module.course`` should be selected."""
+    key = analysis_cache_key(quiz)
+    cached = cache.get(key)
+    if cached is not None and _folded_count(quiz, cached['through']) != cached.get('folded'):
+        cached = None
+    state = cached or empty_state()
+    through = state['through']
+    fold_submissions(quiz, state)
+    if cached is None or state['through'] != through:
+        cache.set(key, state, ANALYSIS_TIMEOUT)
+    return state
+
+
+def analyse_quiz(quiz):
+    """The item-analysis report for ``quiz``."""
+    state = get_state(quiz)
+    submissions = state['submissions']
+    questions = []
+    item_variances = []
+    for question in get_answer_key(quiz):
+        if question.question_type not in AUTO_GRADED_TYPES:
+            continue
+        sums = state['questions'].get(question.id, [0] * 8)
+        responses = sums[N]
+        counts = [(choice_id, state['choices'].get(choice_id, 0)) for choice_id in sorted(question.choice_ids)]
+        item_variances.append(_variance(sums[POINTS], sums[POINTS_SQ], responses))
+        questions.append({
+            'question': question.id,
+            'responses': responses,
+            'difficulty': _round(sums[CORRECT] / responses) if responses else None,
+            'discrimination': _round(_point_biserial(sums)),
+            'unanswered': responses - sum(count for _, count in counts),
+            'choices': [
+                {
+                    'choice': choice_id,
+                    'is_correct': choice_id in question.correct_choice_ids,
+                    'count': count,
+                    'rate': _round(count / responses) if responses else None,
+                }
+                for choice_id, count in counts
+            ],
+        })
+
+    return {
+        'quiz': quiz.pk,
+        'submissions': submissions,
+        'mean_points': _round(state['total'] / submissions) if submissions else None,
+        'cronbach_alpha': _round(_cronbach_alpha(item_variances, state)),
+        'questions': questions,
+    }
+
+
+def _folded_count(quiz, through):
+    """How many first attempts now have an id up to ``through``."""
+    return first_attempts(quiz).filter(pk__lte=through).count()
+
+
+def _variance(total, total_sq, n):
+    if not n:
+        return 0.0
+    mean = total / n
+    return max(total_sq / n - mean * mean, 0.0)
+
+
+def _point_biserial(sums):
+    """Correlation of answering correctly with the score on the other questions."""
+    n = sums[N]
+    if not n:
+        return None
+    rest = sums[TOTAL] - sums[POINTS]
+    rest_sq = sums[TOTAL_SQ] - 2 * sums[POINTS_TOTAL] + sums[POINTS_SQ]
+    # Points are only awarded for a correct answer, so Σ correct × points = Σ points.
+    correct_rest = sums[CORRECT_TOTAL] - sums[POINTS]
+    mean_correct = sums[CORRECT] / n
+    variance = mean_correct * (1 - mean_correct) * _variance(rest, rest_sq, n)
+    if variance <= 0:
+        return None
+    return (correct_rest / n - mean_correct * rest / n) / sqrt(variance)
+
+
+def _cronbach_alpha(item_variances, state):
+    items = len(item_variances)
+    total_variance = _variance(state['total'], state['total_sq'], state['submissions'])
+    if items < 2 or total_variance <= 0:
+        return None
+    return items / (items - 1) * (1 - sum(item_variances) / total_variance)
+
+
+def _round(value):
+    return None if value is None else round(value, 4)
@@ -0,0 +1,73 @@
+"""
+Set-based writes to assignment submissions.
+
+``review_submissions`` applies a grader's batch of grades and statuses: the
+submissions the grader may review are read with one joined query and
+written back with one ``bulk_update``, instead of a fetch, three lazy
+foreign-key loads and a save per submission. ``bulk_update`` sends no
+signals, so the graded cells of the gradebook are refreshed here.
+
+``refresh_lateness`` recomputes ``is_late`` for every submission to the
+given assignments in one ``UPDATE``; ``courses.signals`` runs it when an
+assignment's due date changes.
+"""
+from django.db import transaction
+from django.db.models import Case, OuterRef, Subquery, Value, When
+from django.utils import timezone
+
+from . import gradebook
+from .models import Assignment, AssignmentSubmission
+
+REVIEW_FIELDS = ('grade', 'feedback', 'status')
+
+
+def reviewable_submissions(user):
+    queryset = AssignmentSubmission.objects.all()
+    if user.role != 'admin':
+        queryset = queryset.filter(assignment__module__course__instructor=user)
+    return queryset
+
+
+@transaction.atomic
+def review_submissions(user, items):
+    """
+    Apply ``items`` (dicts with ``id`` and any of ``grade``, ``feedback`` and
+    ``status``) as ``user``'s review.
+
+    A grade without a status marks the submission graded, as the single
+    ``grade`` action does. Returns one result dict per item, in order;
+    submissions that do not exist or that ``user`` may not review are
+    reported as not found and left unchanged.
+    """
+    submissions = reviewable_submissions(user).only('id', *REVIEW_FIELDS).in_bulk([item['id'] for item in items])
+    now = timezone.now()
+    updated, fields, results = [], {'reviewed_at', 'reviewed_by'}, []
+    for item in items:
+        submission = submissions.get(item['id'])
+        if submission is None:
+            results.append({'id': item['id'], 'ok': False, 'error': 'Not found.'})
+            continue
+        changes = {name: item[name] for name in REVIEW_FIELDS if name in item}
+        if 'grade' in changes:
+            changes.setdefault('status', 'graded')
+        for name, value in changes.items():
+            setattr(submission, name, value)
+        submission.reviewed_at = now
+        submission.reviewed_by = user
+        fields.update(changes)
+        updated.append(submission)
+        grade = None if submission.grade is None else str(submission.grade)
+        results.append({'id': submission.pk, 'ok': True, 'grade': grade, 'status': submission.status})
+    if updated:
+        AssignmentSubmission.objects.bulk_update(updated, sorted(fields))
+        gradebook.refresh_assignment_entries([submission.pk for submission in updated])
+    return results
+
+
+def refresh_lateness(assignment_ids):
+    """Set ``is_late = submitted_at > due_date`` on the submissions to ``assignment_ids``."""
+    due_date = Assignment.objects.filter(pk=OuterRef('assignment_id')).values('due_date')
+    return AssignmentSubmission.objects.filter(assignment_id__in=assignment_ids).update(
+        # No due date compares as NULL, which falls through to not late.
+        is_late=Case(When(submitted_at__gt=Subquery(due_date), then=Value(True)), default=Value(False))
+    )
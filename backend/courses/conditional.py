@@ -0,0 +1,95 @@
+"""
+Conditional GET support for course content reads.
+
+ETags are built from the inputs of a response rather than its rendered body:
+the ``Course.content_version`` of every row on the page, the pagination
+metadata, and the per-user state the serializer overlays. All of these are
+loaded before serialization, so a 304 is answered without running the
+serializer.
+"""
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+from . import outline
+
+
+class ConditionalReadMixin:
+    """
+    Adds ETag handling to ``retrieve`` and ``list``, and Last-Modified to
+    ``retrieve``.
+
+    ``course_path`` is the attribute path from the view's model to its
+    ``Course`` (empty for courses themselves); querysets should select it.
+    Last-Modified only reflects course content, so it is sent to anonymous
+    clients only; signed-in clients revalidate with the ETag, which also
+    covers their own state. Lists never send it: a row leaving the list
+    (unpublished or deleted) does not move the newest timestamp of the rows
+    left, while the ETag covers which rows are on the page.
+    """
+
+    course_path = ''
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        context = self.get_serializer_context()
+
+        def render():
+            return Response(self.get_serializer_class()(instance, context=context).data)
+
+        return self._conditional([instance], context, render, dated=True)
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        rows = list(queryset) if page is None else page
+        context = self.get_serializer_context()
+        meta = None
+        if page is not None:
+            meta = tuple(self.get_paginated_response([]).data.items())
+
+        def render():
+            data = self.get_serializer_class()(rows, many=True, context=context).data
+            return Response(data) if page is None else self.get_paginated_response(data)
+
+        return self._conditional(rows, context, render, meta)
+
+    def get_user_state(self, rows, context):
+        """Per-user inputs to the payload; ``None`` for anonymous requests."""
+        user = self.request.user
+        if not user.is_authenticated:
+            return None
+        if 'completed_lesson_ids' not in context:
+            context['completed_lesson_ids'] = outline.completed_lesson_ids(user)
+        return (user.pk, tuple(sorted(context['completed_lesson_ids'])))
+
+    def _course_of(self, row):
+        for attr in filter(None, self.course_path.split('__')):
+            row = getattr(row, attr)
+        return row
+
+    def _conditional(self, rows, context, render, meta=None, dated=False):
+        courses = [self._course_of(row) for row in rows]
+        content = tuple((row.pk, course.pk, course.content_version) for row, course in zip(rows, courses))
+        user_state = self.get_user_state(rows, context)
+
+        last_modified = None
+        if dated and user_state is None and courses:
+            last_modified = max(course.content_updated_at for course in courses).timestamp()
+        digest = hashlib.sha1(repr((content, meta, user_state)).encode()).hexdigest()
+        etag = f'"{digest}"'
+
+        response = get_conditional_response(self.request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = render()
+        else:
+            response = Response(status=response.status_code)
+
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        patch_vary_headers(response, ('Authorization',))
+        patch_cache_control(response, no_cache=True, private=user_state is not None)
+        return response
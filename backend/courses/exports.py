@@ -0,0 +1,95 @@
+"""
+CSV exports of submissions and grades.
+
+Each export is a generator of CSV lines for ``StreamingHttpResponse``. Rows
+are read with ``values_list(...).iterator(chunk_size=...)``, so no model
+instances are built and memory stays flat however many rows there are.
+Text that a spreadsheet would run as a formula is prefixed with ``'``.
+"""
+import csv
+
+from django.http import StreamingHttpResponse
+
+from . import gradebook
+
+CHUNK_SIZE = 2000
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+ASSIGNMENT_SUBMISSION_COLUMNS = (
+    ('id', 'id'),
+    ('course_id', 'assignment__module__course_id'),
+    ('assignment_id', 'assignment_id'),
+    ('assignment', 'assignment__title'),
+    ('student_id', 'student_id'),
+    ('student', 'student__username'),
+    ('submitted_at', 'submitted_at'),
+    ('is_late', 'is_late'),
+    ('status', 'status'),
+    ('grade', 'grade'),
+    ('max_points', 'assignment__max_points'),
+    ('reviewed_at', 'reviewed_at'),
+    ('reviewed_by', 'reviewed_by__username'),
+)
+QUIZ_SUBMISSION_COLUMNS = (
+    ('id', 'id'),
+    ('course_id', 'quiz__module__course_id'),
+    ('quiz_id', 'quiz_id'),
+    ('quiz', 'quiz__title'),
+    ('student_id', 'student_id'),
+    ('student', 'student__username'),
+    ('attempt_number', 'attempt_number'),
+    ('submitted_at', 'submitted_at'),
+    ('score', 'score'),
+    ('passed', 'passed'),
+)
+
+
+class Echo:
+    """A file-like object whose ``write`` returns the line instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(header, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow([_cell(value) for value in header])
+    for row in rows:
+        yield writer.writerow([_cell(value) for value in row])
+
+
+def export_queryset(queryset, columns):
+    """CSV lines for ``queryset`` with ``columns`` (``(heading, lookup)`` pairs), in id order."""
+    rows = queryset.order_by('pk').values_list(*(lookup for _, lookup in columns)).iterator(chunk_size=CHUNK_SIZE)
+    return csv_lines([heading for heading, _ in columns], rows)
+
+
+def export_assignment_submissions(queryset):
+    return export_queryset(queryset, ASSIGNMENT_SUBMISSION_COLUMNS)
+
+
+def export_quiz_submissions(queryset):
+    return export_queryset(queryset, QUIZ_SUBMISSION_COLUMNS)
+
+
+def export_gradebook(course):
+    """One line per enrolled student: their score per graded item and weighted total."""
+    items = gradebook.gradebook_items(course)
+    header = ['student_id', 'student'] + [f"{item['title']} ({item['key']})" for item in items] + ['total']
+    rows = (
+        [student_id, username] + [scores.get(item['key']) for item in items] + [total]
+        for student_id, username, scores, total in gradebook.iter_gradebook(course, items, CHUNK_SIZE)
+    )
+    return csv_lines(header, rows)
+
+
+def csv_response(lines, filename):
+    response = StreamingHttpResponse(lines, content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def _cell(value):
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return f"'{value}"
+    return value
@@ -0,0 +1,109 @@
+"""
+Quizzes generated from a course's question bank.
+
+A generator request names strata (bank tags) and how many questions to draw
+from each. The candidate ids of every stratum come from the
+``QuestionBankTag`` index in one query and are sampled in Python, so no
+``ORDER BY RANDOM()`` scan runs. An entry tagged with several strata is
+drawn at most once. The drawn entries are copied into the quiz with one
+``bulk_create`` per table.
+
+With ``variants``, a stratum copies a larger ``pool`` and each attempt is
+shown ``count`` of its questions. The draw is seeded by the quiz, student
+and attempt number, so it can be repeated when the attempt is graded
+without being stored.
+"""
+import random
+
+from django.db import transaction
+from rest_framework import serializers
+
+from . import quizzes
+from .grading import get_answer_key
+from .models import Quiz, QuestionBankEntry, QuestionBankTag
+
+
+def stratum_pools(course, tags):
+    """``{tag: [entry ids]}`` for the course's bank entries carrying each tag, in id order."""
+    pools = {tag: [] for tag in tags}
+    rows = (
+        QuestionBankTag.objects.filter(name__in=tags, entry__course=course)
+        .order_by('name', 'entry')
+        .values_list('name', 'entry')
+    )
+    for tag, entry_id in rows:
+        pools[tag].append(entry_id)
+    return pools
+
+
+def draw_entries(course, strata, seed=None, variants=False):
+    """
+    ``[(tag, entry_id)]`` sampled for ``strata`` (``tag``, ``count`` and
+    optionally ``pool`` dicts), in stratum order.
+    """
+    rng = random.Random(seed)
+    pools = stratum_pools(course, [stratum['tag'] for stratum in strata])
+    drawn, used = [], set()
+    for stratum in strata:
+        tag = stratum['tag']
+        size = (stratum.get('pool') or stratum['count']) if variants else stratum['count']
+        available = [entry_id for entry_id in pools[tag] if entry_id not in used]
+        if len(available) < size:
+            raise serializers.ValidationError(
+                {'strata': [f'{size} questions tagged {tag!r} requested; the bank has {len(available)} more.']}
+            )
+        picked = rng.sample(available, size)
+        used.update(picked)
+        drawn += [(tag, entry_id) for entry_id in picked]
+    return drawn
+
+
+@transaction.atomic
+def generate_quiz(module, strata, seed=None, variants=False, **quiz_fields):
+    """Create a quiz in ``module`` from questions drawn out of its course's bank."""
+    drawn = draw_entries(module.course, strata, seed=seed, variants=variants)
+    entries = QuestionBankEntry.objects.in_bulk([entry_id for _, entry_id in drawn])
+    variant_strata = {stratum['tag']: stratum['count'] for stratum in strata} if variants else None
+    quiz = Quiz.objects.create(module=module, variant_strata=variant_strata, **quiz_fields)
+    quizzes.create_questions(
+        quiz,
+        [
+            {
+                'prompt': entries[entry_id].prompt,
+                'question_type': entries[entry_id].question_type,
+                'points': entries[entry_id].points,
+                'order': order,
+                'stratum': tag,
+                'choices': _choices(entries[entry_id]),
+            }
+            for order, (tag, entry_id) in enumerate(drawn, start=1)
+        ],
+    )
+    return quiz
+
+
+def variant_question_ids(quiz, student_id, attempt_number):
+    """
+    The ids of the questions shown on a student's attempt, or ``None`` when
+    every attempt sees the whole quiz. Questions without a stratum are
+    always shown. ``quiz.module.course`` should be selected.
+    """
+    if not quiz.variant_strata:
+        return None
+    by_stratum = {}
+    for question in get_answer_key(quiz):
+        by_stratum.setdefault(question.stratum, []).append(question.id)
+    shown = set(by_stratum.pop('', []))
+    rng = random.Random(f'{quiz.pk}:{student_id}:{attempt_number}')
+    for stratum, question_ids in sorted(by_stratum.items()):
+        count = min(quiz.variant_strata.get(stratum, len(question_ids)), len(question_ids))
+        shown.update(rng.sample(question_ids, count))
+    return shown
+
+
+def _choices(entry):
+    return [
+        {'text': str(choice.get('text', ''))[:255], 'is_correct': bool(choice.get('is_correct'))}
+        for choice in entry.choices or []
+        if isinstance(choice, dict)
+    ]
@@ -0,0 +1,214 @@
+"""
+The course gradebook: one ``GradebookEntry`` per student and graded item.
+
+Entries are refreshed from their source rows whenever a submission is made,
+graded, regraded or deleted, and an assignment's entries when its
+``max_points`` change (see ``courses.signals``; bulk writes call in
+directly). Each refresh reads the affected cells with one aggregate query
+and writes them with one upsert, so serving the gradebook never scans
+submissions. The item list (assignments weighted by ``max_points``, quizzes
+by their question points) is cached under the course's ``content_version``.
+A page of the matrix then takes one query for its students and one for
+their entries.
+"""
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+
+from django.core.cache import cache
+from django.db.models import Max, Q, Sum
+from django.db.models.functions import Coalesce
+
+from .models import Assignment, AssignmentSubmission, Enrollment, GradebookEntry, Quiz, QuizSubmission
+
+ITEMS_TIMEOUT = 60 * 60 * 24
+ENTRY_FIELDS = ('score', 'updated_at')
+
+
+def assignment_score(grade, max_points):
+    if grade is None or not max_points:
+        return None
+    return round(Decimal(grade) * 100 / max_points, 2)
+
+
+def refresh_assignment_entries(submission_ids):
+    """Upsert the entries of the given assignment submissions."""
+    rows = AssignmentSubmission.objects.filter(pk__in=submission_ids).values_list(
+        'assignment_id', 'student_id', 'assignment__module__course_id', 'grade', 'assignment__max_points'
+    )
+    GradebookEntry.objects.bulk_create(
+        [
+            GradebookEntry(
+                course_id=course_id,
+                student_id=student_id,
+                assignment_id=assignment_id,
+                score=assignment_score(grade, max_points),
+            )
+            for assignment_id, student_id, course_id, grade, max_points in rows
+        ],
+        update_conflicts=True,
+        unique_fields=['student', 'assignment'],
+        update_fields=ENTRY_FIELDS,
+    )
+
+
+def refresh_assignment(assignment_id):
+    """Rescale every entry of an assignment, after its ``max_points`` changed."""
+    refresh_assignment_entries(AssignmentSubmission.objects.filter(assignment_id=assignment_id).values('pk'))
+
+
+def remove_assignment_entry(assignment_id, student_id):
+    GradebookEntry.objects.filter(assignment_id=assignment_id, student_id=student_id).delete()
+
+
+def refresh_quiz_entries(attempts):
+    """Upsert the best scores of ``(quiz_id, student_id)`` pairs; pairs with no attempts left are removed."""
+    attempts = set(attempts)
+    if not attempts:
+        return
+    best = (
+        QuizSubmission.objects.filter(
+            reduce(or_, (Q(quiz_id=quiz_id, student_id=student_id) for quiz_id, student_id in attempts))
+        )
+        .values('quiz_id', 'student_id', 'quiz__module__course_id')
+        .annotate(best=Max('score'))
+        .order_by()
+    )
+    entries = [
+        GradebookEntry(
+            course_id=row['quiz__module__course_id'],
+            student_id=row['student_id'],
+            quiz_id=row['quiz_id'],
+            score=row['best'],
+        )
+        for row in best
+    ]
+    GradebookEntry.objects.bulk_create(
+        entries, update_conflicts=True, unique_fields=['student', 'quiz'], update_fields=ENTRY_FIELDS
+    )
+    gone = attempts - {(entry.quiz_id, entry.student_id) for entry in entries}
+    if gone:
+        GradebookEntry.objects.filter(
+            reduce(or_, (Q(quiz_id=quiz_id, student_id=student_id) for quiz_id, student_id in gone))
+        ).delete()
+
+
+def rebuild_gradebook(course_ids=None):
+    """
+    Recreate the entries of ``course_ids`` (every course by default) from
+    the submission tables and return how many there are.
+    """
+    entries = GradebookEntry.objects.all()
+    assignment_submissions = AssignmentSubmission.objects.all()
+    quiz_submissions = QuizSubmission.objects.all()
+    if course_ids is not None:
+        entries = entries.filter(course_id__in=course_ids)
+        assignment_submissions = assignment_submissions.filter(assignment__module__course_id__in=course_ids)
+        quiz_submissions = quiz_submissions.filter(quiz__module__course_id__in=course_ids)
+    entries.delete()
+
+    submission_ids = assignment_submissions.values_list('pk', flat=True).iterator(chunk_size=1000)
+    _in_batches(submission_ids, refresh_assignment_entries)
+    attempts = quiz_submissions.order_by().values_list('quiz_id', 'student_id').distinct().iterator(chunk_size=1000)
+    _in_batches(attempts, refresh_quiz_entries, size=200)
+    return entries.count()
+
+
+def gradebook_items(course):
+    """The course's graded items in outline order, with their weights; ``course`` needs ``content_version``."""
+    key = f'gradebook-items:{course.pk}:{course.content_version}'
+    items = cache.get(key)
+    if items is None:
+        assignments = (
+            Assignment.objects.filter(module__course=course)
+            .order_by('module__order', 'due_date', 'pk')
+            .values_list('pk', 'title', 'max_points')
+        )
+        quizzes = (
+            Quiz.objects.filter(module__course=course)
+            .order_by('module__order', 'created_at', 'pk')
+            .annotate(points=Coalesce(Sum('questions__points'), 0))
+            .values_list('pk', 'title', 'points')
+        )
+        items = [
+            {'key': f'assignment:{pk}', 'type': 'assignment', 'id': pk, 'title': title, 'weight': weight}
+            for pk, title, weight in assignments
+        ] + [
+            {'key': f'quiz:{pk}', 'type': 'quiz', 'id': pk, 'title': title, 'weight': weight}
+            for pk, title, weight in quizzes
+        ]
+        cache.set(key, items, ITEMS_TIMEOUT)
+    return items
+
+
+def gradebook_rows(course, students, items):
+    """One row per student: their scores by item key and their weighted total."""
+    scores = {student.pk: {} for student in students}
+    entries = GradebookEntry.objects.filter(course=course, student__in=list(scores)).values_list(
+        'student_id', 'assignment_id', 'quiz_id', 'score'
+    )
+    for student_id, assignment_id, quiz_id, score in entries:
+        scores[student_id][entry_key(assignment_id, quiz_id)] = score
+    return [
+        {
+            'student': {'id': student.pk, 'username': student.username},
+            'scores': scores[student.pk],
+            'total': weighted_total(scores[student.pk], items),
+        }
+        for student in students
+    ]
+
+
+def iter_gradebook(course, items, chunk_size=2000):
+    """
+    ``(student_id, username, scores, total)`` for every enrolled student, in
+    student id order. Enrollments and entries are read as two cursors in the
+    same order and merged, so memory does not grow with the course.
+    """
+    students = (
+        Enrollment.objects.filter(course=course)
+        .order_by('student_id')
+        .values_list('student_id', 'student__username')
+        .iterator(chunk_size=chunk_size)
+    )
+    entries = (
+        GradebookEntry.objects.filter(course=course)
+        .order_by('student_id')
+        .values_list('student_id', 'assignment_id', 'quiz_id', 'score')
+        .iterator(chunk_size=chunk_size)
+    )
+    entry = next(entries, None)
+    for student_id, username in students:
+        scores = {}
+        while entry is not None and entry[0] <= student_id:
+            if entry[0] == student_id:
+                scores[entry_key(*entry[1:3])] = entry[3]
+            entry = next(entries, None)
+        yield student_id, username, scores, weighted_total(scores, items)
+
+
+def entry_key(assignment_id, quiz_id):
+    return f'assignment:{assignment_id}' if assignment_id else f'quiz:{quiz_id}'
+
+
+def weighted_total(scores, items):
+    """
+    The mean of ``scores`` (percentages by item key) weighted by the item
+    weights, counting items without a score as zero.
+    """
+    total_weight = sum(item['weight'] for item in items)
+    if not total_weight:
+        return None
+    weighted = sum((scores.get(item['key']) or 0) * item['weight'] for item in items)
+    return round(Decimal(weighted) / total_weight, 2)
+
+
+def _in_batches(values, apply, size=1000):
+    batch = []
+    for value in values:
+        batch.append(value)
+        if len(batch) >= size:
+            apply(batch)
+            batch = []
+    if batch:
+        apply(batch)
@@ -0,0 +1,156 @@
+"""
+Quiz grading against compiled answer keys.
+
+An answer key holds, per question, its type, points and the ids of its
+choices and correct choices. It is compiled with two queries and cached
+under the course's ``content_version``, which ``courses.signals`` and
+``courses.quizzes`` bump on every question or choice change, so a stale
+key is never read. Grading a submission then runs in memory and its
+answers are written with one ``bulk_create``.
+
+Attempt numbers come from a ``QuizAttemptCounter`` row per quiz and student,
+claimed with a conditional ``UPDATE``. The database serialises concurrent
+updates of that one row, so simultaneous submissions get distinct numbers
+and cannot go past ``Quiz.attempts_allowed``; no table is locked.
+"""
+from collections import namedtuple
+
+from django.core.cache import cache
+from django.db.models import F, Max
+
+from .models import QuizQuestion, QuizChoice, QuizSubmission, QuizSubmissionAnswer, QuizAttemptCounter
+
+ANSWER_KEY_TIMEOUT = 60 * 60 * 24
+AUTO_GRADED_TYPES = ('multiple_choice', 'true_false')
+
+KeyedQuestion = namedtuple(
+    'KeyedQuestion',
+    ('id', 'question_type', 'points', 'choice_ids', 'correct_choice_ids', 'stratum'),
+    defaults=('',),
+)
+Grade = namedtuple('Grade', ('score', 'passed', 'answers'))
+
+
+def answer_key_cache_key(quiz):
+    return f'quiz-answer-key:{quiz.pk}:{quiz.module.course.content_version}'
+
+
+def compile_answer_key(quiz):
+    """The quiz's questions as ``KeyedQuestion`` tuples, in question order."""
+    choices = {}
+    choice_rows = QuizChoice.objects.filter(question__quiz=quiz).values_list('question_id', 'id', 'is_correct')
+    for question_id, choice_id, is_correct in choice_rows:
+        choice_ids, correct_ids = choices.setdefault(question_id, (set(), set()))
+        choice_ids.add(choice_id)
+        if is_correct:
+            correct_ids.add(choice_id)
+
+    answer_key = []
+    question_rows = QuizQuestion.objects.filter(quiz=quiz).order_by('order', 'pk')
+    for question_id, question_type, points, stratum in question_rows.values_list(
+        'id', 'question_type', 'points', 'stratum'
+    ):
+        choice_ids, correct_ids = choices.get(question_id, ((), ()))
+        answer_key.append(
+            KeyedQuestion(question_id, question_type, points, frozenset(choice_ids), frozenset(correct_ids), stratum)
+        )
+    return tuple(answer_key)
+
+
+def get_answer_key(quiz):
+    """The cached answer key; ``quiz.module.course`` should be selected."""
+    key = answer_key_cache_key(quiz)
+    answer_key = cache.get(key)
+    if answer_key is None:
+        answer_key = compile_answer_key(quiz)
+        cache.set(key, answer_key, ANSWER_KEY_TIMEOUT)
+    return answer_key
+
+
+def grade(quiz, answers_payload, question_ids=None):
+    """
+    Grade ``{question_id: {'choice': id, 'text': str}}`` answers.
+
+    Returns the percentage score (``None`` when the quiz has no points), whether
+    it passes, and unsaved ``QuizSubmissionAnswer`` rows for every question,
+    or for the questions in ``question_ids`` when the attempt saw a variant.
+    Short answers are recorded ungraded for the instructor to review.
+    """
+    if not isinstance(answers_payload, dict):
+        answers_payload = {}
+    total_points = earned_points = 0
+    answers = []
+    for question in get_answer_key(quiz):
+        if question_ids is not None and question.id not in question_ids:
+            continue
+        total_points += question.points
+        answer_data = answers_payload.get(str(question.id))
+        if not isinstance(answer_data, dict):
+            answer_data = {}
+
+        selected_choice_id = _as_id(answer_data.get('choice'))
+        if selected_choice_id not in question.choice_ids:
+            selected_choice_id = None
+        is_correct = question.question_type in AUTO_GRADED_TYPES and selected_choice_id in question.correct_choice_ids
+        points_awarded = question.points if is_correct else 0
+        earned_points += points_awarded
+
+        answers.append(
+            QuizSubmissionAnswer(
+                question_id=question.id,
+                selected_choice_id=selected_choice_id,
+                text_response=str(answer_data.get('text') or ''),
+                is_correct=is_correct,
+                points_awarded=points_awarded,
+            )
+        )
+
+    if not total_points:
+        return Grade(None, False, answers)
+    score = round((earned_points / total_points) * 100, 2)
+    return Grade(score, score >= quiz.passing_score, answers)
+
+
+def save_answers(submission, answers):
+    for answer in answers:
+        answer.submission = submission
+    QuizSubmissionAnswer.objects.bulk_create(answers)
+
+
+def next_attempt_number(quiz, student):
+    """The number the student's next attempt at ``quiz`` will get, without claiming it."""
+    used = QuizAttemptCounter.objects.filter(quiz=quiz, student=student).values_list('attempts_used', flat=True).first()
+    if used is None:
+        used = QuizSubmission.objects.filter(quiz=quiz, student=student).aggregate(used=Max('attempt_number'))['used']
+    return (used or 0) + 1
+
+
+def allocate_attempt(quiz, student):
+    """
+    Claim the student's next attempt at ``quiz`` and return its number, or
+    ``None`` when every allowed attempt is used.
+
+    Call inside the transaction that saves the submission: the counter row
+    stays locked until it commits, and rolling back releases the attempt.
+    """
+    counters = QuizAttemptCounter.objects.filter(quiz=quiz, student=student)
+    claimed = counters.filter(attempts_used__lt=quiz.attempts_allowed).update(attempts_used=F('attempts_used') + 1)
+    if not claimed:
+        if counters.exists():
+            return None
+        # First attempt, or submissions saved before counters existed.
+        used = QuizSubmission.objects.filter(quiz=quiz, student=student).aggregate(used=Max('attempt_number'))['used']
+        QuizAttemptCounter.objects.bulk_create(
+            [QuizAttemptCounter(quiz=quiz, student=student, attempts_used=used or 0)], ignore_conflicts=True
+        )
+        claimed = counters.filter(attempts_used__lt=quiz.attempts_allowed).update(attempts_used=F('attempts_used') + 1)
+        if not claimed:
+            return None
+    return counters.values_list('attempts_used', flat=True).get()
+
+
+def _as_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,26 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from courses import transfer
+from courses.models import Course
+
+
+class Command(BaseCommand):
+    help = "Write a course's content as NDJSON, for import_course in another environment."
+
+    def add_arguments(self, parser):
+        parser.add_argument('course', type=int, help="Id of the course to export.")
+        parser.add_argument('--output', help="File to write; defaults to standard output.")
+
+    def handle(self, *args, **options):
+        try:
+            course = Course.objects.get(pk=options['course'])
+        except Course.DoesNotExist:
+            raise CommandError(f"Course {options['course']} does not exist.")
+        output = open(options['output'], 'w', encoding='utf-8') if options['output'] else sys.stdout
+        try:
+            output.writelines(transfer.export_course(course))
+        finally:
+            if output is not sys.stdout:
+                output.close()
@@ -0,0 +1,25 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from courses import transfer
+
+
+class Command(BaseCommand):
+    help = "Create a course from an NDJSON file written by export_course."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Export file to read.")
+        parser.add_argument('--instructor', required=True, help="Username of the instructor who will own the course.")
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        try:
+            instructor = User.objects.get(username=options['instructor'])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['instructor']!r} does not exist.")
+        with open(options['path'], encoding='utf-8') as lines:
+            try:
+                course = transfer.import_course(lines, instructor)
+            except transfer.CourseImportError as exc:
+                raise CommandError(str(exc))
+        self.stdout.write(self.style.SUCCESS(f"Imported course {course.pk}: {course.title}"))
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import User
+from courses import similarity
+from courses.models import QuestionBankEntry
+
+
+class Command(BaseCommand):
+    help = "Report groups of near-duplicate question bank prompts."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--owner", help="Limit to this user's bank (username).")
+        parser.add_argument("--course", type=int, help="Limit to questions saved for this course id.")
+        parser.add_argument(
+            "--threshold", type=float, default=similarity.DEFAULT_THRESHOLD,
+            help="Minimum estimated Jaccard similarity of prompt shingles (0-1).",
+        )
+        parser.add_argument(
+            "--rebuild", action="store_true",
+            help="Recompute signatures for the selected entries first.",
+        )
+
+    def handle(self, *args, owner=None, course=None, threshold=None, rebuild=False, **options):
+        if not 0 <= threshold <= 1:
+            raise CommandError("--threshold must be between 0 and 1.")
+        entries = QuestionBankEntry.objects.all()
+        if owner:
+            try:
+                entries = entries.filter(owner=User.objects.get(username=owner))
+            except User.DoesNotExist:
+                raise CommandError(f"User {owner} does not exist.")
+        if course:
+            entries = entries.filter(course_id=course)
+        if rebuild:
+            similarity.rebuild_index(entries)
+
+        groups = similarity.duplicate_groups(entries, threshold)
+        grouped = {entry_id for group in groups for entry_id, _ in group}
+        prompts = {
+            entry_id: prompt
+            for entry_id, prompt in entries.order_by().values_list('pk', 'prompt').iterator(chunk_size=1000)
+            if entry_id in grouped
+        }
+        for group in groups:
+            self.stdout.write(f"{len(group)} similar questions:")
+            for entry_id, score in group:
+                self.stdout.write(f"  {entry_id}  {score:.2f}  {prompts[entry_id][:80]}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(groups)} group(s) covering {sum(len(group) for group in groups)} question(s)."
+        ))
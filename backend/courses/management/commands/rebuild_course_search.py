@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from courses import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the course full-text search index from the course and user tables."
+
+    def handle(self, *args, **options):
+        if not search.is_supported():
+            self.stdout.write(self.style.WARNING("This database backend has no search index; nothing to do."))
+            return
+        search.reindex_courses()
+        self.stdout.write(self.style.SUCCESS("Course search index rebuilt."))
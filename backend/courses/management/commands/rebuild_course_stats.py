@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from courses.stats import course_stats_drift, rebuild_course_stats
+
+
+class Command(BaseCommand):
+    help = "Report drift between CourseStats counters and the source tables, then rebuild them."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--course", type=int, action="append", dest="course_ids",
+            help="Limit to this course id (may be repeated).",
+        )
+        parser.add_argument(
+            "--check", action="store_true",
+            help="Only report drift; exit with an error if any counter disagrees.",
+        )
+
+    def handle(self, *args, course_ids=None, check=False, **options):
+        drift = course_stats_drift(course_ids)
+        for course_id, field, stored, actual in drift:
+            self.stdout.write(f"course {course_id}: {field} stored={stored} actual={actual}")
+
+        if check:
+            if drift:
+                raise CommandError(f"{len(drift)} counter(s) drifted from the source tables.")
+            self.stdout.write(self.style.SUCCESS("All course stats match the source tables."))
+            return
+
+        rebuilt = rebuild_course_stats(course_ids)
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt stats for {rebuilt} course(s); fixed {len(drift)} drifted counter(s)."
+        ))
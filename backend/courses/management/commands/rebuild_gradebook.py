@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from courses.gradebook import rebuild_gradebook
+
+
+class Command(BaseCommand):
+    help = "Recreate gradebook entries from the quiz and assignment submission tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--course", type=int, action="append", dest="course_ids",
+            help="Limit to this course id (may be repeated).",
+        )
+
+    def handle(self, *args, course_ids=None, **options):
+        entries = rebuild_gradebook(course_ids)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {entries} gradebook entr{'y' if entries == 1 else 'ies'}."))
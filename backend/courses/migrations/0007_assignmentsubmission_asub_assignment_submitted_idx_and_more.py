@@ -0,0 +1,35 @@
+# Generated by Django 5.0.1 on 2026-10-18 04:07
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0006_questionbankentry'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='assignmentsubmission',
+            index=models.Index(fields=['assignment', 'submitted_at', 'id'], name='asub_assignment_submitted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='assignmentsubmission',
+            index=models.Index(fields=['student', 'submitted_at', 'id'], name='asub_student_submitted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['status', 'created_at', 'id'], name='course_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quizsubmission',
+            index=models.Index(fields=['quiz', 'submitted_at', 'id'], name='qsub_quiz_submitted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quizsubmission',
+            index=models.Index(fields=['student', 'submitted_at', 'id'], name='qsub_student_submitted_idx'),
+        ),
+    ]
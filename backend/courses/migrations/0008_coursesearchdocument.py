@@ -0,0 +1,37 @@
+# Generated by Django 5.0.1 on 2026-10-18 04:13
+
+import courses.search
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def install_search_index(apps, schema_editor):
+    courses.search.install(schema_editor.connection)
+
+
+def uninstall_search_index(apps, schema_editor):
+    courses.search.uninstall(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0007_assignmentsubmission_asub_assignment_submitted_idx_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseSearchDocument',
+            fields=[
+                ('course', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_document', serialize=False, to='courses.course')),
+                ('document', courses.search.SearchDocumentField()),
+            ],
+            options={
+                'db_table': 'courses_coursesearch',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(install_search_index, uninstall_search_index),
+    ]
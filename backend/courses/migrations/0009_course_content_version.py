@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-18 04:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0008_coursesearchdocument'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='content_version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.0.1 on 2026-10-18 04:16
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0009_course_content_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='content_updated_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.0.1 on 2026-10-18 04:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0010_course_content_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseStats',
+            fields=[
+                ('course', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='courses.course')),
+                ('enrollment_count', models.PositiveIntegerField(default=0)),
+                ('completed_enrollment_count', models.PositiveIntegerField(default=0)),
+                ('progress_total', models.PositiveBigIntegerField(default=0)),
+                ('published_lesson_count', models.PositiveIntegerField(default=0)),
+                ('lesson_completion_count', models.PositiveIntegerField(default=0)),
+                ('quiz_submission_count', models.PositiveIntegerField(default=0)),
+                ('quiz_score_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('assignment_submission_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'course stats',
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.0.1 on 2026-10-18 04:24
+
+from django.db import migrations, models
+from django.db.models import Case, Count, IntegerField, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from django.db.models.lookups import GreaterThan
+
+
+def _count(queryset, group_by):
+    counts = queryset.order_by().values(group_by).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+def count_completed_lessons(apps, schema_editor):
+    Enrollment = apps.get_model('courses', 'Enrollment')
+    Lesson = apps.get_model('courses', 'Lesson')
+    LessonProgress = apps.get_model('courses', 'LessonProgress')
+    completed = _count(
+        LessonProgress.objects.filter(enrollment=OuterRef('pk'), lesson__is_published=True), 'enrollment'
+    )
+    published = _count(Lesson.objects.filter(module__course=OuterRef('course'), is_published=True), 'module__course')
+    Enrollment.objects.update(
+        completed_lesson_count=completed,
+        progress=Case(
+            When(GreaterThan(published, 0), then=completed * 100 / published),
+            default=Value(0),
+            output_field=IntegerField(),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0011_coursestats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='enrollment',
+            name='completed_lesson_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_completed_lessons, migrations.RunPython.noop),
+    ]
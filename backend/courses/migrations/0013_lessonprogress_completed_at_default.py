@@ -0,0 +1,19 @@
+# Generated by Django 5.0.1 on 2026-10-18 04:29
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0012_enrollment_completed_lesson_count'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='lessonprogress',
+            name='completed_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.0.1 on 2026-10-18 04:30
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0013_lessonprogress_completed_at_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LessonPlayback',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position_seconds', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('enrollment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='playback', to='courses.enrollment')),
+                ('lesson', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='playback', to='courses.lesson')),
+            ],
+            options={
+                'unique_together': {('enrollment', 'lesson')},
+            },
+        ),
+    ]
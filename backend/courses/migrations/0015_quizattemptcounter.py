@@ -0,0 +1,48 @@
+# Generated by Django 5.0.1 on 2026-10-18 04:38
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def count_used_attempts(apps, schema_editor):
+    QuizAttemptCounter = apps.get_model('courses', 'QuizAttemptCounter')
+    QuizSubmission = apps.get_model('courses', 'QuizSubmission')
+    used = (
+        QuizSubmission.objects.order_by()
+        .values('quiz_id', 'student_id')
+        .annotate(attempts_used=Max('attempt_number'))
+        .values_list('quiz_id', 'student_id', 'attempts_used')
+    )
+    QuizAttemptCounter.objects.bulk_create(
+        (
+            QuizAttemptCounter(quiz_id=quiz_id, student_id=student_id, attempts_used=attempts_used)
+            for quiz_id, student_id, attempts_used in used.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0014_lessonplayback'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuizAttemptCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('attempts_used', models.PositiveIntegerField(default=0)),
+                ('quiz', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attempt_counters', to='courses.quiz')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='quiz_attempt_counters', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('quiz', 'student')},
+            },
+        ),
+        migrations.RunPython(count_used_attempts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.0.1 on 2026-10-18 04:45
+
+import courses.question_bank
+import courses.search
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_tags(apps, schema_editor):
+    QuestionBankEntry = apps.get_model('courses', 'QuestionBankEntry')
+    QuestionBankTag = apps.get_model('courses', 'QuestionBankTag')
+    batch = []
+    for entry_id, tags in QuestionBankEntry.objects.order_by().values_list('id', 'tags').iterator(chunk_size=1000):
+        batch += [
+            QuestionBankTag(entry_id=entry_id, name=name) for name in courses.question_bank.normalize_tags(tags)
+        ]
+        if len(batch) >= 1000:
+            QuestionBankTag.objects.bulk_create(batch)
+            batch = []
+    QuestionBankTag.objects.bulk_create(batch)
+
+
+def install_search_index(apps, schema_editor):
+    courses.question_bank.install(schema_editor.connection)
+
+
+def uninstall_search_index(apps, schema_editor):
+    courses.question_bank.uninstall(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0015_quizattemptcounter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionBankSearchDocument',
+            fields=[
+                ('entry', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_document', serialize=False, to='courses.questionbankentry')),
+                ('document', courses.search.SearchDocumentField()),
+            ],
+            options={
+                'db_table': 'courses_questionbanksearch',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='QuestionBankTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=64)),
+                ('entry', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tag_rows', to='courses.questionbankentry')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['name', 'entry'], name='qbtag_name_entry_idx')],
+                'unique_together': {('entry', 'name')},
+            },
+        ),
+        migrations.RunPython(backfill_tags, migrations.RunPython.noop),
+        migrations.RunPython(install_search_index, uninstall_search_index),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.0.1 on 2026-10-18 04:48
+
+import courses.similarity
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def index_prompts(apps, schema_editor):
+    QuestionBankEntry = apps.get_model('courses', 'QuestionBankEntry')
+    QuestionBankSignature = apps.get_model('courses', 'QuestionBankSignature')
+    QuestionBankBucket = apps.get_model('courses', 'QuestionBankBucket')
+    signatures, buckets = [], []
+    for entry_id, prompt in QuestionBankEntry.objects.order_by().values_list('id', 'prompt').iterator(chunk_size=1000):
+        minhash = courses.similarity.signature(prompt)
+        if minhash is None:
+            continue
+        signatures.append(QuestionBankSignature(entry_id=entry_id, minhash=minhash.tobytes()))
+        buckets += [QuestionBankBucket(entry_id=entry_id, key=key) for key in courses.similarity.band_keys(minhash)]
+        if len(signatures) >= 1000:
+            QuestionBankSignature.objects.bulk_create(signatures)
+            QuestionBankBucket.objects.bulk_create(buckets)
+            signatures, buckets = [], []
+    QuestionBankSignature.objects.bulk_create(signatures)
+    QuestionBankBucket.objects.bulk_create(buckets)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0016_questionbanktag'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionBankSignature',
+            fields=[
+                ('entry', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='signature', serialize=False, to='courses.questionbankentry')),
+                ('minhash', models.BinaryField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='QuestionBankBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.BigIntegerField()),
+                ('entry', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='buckets', to='courses.questionbankentry')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['key', 'entry'], name='qbbucket_key_entry_idx')],
+            },
+        ),
+        migrations.RunPython(index_prompts, migrations.RunPython.noop),
+    ]
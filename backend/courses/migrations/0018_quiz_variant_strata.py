@@ -0,0 +1,23 @@
+# Generated by Django 5.0.1 on 2026-10-18 04:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0017_questionbanksignature'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quiz',
+            name='variant_strata',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='quizquestion',
+            name='stratum',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
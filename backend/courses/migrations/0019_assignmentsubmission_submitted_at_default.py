@@ -0,0 +1,31 @@
+# Generated by Django 5.0.1 on 2026-10-18 04:56
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Case, OuterRef, Subquery, Value, When
+
+
+def refresh_lateness(apps, schema_editor):
+    # Submissions made before a due date moved kept their old lateness.
+    Assignment = apps.get_model('courses', 'Assignment')
+    AssignmentSubmission = apps.get_model('courses', 'AssignmentSubmission')
+    due_date = Assignment.objects.filter(pk=OuterRef('assignment_id')).values('due_date')
+    AssignmentSubmission.objects.update(
+        is_late=Case(When(submitted_at__gt=Subquery(due_date), then=Value(True)), default=Value(False))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0018_quiz_variant_strata'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='assignmentsubmission',
+            name='submitted_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(refresh_lateness, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 5.0.1 on 2026-10-18 04:58
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def fill_gradebook(apps, schema_editor):
+    AssignmentSubmission = apps.get_model('courses', 'AssignmentSubmission')
+    GradebookEntry = apps.get_model('courses', 'GradebookEntry')
+    QuizSubmission = apps.get_model('courses', 'QuizSubmission')
+    assignment_rows = AssignmentSubmission.objects.values_list(
+        'assignment_id', 'student_id', 'assignment__module__course_id', 'grade', 'assignment__max_points'
+    ).iterator(chunk_size=1000)
+    GradebookEntry.objects.bulk_create(
+        (
+            GradebookEntry(
+                course_id=course_id,
+                student_id=student_id,
+                assignment_id=assignment_id,
+                score=None if grade is None or not max_points else round(grade * 100 / max_points, 2),
+            )
+            for assignment_id, student_id, course_id, grade, max_points in assignment_rows
+        ),
+        batch_size=1000,
+    )
+    quiz_rows = (
+        QuizSubmission.objects.order_by()
+        .values_list('quiz_id', 'student_id', 'quiz__module__course_id')
+        .annotate(best=Max('score'))
+        .iterator(chunk_size=1000)
+    )
+    GradebookEntry.objects.bulk_create(
+        (
+            GradebookEntry(course_id=course_id, student_id=student_id, quiz_id=quiz_id, score=best)
+            for quiz_id, student_id, course_id, best in quiz_rows
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0019_assignmentsubmission_submitted_at_default'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GradebookEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.DecimalField(blank=True, decimal_places=2, max_digits=6, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('assignment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='gradebook_entries', to='courses.assignment')),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='gradebook_entries', to='courses.course')),
+                ('quiz', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='gradebook_entries', to='courses.quiz')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='gradebook_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['course', 'student'], name='gradebook_course_student_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='gradebookentry',
+            constraint=models.UniqueConstraint(fields=('student', 'assignment'), name='gradebook_student_assignment_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='gradebookentry',
+            constraint=models.UniqueConstraint(fields=('student', 'quiz'), name='gradebook_student_quiz_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='gradebookentry',
+            constraint=models.CheckConstraint(check=models.Q(models.Q(('assignment__isnull', True), ('quiz__isnull', False)), models.Q(('assignment__isnull', False), ('quiz__isnull', True)), _connector='OR'), name='gradebook_single_item'),
+        ),
+        migrations.RunPython(fill_gradebook, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,8 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
+
+from .search import SEARCH_TABLE, SearchDocumentField
 
 
 class Course(models.Model):
@@ -20,16 +23,41 @@ class Course(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='draft')
     estimated_hours = models.DecimalField(max_digits=5, decimal_places=2, default=0.0)
     prerequisites = models.TextField(blank=True)
+    # Bumped whenever the course or its module tree changes; see courses.outline.
+    content_version = models.PositiveIntegerField(default=1, editable=False)
+    content_updated_at = models.DateTimeField(default=timezone.now, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at', 'id'], name='course_status_created_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
 
+class CourseSearchDocument(models.Model):
+    """Full-text index row for a course; the table is created and kept in sync by ``courses.search``."""
+
+    # ``rowid`` is the FTS5 row key on SQLite and a plain primary key on PostgreSQL.
+    course = models.OneToOneField(
+        Course,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        db_column='rowid',
+        db_constraint=False,
+        related_name='search_document',
+    )
+    document = SearchDocumentField()
+
+    class Meta:
+        managed = False
+        db_table = SEARCH_TABLE
+
+
 class CourseModule(models.Model):
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='modules')
     title = models.CharField(max_length=255)
@@ -96,7 +124,7 @@ class AssignmentSubmission(models.Model):
     student = models.ForeignKey(
         settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='assignment_submissions'
     )
-    submitted_at = models.DateTimeField(auto_now_add=True)
+    submitted_at = models.DateTimeField(default=timezone.now)
     attachment = models.FileField(upload_to='assignment-submissions/', blank=True, null=True)
     text_response = models.TextField(blank=True)
     grade = models.DecimalField(max_digits=5, decimal_places=2, blank=True, null=True)
@@ -115,17 +143,24 @@ class AssignmentSubmission(models.Model):
     class Meta:
         ordering = ['-submitted_at']
         unique_together = ('assignment', 'student')
+        indexes = [
+            models.Index(fields=['assignment', 'submitted_at', 'id'], name='asub_assignment_submitted_idx'),
+            models.Index(fields=['student', 'submitted_at', 'id'], name='asub_student_submitted_idx'),
+        ]
 
     def __str__(self):
         return f"{self.assignment.title} submission by {self.student.username}"
 
     def save(self, *args, **kwargs):
+        # Lateness is written with the row; ``courses.assignments.refresh_lateness``
+        # re-evaluates existing submissions when a due date moves.
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or {'submitted_at', 'assignment'}.intersection(update_fields):
+            due_date = self.assignment.due_date
+            self.is_late = bool(due_date and self.submitted_at and self.submitted_at > due_date)
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'is_late'}
         super().save(*args, **kwargs)
-        if self.assignment.due_date and self.submitted_at:
-            is_late = self.submitted_at > self.assignment.due_date
-            if self.is_late != is_late:
-                AssignmentSubmission.objects.filter(pk=self.pk).update(is_late=is_late)
-                self.is_late = is_late
 
 
 class Quiz(models.Model):
@@ -135,6 +170,8 @@ class Quiz(models.Model):
     time_limit_minutes = models.PositiveIntegerField(blank=True, null=True)
     attempts_allowed = models.PositiveIntegerField(default=1)
     passing_score = models.PositiveIntegerField(default=70)
+    # ``{stratum: count}``: each attempt gets ``count`` of the stratum's questions; see ``courses.generation``.
+    variant_strata = models.JSONField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -156,6 +193,7 @@ class QuizQuestion(models.Model):
     question_type = models.CharField(max_length=20, choices=QUESTION_TYPES)
     order = models.PositiveIntegerField(default=1)
     points = models.PositiveIntegerField(default=1)
+    stratum = models.CharField(max_length=64, blank=True)
 
     class Meta:
         ordering = ['order']
@@ -205,6 +243,57 @@ class QuestionBankEntry(models.Model):
         return f"{self.title or self.prompt[:50]} ({self.owner})"
 
 
+class QuestionBankTag(models.Model):
+    """A normalised tag of a bank entry; ``courses.question_bank`` keeps it in sync with ``tags``."""
+
+    entry = models.ForeignKey(QuestionBankEntry, on_delete=models.CASCADE, related_name='tag_rows')
+    name = models.CharField(max_length=64)
+
+    class Meta:
+        unique_together = ('entry', 'name')
+        indexes = [models.Index(fields=['name', 'entry'], name='qbtag_name_entry_idx')]
+
+    def __str__(self):
+        return self.name
+
+
+class QuestionBankSignature(models.Model):
+    """MinHash signature of a bank entry's prompt; ``courses.similarity`` keeps it in sync."""
+
+    entry = models.OneToOneField(
+        QuestionBankEntry, on_delete=models.CASCADE, primary_key=True, related_name='signature'
+    )
+    minhash = models.BinaryField()
+
+
+class QuestionBankBucket(models.Model):
+    """One LSH band of a bank entry's signature; entries sharing a ``key`` are duplicate candidates."""
+
+    entry = models.ForeignKey(QuestionBankEntry, on_delete=models.CASCADE, related_name='buckets')
+    key = models.BigIntegerField()
+
+    class Meta:
+        indexes = [models.Index(fields=['key', 'entry'], name='qbbucket_key_entry_idx')]
+
+
+class QuestionBankSearchDocument(models.Model):
+    """Full-text index row for a bank entry; the table is created and kept in sync by ``courses.question_bank``."""
+
+    entry = models.OneToOneField(
+        QuestionBankEntry,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        db_column='rowid',
+        db_constraint=False,
+        related_name='search_document',
+    )
+    document = SearchDocumentField()
+
+    class Meta:
+        managed = False
+        db_table = 'courses_questionbanksearch'
+
+
 class QuizSubmission(models.Model):
     quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name='submissions')
     student = models.ForeignKey(
@@ -218,11 +307,35 @@ class QuizSubmission(models.Model):
     class Meta:
         ordering = ['-submitted_at']
         unique_together = ('quiz', 'student', 'attempt_number')
+        indexes = [
+            models.Index(fields=['quiz', 'submitted_at', 'id'], name='qsub_quiz_submitted_idx'),
+            models.Index(fields=['student', 'submitted_at', 'id'], name='qsub_student_submitted_idx'),
+        ]
 
     def __str__(self):
         return f"{self.quiz.title} submission by {self.student.username}"
 
 
+class QuizAttemptCounter(models.Model):
+    """
+    Attempts a student has used on a quiz. ``courses.grading.allocate_attempt``
+    claims attempts with a conditional UPDATE, so concurrent submissions get
+    distinct attempt numbers and cannot exceed ``Quiz.attempts_allowed``.
+    """
+
+    quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name='attempt_counters')
+    student = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='quiz_attempt_counters'
+    )
+    attempts_used = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('quiz', 'student')
+
+    def __str__(self):
+        return f"{self.student.username}: {self.attempts_used} attempts at {self.quiz.title}"
+
+
 class QuizSubmissionAnswer(models.Model):
     submission = models.ForeignKey(
         QuizSubmission, on_delete=models.CASCADE, related_name='answers'
@@ -237,6 +350,41 @@ class QuizSubmissionAnswer(models.Model):
         return f"Answer to {self.question} ({self.submission.student.username})"
 
 
+class GradebookEntry(models.Model):
+    """
+    A student's score on one assignment or quiz of a course, as a percentage:
+    the graded assignment, or the best quiz attempt. ``courses.gradebook``
+    refreshes it when submissions are made, graded or regraded.
+    """
+
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='gradebook_entries')
+    student = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='gradebook_entries'
+    )
+    assignment = models.ForeignKey(
+        Assignment, on_delete=models.CASCADE, related_name='gradebook_entries', blank=True, null=True
+    )
+    quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name='gradebook_entries', blank=True, null=True)
+    # Null while the submission awaits grading.
+    score = models.DecimalField(max_digits=6, decimal_places=2, blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['student', 'assignment'], name='gradebook_student_assignment_uniq'),
+            models.UniqueConstraint(fields=['student', 'quiz'], name='gradebook_student_quiz_uniq'),
+            models.CheckConstraint(
+                check=models.Q(assignment__isnull=True, quiz__isnull=False)
+                | models.Q(assignment__isnull=False, quiz__isnull=True),
+                name='gradebook_single_item',
+            ),
+        ]
+        indexes = [models.Index(fields=['course', 'student'], name='gradebook_course_student_idx')]
+
+    def __str__(self):
+        return f"{self.student.username}: {self.score}"
+
+
 class Enrollment(models.Model):
     student = models.ForeignKey(
         settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='enrollments'
@@ -244,6 +392,7 @@ class Enrollment(models.Model):
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='enrollments')
     enrolled_at = models.DateTimeField(auto_now_add=True)
     progress = models.IntegerField(default=0)  # Percentage
+    completed_lesson_count = models.PositiveIntegerField(default=0, editable=False)
     last_accessed = models.DateTimeField(blank=True, null=True)
 
     class Meta:
@@ -254,12 +403,11 @@ class Enrollment(models.Model):
         return f"{self.student.username} enrolled in {self.course.title}"
 
     def recalculate_progress(self):
-        from django.db.models import Count
-
+        """Recount progress from the source tables; lesson completions keep it current incrementally."""
         total_lessons = Lesson.objects.filter(module__course=self.course, is_published=True).count()
-        completed = self.lesson_progress.count()
-        self.progress = int((completed / total_lessons) * 100) if total_lessons else 0
-        self.save(update_fields=['progress'])
+        self.completed_lesson_count = self.lesson_progress.filter(lesson__is_published=True).count()
+        self.progress = self.completed_lesson_count * 100 // total_lessons if total_lessons else 0
+        self.save(update_fields=['progress', 'completed_lesson_count'])
 
 
 class Wishlist(models.Model):
@@ -280,7 +428,7 @@ class Wishlist(models.Model):
 class LessonProgress(models.Model):
     enrollment = models.ForeignKey(Enrollment, on_delete=models.CASCADE, related_name='lesson_progress')
     lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE, related_name='progress_records')
-    completed_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(default=timezone.now)
 
     class Meta:
         unique_together = ('enrollment', 'lesson')
@@ -289,3 +437,65 @@ class LessonProgress(models.Model):
     def __str__(self):
         return f"{self.enrollment.student.username} completed {self.lesson.title}"
 
+
+class LessonPlayback(models.Model):
+    """Where a student left off in a lesson's video, written by ``courses.playback``."""
+
+    enrollment = models.ForeignKey(Enrollment, on_delete=models.CASCADE, related_name='playback')
+    lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE, related_name='playback')
+    position_seconds = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = ('enrollment', 'lesson')
+
+    def __str__(self):
+        return f"{self.enrollment.student.username} at {self.position_seconds}s of {self.lesson.title}"
+
+
+class CourseStats(models.Model):
+    """
+    Denormalized per-course counters, kept current by ``courses.signals`` and
+    rebuilt or verified with ``manage.py rebuild_course_stats``.
+    """
+
+    course = models.OneToOneField(
+        Course, on_delete=models.CASCADE, primary_key=True, related_name='stats'
+    )
+    enrollment_count = models.PositiveIntegerField(default=0)
+    completed_enrollment_count = models.PositiveIntegerField(default=0)
+    progress_total = models.PositiveBigIntegerField(default=0)
+    published_lesson_count = models.PositiveIntegerField(default=0)
+    lesson_completion_count = models.PositiveIntegerField(default=0)
+    quiz_submission_count = models.PositiveIntegerField(default=0)
+    quiz_score_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    assignment_submission_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'course stats'
+
+    def __str__(self):
+        return f"Stats for {self.course.title}"
+
+    @property
+    def completion_rate(self):
+        if not self.enrollment_count:
+            return 0.0
+        return self.completed_enrollment_count / self.enrollment_count * 100
+
+    @property
+    def average_progress(self):
+        if not self.enrollment_count:
+            return 0.0
+        return self.progress_total / self.enrollment_count
+
+    @property
+    def average_quiz_score(self):
+        if not self.quiz_submission_count:
+            return 0.0
+        return float(self.quiz_score_total) / self.quiz_submission_count
+
+    @property
+    def revenue(self):
+        return float(self.course.price) * self.enrollment_count if self.course.price else 0.0
@@ -0,0 +1,118 @@
+"""
+Cached course outlines.
+
+The outline is the module → lesson/assignment/quiz tree rendered by
+``CourseModuleSerializer``. It is stored as pre-rendered JSON bytes keyed by
+course and ``Course.content_version``, which ``courses.signals`` bumps whenever
+outline content changes, so stale entries are never read and simply expire.
+Per-user fields are overlaid on the decoded document at read time.
+"""
+import json
+
+from django.core.cache import cache
+from django.db.models import F, QuerySet
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+OUTLINE_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def outline_cache_key(course):
+    return f'course-outline:{course.pk}:{course.content_version}'
+
+
+def render_outline(course):
+    """Serialize the outline without any per-user state."""
+    from .serializers import CourseModuleSerializer
+
+    modules = course.modules.prefetch_related(
+        'lessons',
+        'assignments',
+        'quizzes__questions__choices',
+    )
+    return JSONRenderer().render(CourseModuleSerializer(modules, many=True).data)
+
+
+def get_outline(course, request=None, completed_lesson_ids=frozenset()):
+    key = outline_cache_key(course)
+    document = cache.get(key)
+    if document is None:
+        document = render_outline(course)
+        cache.set(key, document, OUTLINE_CACHE_TIMEOUT)
+
+    modules = json.loads(document)
+    for module in modules:
+        for lesson in module['lessons']:
+            lesson['is_completed'] = lesson['id'] in completed_lesson_ids
+        if request is not None:
+            # Cached documents hold relative media URLs; match the serializer's absolute ones.
+            for assignment in module['assignments']:
+                if assignment['attachment']:
+                    assignment['attachment'] = request.build_absolute_uri(assignment['attachment'])
+    return modules
+
+
+def completed_lesson_ids(user):
+    from .models import LessonProgress
+
+    if not user or not user.is_authenticated or user.role != 'student':
+        return frozenset()
+    return frozenset(
+        LessonProgress.objects.filter(enrollment__student=user).values_list('lesson_id', flat=True)
+    )
+
+
+def bump_content_version(**course_filter):
+    from .models import Course
+
+    now = timezone.now()
+    Course.objects.filter(**course_filter).update(
+        content_version=F('content_version') + 1,
+        content_updated_at=now,
+    )
+    return now
+
+
+def course_filter_for(instance):
+    """The ``Course`` filter selecting the course whose outline contains ``instance``."""
+    from .models import Course, CourseModule, Lesson, Assignment, Quiz, QuizQuestion, QuizChoice
+
+    if isinstance(instance, Course):
+        return {'pk': instance.pk}
+    if isinstance(instance, CourseModule):
+        return {'pk': instance.course_id}
+    if isinstance(instance, (Lesson, Assignment, Quiz)):
+        return {'modules': instance.module_id}
+    if isinstance(instance, QuizQuestion):
+        return {'modules__quizzes': instance.quiz_id}
+    if isinstance(instance, QuizChoice):
+        return {'modules__quizzes__questions': instance.question_id}
+    raise TypeError(f'{type(instance).__name__} is not part of a course outline.')
+
+
+def bump_for_deleted(instance, origin):
+    """
+    Bump the outline version after ``instance`` is deleted.
+
+    Rows removed by a cascade from another object are skipped, since the
+    origin's own delete bumps the same course (or removes it); rows removed by
+    a queryset delete bump each affected course once.
+    """
+    from .models import Course
+
+    if isinstance(origin, QuerySet):
+        if origin.model is not type(instance):
+            return
+    elif origin is not None and origin is not instance:
+        return
+    if isinstance(instance, Course):
+        return
+
+    course_filter = course_filter_for(instance)
+    if isinstance(origin, QuerySet):
+        bumped = origin.__dict__.setdefault('_bumped_outlines', set())
+        key = tuple(sorted(course_filter.items()))
+        if key in bumped:
+            return
+        bumped.add(key)
+    bump_content_version(**course_filter)
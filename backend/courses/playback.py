@@ -0,0 +1,154 @@
+"""
+Write-behind buffer for course player heartbeats.
+
+The player reports its position every few seconds. Heartbeats are coalesced
+per (enrollment, lesson) in process memory, keeping only the latest one, and
+a background thread flushes them every ``PLAYBACK_FLUSH_INTERVAL`` seconds
+as batched upserts of ``LessonPlayback`` rows and batched UPDATEs of
+``Enrollment.last_accessed``. At most ``PLAYBACK_BUFFER_SIZE`` pairs are held;
+heartbeats for new pairs beyond that are dropped and counted. Pending
+heartbeats are flushed when the process exits.
+"""
+import atexit
+import logging
+import threading
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Case, DateTimeField, Value, When
+
+logger = logging.getLogger(__name__)
+
+
+Heartbeat = namedtuple('Heartbeat', ('position_seconds', 'at'))
+
+
+class PlaybackBuffer:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._thread = None
+        self._stopped = threading.Event()
+        self._dropped_since_flush = 0
+        self.metrics = {'recorded': 0, 'coalesced': 0, 'dropped': 0, 'flushed': 0, 'failed_flushes': 0}
+
+    def record(self, enrollment_id, lesson_id, position_seconds, at):
+        """Buffer a heartbeat; returns ``False`` when it was dropped."""
+        key = (enrollment_id, lesson_id)
+        with self._lock:
+            self.metrics['recorded'] += 1
+            current = self._pending.get(key)
+            if current is not None:
+                self.metrics['coalesced'] += 1
+                if at >= current.at:
+                    self._pending[key] = Heartbeat(position_seconds, at)
+            elif len(self._pending) >= settings.PLAYBACK_BUFFER_SIZE:
+                self.metrics['dropped'] += 1
+                self._dropped_since_flush += 1
+                return False
+            else:
+                self._pending[key] = Heartbeat(position_seconds, at)
+        self._ensure_flusher()
+        return True
+
+    def pending(self, enrollment_id, lesson_id):
+        """The buffered heartbeat for a pair, not yet written to the database."""
+        with self._lock:
+            return self._pending.get((enrollment_id, lesson_id))
+
+    def flush(self):
+        """Write every buffered heartbeat; returns the number of pairs written."""
+        with self._lock:
+            batch, self._pending = self._pending, {}
+            dropped, self._dropped_since_flush = self._dropped_since_flush, 0
+        if dropped:
+            logger.warning('Dropped %d playback heartbeats: the buffer was full', dropped)
+        if not batch:
+            return 0
+        try:
+            write_heartbeats(batch)
+        except Exception:
+            logger.exception('Failed to flush %d playback heartbeats', len(batch))
+            self._requeue(batch)
+            with self._lock:
+                self.metrics['failed_flushes'] += 1
+            return 0
+        with self._lock:
+            self.metrics['flushed'] += len(batch)
+        return len(batch)
+
+    def stop(self):
+        self._stopped.set()
+        self.flush()
+
+    def _requeue(self, batch):
+        with self._lock:
+            for key, heartbeat in batch.items():
+                current = self._pending.get(key)
+                if current is not None and current.at >= heartbeat.at:
+                    continue
+                if current is None and len(self._pending) >= settings.PLAYBACK_BUFFER_SIZE:
+                    self.metrics['dropped'] += 1
+                    self._dropped_since_flush += 1
+                    continue
+                self._pending[key] = heartbeat
+
+    def _ensure_flusher(self):
+        if self._thread is not None or not settings.PLAYBACK_FLUSH_INTERVAL:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='playback-flush', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stopped.wait(settings.PLAYBACK_FLUSH_INTERVAL):
+            self.flush()
+            close_old_connections()
+
+
+def write_heartbeats(batch):
+    """Upsert watch positions and set ``last_accessed`` for a ``{(enrollment, lesson): Heartbeat}`` batch."""
+    from .models import Enrollment, Lesson, LessonPlayback
+
+    # Enrollments or lessons deleted since the heartbeat can't be written.
+    enrollment_ids = set(
+        Enrollment.objects.filter(pk__in={key[0] for key in batch}).values_list('pk', flat=True)
+    )
+    lesson_ids = set(Lesson.objects.filter(pk__in={key[1] for key in batch}).values_list('pk', flat=True))
+    batch = {key: heartbeat for key, heartbeat in batch.items() if key[0] in enrollment_ids and key[1] in lesson_ids}
+
+    LessonPlayback.objects.bulk_create(
+        [
+            LessonPlayback(
+                enrollment_id=enrollment_id,
+                lesson_id=lesson_id,
+                position_seconds=heartbeat.position_seconds,
+                updated_at=heartbeat.at,
+            )
+            for (enrollment_id, lesson_id), heartbeat in batch.items()
+        ],
+        update_conflicts=True,
+        unique_fields=['enrollment', 'lesson'],
+        update_fields=['position_seconds', 'updated_at'],
+        batch_size=500,
+    )
+
+    last_accessed = {}
+    for (enrollment_id, _), heartbeat in batch.items():
+        if enrollment_id not in last_accessed or heartbeat.at > last_accessed[enrollment_id]:
+            last_accessed[enrollment_id] = heartbeat.at
+    enrollment_ids = list(last_accessed)
+    for start in range(0, len(enrollment_ids), 500):
+        chunk = enrollment_ids[start:start + 500]
+        Enrollment.objects.filter(pk__in=chunk).update(
+            last_accessed=Case(
+                *[When(pk=enrollment_id, then=Value(last_accessed[enrollment_id])) for enrollment_id in chunk],
+                output_field=DateTimeField(),
+            )
+        )
+
+
+buffer = PlaybackBuffer()
+atexit.register(buffer.stop)
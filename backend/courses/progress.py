@@ -0,0 +1,174 @@
+"""
+Incremental enrollment progress.
+
+``Enrollment.completed_lesson_count`` counts the enrollment's
+``LessonProgress`` rows for published lessons and
+``CourseStats.published_lesson_count`` the course's published lessons, so
+progress is recomputed from two counters in SQL instead of two aggregate
+scans. ``courses.signals`` calls ``record_lesson_completions`` as lesson
+progress rows come and go, and ``refresh_course_progress`` when the set of
+published lessons changes, which moves every enrollment in the course.
+``sync_lesson_completions`` applies a batch of player events with one insert
+and one delete and recounts the enrollment once.
+"""
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from django.db.models.lookups import GreaterThan, GreaterThanOrEqual
+from django.utils import timezone
+
+from . import stats
+from .models import CourseStats, Enrollment, Lesson, LessonProgress
+
+PROGRESS_CHUNK_SIZE = 5000
+
+
+def published_lessons(course):
+    """The published lesson counter of ``course`` (an expression such as ``OuterRef``)."""
+    counter = CourseStats.objects.filter(course=course).values('published_lesson_count')[:1]
+    return Coalesce(Subquery(counter, output_field=IntegerField()), Value(0))
+
+
+def progress_expression(completed, published):
+    """Whole-percent progress for ``completed`` of ``published`` lessons."""
+    return Case(
+        When(GreaterThan(published, 0), then=completed * 100 / published),
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def _is_complete(progress):
+    return Case(When(GreaterThanOrEqual(progress, 100), then=Value(1)), default=Value(0))
+
+
+def record_lesson_completions(enrollment_id, delta, heal=True):
+    """
+    Add ``delta`` completed lessons to an enrollment and update its progress.
+
+    The course stats absorb the change in progress first, computed from the
+    enrollment row before it is rewritten, so the whole change is two
+    single-row UPDATEs. A course without a stats row is rebuilt from the
+    source tables (which already include the completions) when ``heal`` is set.
+    """
+    enrollments = Enrollment.objects.filter(pk=enrollment_id)
+    completed = F('completed_lesson_count') + delta
+    progress = progress_expression(completed, published_lessons(OuterRef('course')))
+
+    with transaction.atomic():
+        if not _shift_course_stats(enrollment_id, progress, completions=delta) and heal:
+            stats.rebuild_course_stats(enrollments.values_list('course_id', flat=True))
+            _shift_course_stats(enrollment_id, progress, completions=0)
+        enrollments.update(completed_lesson_count=completed, progress=progress)
+
+
+def _shift_course_stats(enrollment_id, progress, completions):
+    """Move the enrollment's course stats from its current ``progress`` to the new one."""
+    enrollments = Enrollment.objects.filter(pk=enrollment_id)
+
+    def change(expression):
+        row = enrollments.annotate(change=expression).values('change')
+        return Coalesce(Subquery(row, output_field=IntegerField()), Value(0))
+
+    return stats.stats_for({'enrollments': enrollment_id}).update(
+        lesson_completion_count=F('lesson_completion_count') + completions,
+        progress_total=F('progress_total') + change(progress - F('progress')),
+        completed_enrollment_count=F('completed_enrollment_count')
+        + change(_is_complete(progress) - _is_complete(F('progress'))),
+        updated_at=timezone.now(),
+    )
+
+
+def refresh_course_progress(course_id, chunk_size=PROGRESS_CHUNK_SIZE):
+    """
+    Recount completed lessons and progress for every enrollment in a course.
+
+    Enrollments are rewritten by primary-key range, ``chunk_size`` rows per
+    UPDATE, each counting its lesson progress rows with a grouped subquery;
+    the course stats are then rebuilt from the result.
+    """
+    published = Lesson.objects.filter(module__course=course_id, is_published=True).count()
+    completed = _counted_lesson_progress()
+    progress = progress_expression(completed, Value(published))
+
+    enrollments = Enrollment.objects.filter(course=course_id).order_by()
+    last_pk = None
+    while True:
+        chunk = enrollments if last_pk is None else enrollments.filter(pk__gt=last_pk)
+        upper_pk = next(iter(chunk.order_by('pk').values_list('pk', flat=True)[chunk_size - 1:chunk_size]), None)
+        if upper_pk is not None:
+            chunk = chunk.filter(pk__lte=upper_pk)
+        chunk.update(completed_lesson_count=completed, progress=progress)
+        if upper_pk is None:
+            break
+        last_pk = upper_pk
+
+    stats.rebuild_course_stats([course_id])
+
+
+def sync_lesson_completions(enrollment, events):
+    """
+    Apply completion events recorded by the player, possibly while offline.
+
+    ``events`` are ``(lesson_id, completed, occurred_at)`` tuples; the latest
+    event per lesson wins. An uncompletion does not remove a completion
+    recorded after it (from another device, say). Returns the lesson ids left
+    completed and uncompleted by the batch.
+    """
+    latest = {}
+    for lesson_id, completed, occurred_at in sorted(events, key=lambda event: event[2]):
+        latest[lesson_id] = (completed, occurred_at)
+    completed = {lesson_id: at for lesson_id, (done, at) in latest.items() if done}
+    uncompleted = {lesson_id: at for lesson_id, (done, at) in latest.items() if not done}
+
+    with transaction.atomic():
+        LessonProgress.objects.bulk_create(
+            [
+                LessonProgress(enrollment=enrollment, lesson_id=lesson_id, completed_at=occurred_at)
+                for lesson_id, occurred_at in completed.items()
+            ],
+            ignore_conflicts=True,
+        )
+        if uncompleted:
+            removals = [Q(lesson_id=lesson_id, completed_at__lte=at) for lesson_id, at in uncompleted.items()]
+            removed = LessonProgress.objects.filter(Q(*removals, _connector=Q.OR), enrollment=enrollment)
+            # Lessons unpublished since they were completed are left out of the recount.
+            unpublished = removed.filter(lesson__is_published=False).count()
+            # Recounted below rather than per row by courses.signals.
+            removed.progress_recounted = True
+            removed.delete()
+            stats.apply_deltas({'enrollments': enrollment.pk}, heal=False, lesson_completion_count=-unpublished)
+        recount_enrollment_progress(enrollment.pk)
+
+    still_completed = set(
+        LessonProgress.objects.filter(enrollment=enrollment, lesson_id__in=latest).values_list('lesson_id', flat=True)
+    )
+    return sorted(still_completed), sorted(set(latest) - still_completed)
+
+
+def recount_enrollment_progress(enrollment_id):
+    """Bring an enrollment's counters in line with its lesson progress rows."""
+    row = (
+        Enrollment.objects.select_for_update()
+        .filter(pk=enrollment_id)
+        .values_list('completed_lesson_count', _counted_lesson_progress())
+        .first()
+    )
+    if row and row[1] != row[0]:
+        record_lesson_completions(enrollment_id, row[1] - row[0])
+
+
+def _counted_lesson_progress():
+    """
+    The number of published lessons the outer enrollment has completed, as a
+    grouped subquery; completions of unpublished lessons count towards
+    neither side of the progress ratio.
+    """
+    counted = (
+        LessonProgress.objects.filter(enrollment=OuterRef('pk'), lesson__is_published=True)
+        .order_by()
+        .values('enrollment')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counted, output_field=IntegerField()), Value(0))
@@ -0,0 +1,188 @@
+"""
+Tag and full-text lookups over the question bank.
+
+``QuestionBankEntry.tags`` stays the editable comma-separated list; its
+normalised names are mirrored into ``QuestionBankTag`` rows, indexed by
+``(name, entry)``, so tag filters and counts are index lookups rather than
+``LIKE`` scans. Prompts and titles are indexed in
+``courses_questionbanksearch``, built the same way as the course catalog
+index in ``courses.search``. ``courses.signals`` keeps both in sync.
+"""
+import re
+
+from django.db import connection as default_connection, models
+
+from . import search
+from .models import QuestionBankEntry, QuestionBankTag, QuestionBankSearchDocument
+
+TAG_MAX_LENGTH = 64
+TAG_BATCH_SIZE = 1000
+SEARCH_TABLE = QuestionBankSearchDocument._meta.db_table
+
+
+def normalize_tags(text):
+    """Lower-cased, whitespace-collapsed, de-duplicated tag names, in order."""
+    names = []
+    for tag in (text or '').split(','):
+        name = re.sub(r'\s+', ' ', tag).strip().lower()[:TAG_MAX_LENGTH]
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def sync_tags(entry, created=False):
+    names = normalize_tags(entry.tags)
+    if not created:
+        QuestionBankTag.objects.filter(entry=entry).exclude(name__in=names).delete()
+    QuestionBankTag.objects.bulk_create(
+        [QuestionBankTag(entry=entry, name=name) for name in names], ignore_conflicts=not created
+    )
+
+
+def rebuild_tags(entries=None):
+    """Recreate tag rows for ``entries`` (a queryset; every entry by default)."""
+    entries = QuestionBankEntry.objects.all() if entries is None else entries
+    QuestionBankTag.objects.filter(entry__in=entries).delete()
+    batch = []
+    for entry_id, tags in entries.order_by().values_list('id', 'tags').iterator(chunk_size=TAG_BATCH_SIZE):
+        batch += [QuestionBankTag(entry_id=entry_id, name=name) for name in normalize_tags(tags)]
+        if len(batch) >= TAG_BATCH_SIZE:
+            QuestionBankTag.objects.bulk_create(batch)
+            batch = []
+    QuestionBankTag.objects.bulk_create(batch)
+
+
+def filter_by_tags(queryset, names, match_all=True):
+    """Entries tagged with every name in ``names``, or with any of them."""
+    names = normalize_tags(','.join(names))
+    if not names:
+        return queryset
+    tagged = QuestionBankTag.objects.filter(name__in=names)
+    if match_all:
+        tagged = (
+            tagged.order_by()
+            .values('entry')
+            .annotate(matched=models.Count('name'))
+            .filter(matched=len(names))
+        )
+    return queryset.filter(pk__in=tagged.values('entry'))
+
+
+def tag_counts(queryset):
+    """``[{'name': ..., 'count': ...}]`` over the entries in ``queryset``, most used first."""
+    return list(
+        QuestionBankTag.objects.filter(entry__in=queryset.order_by().values('pk'))
+        .values('name')
+        .annotate(count=models.Count('entry'))
+        .order_by('-count', 'name')
+    )
+
+
+def search_entries(queryset, text):
+    """Filter ``queryset`` to entries whose prompt or title matches ``text``, ordered by relevance."""
+    match_query = search.build_match_query(text)
+    if match_query is None:
+        return queryset.none()
+    if not search.is_supported():
+        for term in search.query_terms(text):
+            queryset = queryset.filter(models.Q(prompt__icontains=term) | models.Q(title__icontains=term))
+        return queryset
+    return (
+        queryset.filter(search_document__document__match=match_query)
+        .annotate(search_rank=search.SearchRank('search_document__document', match_query))
+        .order_by('-search_rank', '-updated_at', '-id')
+    )
+
+
+def reindex_entries(entry_ids=None, connection=None):
+    """Rebuild index rows for ``entry_ids``, or the whole index."""
+    connection = connection or default_connection
+    if not search.is_supported(connection):
+        return
+
+    where, params = '', []
+    if entry_ids is not None:
+        entry_ids = [int(entry_id) for entry_id in entry_ids]
+        if not entry_ids:
+            return
+        where = f"WHERE e.id IN ({', '.join(['%s'] * len(entry_ids))})"
+        params = entry_ids
+
+    entry_table = QuestionBankEntry._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                f"""
+                INSERT INTO {SEARCH_TABLE} (rowid, document)
+                SELECT e.id,
+                       setweight(to_tsvector('simple', e.title), 'A')
+                       || setweight(to_tsvector('simple', e.prompt), 'B')
+                FROM {entry_table} e
+                {where}
+                ON CONFLICT (rowid) DO UPDATE SET document = EXCLUDED.document
+                """,
+                params,
+            )
+            return
+
+        cursor.execute(
+            f"DELETE FROM {SEARCH_TABLE} WHERE rowid IN (SELECT e.id FROM {entry_table} e {where})",
+            params,
+        )
+        cursor.execute(
+            f"INSERT INTO {SEARCH_TABLE} (rowid, title, prompt) SELECT e.id, e.title, e.prompt FROM {entry_table} e {where}",
+            params,
+        )
+
+
+def remove_entries(entry_ids, connection=None):
+    connection = connection or default_connection
+    entry_ids = [int(entry_id) for entry_id in entry_ids]
+    if not entry_ids or not search.is_supported(connection):
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({', '.join(['%s'] * len(entry_ids))})",
+            entry_ids,
+        )
+
+
+def install(connection):
+    """Create and populate the search table for ``connection``'s backend."""
+    if not search.is_supported(connection):
+        return
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS {SEARCH_TABLE} (
+                    rowid bigint PRIMARY KEY REFERENCES {QuestionBankEntry._meta.db_table} (id) ON DELETE CASCADE,
+                    document tsvector NOT NULL
+                )
+                """
+            )
+            cursor.execute(
+                f'CREATE INDEX IF NOT EXISTS {SEARCH_TABLE}_document_idx '
+                f'ON {SEARCH_TABLE} USING GIN (document)'
+            )
+        else:
+            cursor.execute(
+                f"""
+                CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+                    title, prompt,
+                    tokenize = 'unicode61 remove_diacritics 2',
+                    prefix = '2 3'
+                )
+                """
+            )
+            cursor.execute(
+                f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}, rank) VALUES ('rank', 'bm25(4.0, 1.0)')"
+            )
+    reindex_entries(connection=connection)
+
+
+def uninstall(connection):
+    if not search.is_supported(connection):
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
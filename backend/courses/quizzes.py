@@ -0,0 +1,144 @@
+"""
+Writes to a quiz's question and choice tree.
+
+Nested payloads are applied as a diff: rows are matched by ``id``, changed
+rows are written with ``bulk_update``, new rows with ``bulk_create``, and
+only rows missing from the payload are deleted. Choices that are kept keep
+their ids, so ``QuizSubmissionAnswer.selected_choice`` on past submissions
+still points at them.
+"""
+from django.db import transaction
+from rest_framework import serializers
+
+from . import outline
+from .models import QuizQuestion, QuizChoice
+
+
+def create_questions(quiz, questions_data):
+    """Insert the questions, then all of their choices, with one query each."""
+    if not questions_data:
+        return
+    for question_data in questions_data:
+        question_data.pop('id', None)
+    choices_data = [question_data.pop('choices', []) for question_data in questions_data]
+    questions = QuizQuestion.objects.bulk_create(
+        [QuizQuestion(quiz=quiz, **question_data) for question_data in questions_data]
+    )
+    QuizChoice.objects.bulk_create(
+        [
+            QuizChoice(question=question, **_without_id(choice_data))
+            for question, question_choices in zip(questions, choices_data)
+            for choice_data in question_choices
+        ]
+    )
+    # bulk_create sends no signals; the outline changed after the quiz was saved.
+    outline.bump_content_version(**outline.course_filter_for(quiz))
+
+
+@transaction.atomic
+def sync_questions(quiz, questions_data):
+    """
+    Make ``quiz``'s questions match ``questions_data``.
+
+    A question's choices are only synced when its payload has ``choices``.
+    """
+    existing = {question.pk: question for question in quiz.questions.prefetch_related('choices')}
+    saved_orders = {pk: question.order for pk, question in existing.items()}
+    choices_data = [question_data.pop('choices', None) for question_data in questions_data]
+    questions, created, updated, fields = _match(QuizQuestion, existing, questions_data, {'quiz': quiz}, 'question')
+
+    removed = set(existing) - {question.pk for question in questions if question.pk}
+    if removed:
+        QuizQuestion.objects.filter(pk__in=removed).delete()
+    if 'order' in fields:
+        reordered = [question for question in updated if question.order != saved_orders[question.pk]]
+        top = max([*saved_orders.values(), *(question.order for question in questions)], default=0)
+        _park_orders(reordered, top)
+    QuizQuestion.objects.bulk_create(created)
+    if updated:
+        QuizQuestion.objects.bulk_update(updated, fields)
+
+    _sync_choices(
+        [
+            (question, question_choices, _choices_by_id(question) if question.pk in existing else {})
+            for question, question_choices in zip(questions, choices_data)
+            if question_choices is not None
+        ]
+    )
+    outline.bump_content_version(**outline.course_filter_for(quiz))
+
+
+@transaction.atomic
+def sync_choices(question, choices_data):
+    _sync_choices([(question, choices_data, _choices_by_id(question))])
+    outline.bump_content_version(**outline.course_filter_for(question))
+
+
+def _sync_choices(entries):
+    """Sync ``(question, choices_data, existing choices by id)`` entries with one query per operation."""
+    created, updated, fields, removed = [], [], set(), set()
+    for question, choices_data, existing in entries:
+        choices, question_created, question_updated, question_fields = _match(
+            QuizChoice, existing, choices_data, {'question': question}, 'choice'
+        )
+        created += question_created
+        updated += question_updated
+        fields |= question_fields
+        removed |= set(existing) - {choice.pk for choice in choices if choice.pk}
+    if removed:
+        QuizChoice.objects.filter(pk__in=removed).delete()
+    QuizChoice.objects.bulk_create(created)
+    if updated:
+        QuizChoice.objects.bulk_update(updated, fields)
+
+
+def _match(model, existing, items, parent, label):
+    """
+    Pair payload ``items`` with ``existing`` rows by id.
+
+    Returns the rows in payload order, the unsaved new rows, the changed
+    existing rows (updated in memory) and the names of the changed fields.
+    """
+    rows, created, updated, fields = [], [], [], set()
+    for data in items:
+        data = dict(data)
+        pk = data.pop('id', None)
+        if pk is None:
+            row = model(**parent, **data)
+            created.append(row)
+        elif pk in existing:
+            row = existing[pk]
+            changed = {name for name, value in data.items() if getattr(row, name) != value}
+            for name in changed:
+                setattr(row, name, data[name])
+            if changed:
+                updated.append(row)
+                fields |= changed
+        else:
+            raise serializers.ValidationError({f'{label}s': [f'Unknown {label} id {pk}.']})
+        rows.append(row)
+    return rows, created, updated, fields
+
+
+def _park_orders(questions, top):
+    """
+    Move reordered questions above every current and requested order first,
+    so the final ``bulk_update`` can swap orders without tripping the
+    ``(quiz, order)`` constraint.
+    """
+    if not questions:
+        return
+    final = [question.order for question in questions]
+    for offset, question in enumerate(questions, start=1):
+        question.order = top + offset
+    QuizQuestion.objects.bulk_update(questions, ['order'])
+    for question, order in zip(questions, final):
+        question.order = order
+
+
+def _choices_by_id(question):
+    return {choice.pk: choice for choice in question.choices.all()}
+
+
+def _without_id(data):
+    return {name: value for name, value in data.items() if name != 'id'}
@@ -0,0 +1,271 @@
+"""
+Full-text search over the course catalog.
+
+Courses are indexed in ``courses_coursesearch``: an FTS5 virtual table on
+SQLite, or a ``tsvector`` table with a GIN index on PostgreSQL. The
+``CourseSearchDocument`` model maps that table so catalog querysets can join
+to it, and ``courses.signals`` keeps it in sync with ``Course`` and ``User``.
+Other database backends fall back to ``icontains`` filtering.
+"""
+import re
+
+from django.db import connection as default_connection, models
+from django.utils.html import escape
+
+SEARCH_TABLE = 'courses_coursesearch'
+MAX_QUERY_TERMS = 8
+
+# Control characters mark highlights so the snippet text can be HTML-escaped
+# before the markers are swapped for <mark> tags.
+_HIGHLIGHT_START = '\x02'
+_HIGHLIGHT_STOP = '\x03'
+
+
+class SearchDocumentField(models.TextField):
+    """The indexed document; only queried through the ``match`` lookup and ``SearchRank``."""
+
+
+@SearchDocumentField.register_lookup
+class SearchMatch(models.Lookup):
+    lookup_name = 'match'
+
+    def as_sqlite(self, compiler, connection):
+        # FTS5 matches against the hidden column named after the table.
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        qn = connection.ops.quote_name
+        table = self.lhs.target.model._meta.db_table
+        return f'{qn(self.lhs.alias)}.{qn(table)} MATCH {rhs}', rhs_params
+
+    def as_postgresql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} @@ to_tsquery('simple', {rhs})", lhs_params + rhs_params
+
+
+class SearchRank(models.Func):
+    """Relevance of a matched document; higher is better on every backend."""
+
+    output_field = models.FloatField()
+
+    def __init__(self, document, query):
+        super().__init__(document, models.Value(query))
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        # FTS5's rank column is bm25() with the weights configured in install().
+        document = self.get_source_expressions()[0]
+        return f'-{connection.ops.quote_name(document.alias)}.rank', []
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        document, query = self.get_source_expressions()
+        document_sql, document_params = compiler.compile(document)
+        query_sql, query_params = compiler.compile(query)
+        sql = f"ts_rank_cd({document_sql}, to_tsquery('simple', {query_sql}))"
+        return sql, document_params + query_params
+
+
+def is_supported(connection=None):
+    connection = connection or default_connection
+    return connection.vendor in ('sqlite', 'postgresql')
+
+
+def query_terms(text):
+    return re.findall(r'\w+', (text or '').lower())[:MAX_QUERY_TERMS]
+
+
+def build_match_query(text, connection=None):
+    """Translate free text into a prefix-matching query with every term required."""
+    connection = connection or default_connection
+    terms = query_terms(text)
+    if not terms:
+        return None
+    if connection.vendor == 'postgresql':
+        return ' & '.join(f'{term}:*' for term in terms)
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def search_courses(queryset, text):
+    """Filter ``queryset`` to courses matching ``text``, ordered by relevance."""
+    match_query = build_match_query(text)
+    if match_query is None:
+        return queryset.none()
+    if not is_supported():
+        terms = query_terms(text)
+        for term in terms:
+            queryset = queryset.filter(
+                models.Q(title__icontains=term)
+                | models.Q(description__icontains=term)
+                | models.Q(category__icontains=term)
+                | models.Q(instructor__username__icontains=term)
+                | models.Q(instructor__display_name__icontains=term)
+            )
+        return queryset
+    return (
+        queryset.filter(search_document__document__match=match_query)
+        .annotate(search_rank=SearchRank('search_document__document', match_query))
+        .order_by('-search_rank', '-created_at', '-id')
+    )
+
+
+def course_snippets(text, course_ids):
+    """Return ``{course_id: html}`` highlighted snippets for the given courses."""
+    match_query = build_match_query(text)
+    course_ids = [int(course_id) for course_id in course_ids]
+    if match_query is None or not course_ids or not is_supported():
+        return {}
+
+    placeholders = ', '.join(['%s'] * len(course_ids))
+    with default_connection.cursor() as cursor:
+        if default_connection.vendor == 'postgresql':
+            cursor.execute(
+                f"""
+                SELECT c.id, ts_headline('simple', c.title || ' ' || c.description,
+                                         to_tsquery('simple', %s), %s)
+                FROM {_course_table()} c
+                WHERE c.id IN ({placeholders})
+                """,
+                [
+                    match_query,
+                    f'StartSel={_HIGHLIGHT_START}, StopSel={_HIGHLIGHT_STOP}, MaxWords=24, MinWords=8',
+                    *course_ids,
+                ],
+            )
+        else:
+            cursor.execute(
+                f"""
+                SELECT rowid, snippet({SEARCH_TABLE}, -1, %s, %s, '…', 16)
+                FROM {SEARCH_TABLE}
+                WHERE {SEARCH_TABLE} MATCH %s AND rowid IN ({placeholders})
+                """,
+                [_HIGHLIGHT_START, _HIGHLIGHT_STOP, match_query, *course_ids],
+            )
+        rows = cursor.fetchall()
+
+    return {
+        course_id: escape(snippet)
+        .replace(_HIGHLIGHT_START, '<mark>')
+        .replace(_HIGHLIGHT_STOP, '</mark>')
+        for course_id, snippet in rows
+    }
+
+
+def reindex_courses(course_ids=None, instructor_id=None, connection=None):
+    """
+    Rebuild index rows from the source tables.
+
+    Limited to ``course_ids`` or to the courses of ``instructor_id`` when
+    given; with neither, the whole index is rebuilt.
+    """
+    connection = connection or default_connection
+    if not is_supported(connection):
+        return
+
+    where, params = '', []
+    if course_ids is not None:
+        course_ids = [int(course_id) for course_id in course_ids]
+        if not course_ids:
+            return
+        where = f"WHERE c.id IN ({', '.join(['%s'] * len(course_ids))})"
+        params = course_ids
+    elif instructor_id is not None:
+        where, params = 'WHERE c.instructor_id = %s', [instructor_id]
+
+    course_table, user_table = _course_table(), _user_table()
+    instructor_name = "COALESCE(u.display_name, '') || ' ' || u.username"
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                f"""
+                INSERT INTO {SEARCH_TABLE} (rowid, document)
+                SELECT c.id,
+                       setweight(to_tsvector('simple', c.title), 'A')
+                       || setweight(to_tsvector('simple', c.category), 'B')
+                       || setweight(to_tsvector('simple', {instructor_name}), 'B')
+                       || setweight(to_tsvector('simple', c.description), 'C')
+                FROM {course_table} c JOIN {user_table} u ON u.id = c.instructor_id
+                {where}
+                ON CONFLICT (rowid) DO UPDATE SET document = EXCLUDED.document
+                """,
+                params,
+            )
+            return
+
+        cursor.execute(
+            f"DELETE FROM {SEARCH_TABLE} WHERE rowid IN (SELECT c.id FROM {course_table} c {where})",
+            params,
+        )
+        cursor.execute(
+            f"""
+            INSERT INTO {SEARCH_TABLE} (rowid, title, description, category, instructor)
+            SELECT c.id, c.title, c.description, c.category, {instructor_name}
+            FROM {course_table} c JOIN {user_table} u ON u.id = c.instructor_id
+            {where}
+            """,
+            params,
+        )
+
+
+def remove_courses(course_ids, connection=None):
+    connection = connection or default_connection
+    course_ids = [int(course_id) for course_id in course_ids]
+    if not course_ids or not is_supported(connection):
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({', '.join(['%s'] * len(course_ids))})",
+            course_ids,
+        )
+
+
+def install(connection):
+    """Create and populate the search table for ``connection``'s backend."""
+    if not is_supported(connection):
+        return
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS {SEARCH_TABLE} (
+                    rowid bigint PRIMARY KEY REFERENCES {_course_table()} (id) ON DELETE CASCADE,
+                    document tsvector NOT NULL
+                )
+                """
+            )
+            cursor.execute(
+                f'CREATE INDEX IF NOT EXISTS {SEARCH_TABLE}_document_idx '
+                f'ON {SEARCH_TABLE} USING GIN (document)'
+            )
+        else:
+            cursor.execute(
+                f"""
+                CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+                    title, description, category, instructor,
+                    tokenize = 'unicode61 remove_diacritics 2',
+                    prefix = '2 3'
+                )
+                """
+            )
+            # Column weights for bm25(): title, description, category, instructor.
+            cursor.execute(
+                f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}, rank) "
+                f"VALUES ('rank', 'bm25(10.0, 1.0, 4.0, 4.0)')"
+            )
+    reindex_courses(connection=connection)
+
+
+def uninstall(connection):
+    if not is_supported(connection):
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+
+
+def _course_table():
+    from .models import Course
+
+    return Course._meta.db_table
+
+
+def _user_table():
+    from django.contrib.auth import get_user_model
+
+    return get_user_model()._meta.db_table
@@ -1,3 +1,5 @@
+from django.db import transaction
+from django.utils import timezone
 from rest_framework import serializers
 from .models import (
     Course,
@@ -15,10 +17,78 @@ from .models import (
     Enrollment,
     Wishlist,
 )
-from accounts.serializers import UserSerializer
+from accounts.serializers import UserSerializer, UserSummarySerializer
+from . import outline, question_bank, quizzes, similarity
+
+
+def parse_fieldset(value):
+    """Parse a comma separated ``?fields=``/``?expand=`` value into a set."""
+    if not value:
+        return None
+    names = {name.strip() for name in value.split(',') if name.strip()}
+    return names or None
+
+
+def user_course_flags(user):
+    """
+    Serializer context with the ids of courses ``user`` is enrolled in and
+    has wishlisted, so ``is_enrolled``/``is_in_wishlist`` cost one query each
+    per request instead of one per course.
+    """
+    if not user or not user.is_authenticated:
+        return {'enrolled_course_ids': set(), 'wishlist_course_ids': set()}
+    return {
+        'enrolled_course_ids': set(
+            Enrollment.objects.filter(student=user).values_list('course_id', flat=True)
+        ),
+        'wishlist_course_ids': set(
+            Wishlist.objects.filter(student=user).values_list('course_id', flat=True)
+        ),
+    }
+
+
+def completed_lesson_ids(context):
+    """
+    The requesting student's completed lesson ids, loaded once per serializer
+    context and shared by every nested serializer that renders completion.
+    """
+    if 'completed_lesson_ids' not in context:
+        request = context.get('request')
+        context['completed_lesson_ids'] = outline.completed_lesson_ids(request and request.user)
+    return context['completed_lesson_ids']
+
+
+class SparseFieldsetMixin:
+    """
+    Trims serializer output to the fieldset passed through context.
+
+    ``context['fields']`` limits the rendered fields, and fields listed in
+    ``Meta.expandable_fields`` are only rendered when named in
+    ``context['expand']``. Fields listed in ``Meta.optional_fields`` are left
+    out by default and rendered when named in either.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        requested = self.context.get('fields')
+        expanded = self.context.get('expand') or set()
+        expandable = set(getattr(self.Meta, 'expandable_fields', ()))
+        optional = set(getattr(self.Meta, 'optional_fields', ()))
+        for name in list(self.fields):
+            if name in expandable:
+                keep = name in expanded
+            elif name in optional:
+                keep = name in expanded or name in (requested or ())
+            else:
+                keep = requested is None or name in requested
+            if not keep:
+                self.fields.pop(name)
 
 
 class QuizChoiceSerializer(serializers.ModelSerializer):
+    # Writable so nested updates can match existing choices.
+    id = serializers.IntegerField(required=False)
+
     class Meta:
         model = QuizChoice
         fields = ('id', 'text', 'is_correct')
@@ -26,29 +96,35 @@ class QuizChoiceSerializer(serializers.ModelSerializer):
 
 
 class QuizQuestionSerializer(serializers.ModelSerializer):
+    # Writable so nested updates can match existing questions.
+    id = serializers.IntegerField(required=False)
     choices = QuizChoiceSerializer(many=True, required=False)
 
     class Meta:
         model = QuizQuestion
-        fields = ('id', 'prompt', 'question_type', 'order', 'points', 'choices')
+        fields = ('id', 'prompt', 'question_type', 'order', 'points', 'stratum', 'choices')
 
     def create(self, validated_data):
+        validated_data.pop('id', None)
         choices_data = validated_data.pop('choices', [])
         question = QuizQuestion.objects.create(**validated_data)
         for choice_data in choices_data:
-            QuizChoice.objects.create(question=question, **choice_data)
+            choice_data.pop('id', None)
+        QuizChoice.objects.bulk_create([QuizChoice(question=question, **choice_data) for choice_data in choices_data])
+        if choices_data:
+            outline.bump_content_version(**outline.course_filter_for(question))
         return question
 
+    @transaction.atomic
     def update(self, instance, validated_data):
+        validated_data.pop('id', None)
         choices_data = validated_data.pop('choices', [])
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
         instance.save()
 
         if choices_data:
-            instance.choices.all().delete()
-            for choice_data in choices_data:
-                QuizChoice.objects.create(question=instance, **choice_data)
+            quizzes.sync_choices(instance, choices_data)
         return instance
 
 
@@ -65,21 +141,19 @@ class QuizSerializer(serializers.ModelSerializer):
             'time_limit_minutes',
             'attempts_allowed',
             'passing_score',
+            'variant_strata',
             'created_at',
             'questions',
         )
-        read_only_fields = ('created_at',)
+        read_only_fields = ('variant_strata', 'created_at')
 
     def create(self, validated_data):
         questions_data = validated_data.pop('questions', [])
         quiz = Quiz.objects.create(**validated_data)
-        for question_data in questions_data:
-            choices_data = question_data.pop('choices', [])
-            question = QuizQuestion.objects.create(quiz=quiz, **question_data)
-            for choice_data in choices_data:
-                QuizChoice.objects.create(question=question, **choice_data)
+        quizzes.create_questions(quiz, questions_data)
         return quiz
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         questions_data = validated_data.pop('questions', [])
         for attr, value in validated_data.items():
@@ -87,12 +161,7 @@ class QuizSerializer(serializers.ModelSerializer):
         instance.save()
 
         if questions_data:
-            instance.questions.all().delete()
-            for question_data in questions_data:
-                choices_data = question_data.pop('choices', [])
-                question = QuizQuestion.objects.create(quiz=instance, **question_data)
-                for choice_data in choices_data:
-                    QuizChoice.objects.create(question=question, **choice_data)
+            quizzes.sync_questions(instance, questions_data)
         return instance
 
 
@@ -117,6 +186,12 @@ class QuestionBankEntrySerializer(serializers.ModelSerializer):
         )
         read_only_fields = ('owner', 'created_at', 'updated_at')
 
+    def validate_tags(self, value):
+        tags = ', '.join(question_bank.normalize_tags(value))
+        if len(tags) > QuestionBankEntry._meta.get_field('tags').max_length:
+            raise serializers.ValidationError("Too many tags.")
+        return tags
+
     def validate(self, attrs):
         question_type = attrs.get('question_type', self.instance.question_type if self.instance else None)
         choices = attrs.get('choices', self.instance.choices if self.instance else [])
@@ -147,10 +222,7 @@ class LessonSerializer(serializers.ModelSerializer):
         read_only_fields = ('created_at',)
 
     def get_is_completed(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated and request.user.role == 'student':
-            return obj.progress_records.filter(enrollment__student=request.user).exists()
-        return False
+        return obj.id in completed_lesson_ids(self.context)
 
 
 class AssignmentSerializer(serializers.ModelSerializer):
@@ -218,10 +290,10 @@ class CourseModuleSerializer(serializers.ModelSerializer):
         )
 
 
-class CourseSerializer(serializers.ModelSerializer):
+class CourseSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     instructor = UserSerializer(read_only=True)
     instructor_id = serializers.IntegerField(write_only=True, required=False)
-    modules = CourseModuleSerializer(many=True, read_only=True)
+    modules = serializers.SerializerMethodField()
     is_enrolled = serializers.SerializerMethodField()
     is_in_wishlist = serializers.SerializerMethodField()
 
@@ -230,19 +302,69 @@ class CourseSerializer(serializers.ModelSerializer):
         fields = '__all__'
         read_only_fields = ('created_at', 'updated_at')
 
+    def get_modules(self, obj):
+        # Served from the versioned outline cache; the per-user state is
+        # overlaid on the cached document.
+        return outline.get_outline(obj, self.context.get('request'), completed_lesson_ids(self.context))
+
     def get_is_enrolled(self, obj):
+        enrolled_ids = self.context.get('enrolled_course_ids')
+        if enrolled_ids is not None:
+            return obj.id in enrolled_ids
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return Enrollment.objects.filter(student=request.user, course=obj).exists()
         return False
 
     def get_is_in_wishlist(self, obj):
+        wishlist_ids = self.context.get('wishlist_course_ids')
+        if wishlist_ids is not None:
+            return obj.id in wishlist_ids
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return Wishlist.objects.filter(student=request.user, course=obj).exists()
         return False
 
 
+class CourseListSerializer(CourseSerializer):
+    """
+    Compact catalog representation: title, thumbnail, price, category and
+    instructor. The longer or instructor-facing fields are only rendered when
+    asked for (``?expand=description,status`` or ``?fields=``). ``modules`` is
+    only rendered with ``?expand=modules``; ``search_highlight`` is added for
+    ``?search=`` lists.
+    """
+
+    instructor = UserSummarySerializer(read_only=True)
+    search_highlight = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Course
+        fields = (
+            'id',
+            'title',
+            'description',
+            'thumbnail',
+            'price',
+            'category',
+            'status',
+            'estimated_hours',
+            'instructor',
+            'is_enrolled',
+            'is_in_wishlist',
+            'created_at',
+            'updated_at',
+            'modules',
+            'search_highlight',
+        )
+        read_only_fields = fields
+        expandable_fields = ('modules', 'search_highlight')
+        optional_fields = ('description', 'status', 'estimated_hours', 'created_at', 'updated_at')
+
+    def get_search_highlight(self, obj):
+        return self.context.get('search_snippets', {}).get(obj.id)
+
+
 class AssignmentSubmissionSerializer(serializers.ModelSerializer):
     student = UserSerializer(read_only=True)
     assignment = AssignmentSerializer(read_only=True)
@@ -271,6 +393,28 @@ class AssignmentSubmissionSerializer(serializers.ModelSerializer):
         read_only_fields = ('submitted_at', 'reviewed_at', 'reviewed_by', 'is_late')
 
 
+class SubmissionReviewSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    grade = serializers.DecimalField(max_digits=5, decimal_places=2, required=False)
+    feedback = serializers.CharField(required=False, allow_blank=True)
+    status = serializers.ChoiceField(choices=AssignmentSubmission.STATUS_CHOICES, required=False)
+
+    def validate(self, attrs):
+        if 'grade' not in attrs and 'status' not in attrs:
+            raise serializers.ValidationError("Give a grade or a status.")
+        return attrs
+
+
+class BulkSubmissionReviewSerializer(serializers.Serializer):
+    submissions = SubmissionReviewSerializer(many=True, allow_empty=False, max_length=500)
+
+    def validate_submissions(self, value):
+        ids = [item['id'] for item in value]
+        if len(set(ids)) != len(ids):
+            raise serializers.ValidationError("Each submission can only be listed once.")
+        return value
+
+
 class LessonProgressSerializer(serializers.ModelSerializer):
     lesson = LessonSerializer(read_only=True)
 
@@ -279,6 +423,78 @@ class LessonProgressSerializer(serializers.ModelSerializer):
         fields = ('id', 'lesson', 'completed_at')
 
 
+class QuizStratumSerializer(serializers.Serializer):
+    tag = serializers.CharField(max_length=64)
+    count = serializers.IntegerField(min_value=1)
+    pool = serializers.IntegerField(
+        min_value=1, required=False, help_text="Questions to copy for per-attempt variants; defaults to count."
+    )
+
+    def validate_tag(self, value):
+        tags = question_bank.normalize_tags(value)
+        if len(tags) != 1:
+            raise serializers.ValidationError("Give a single tag.")
+        return tags[0]
+
+    def validate(self, attrs):
+        if attrs.get('pool', attrs['count']) < attrs['count']:
+            raise serializers.ValidationError({'pool': "The pool cannot be smaller than the count."})
+        return attrs
+
+
+class QuizGenerationSerializer(serializers.Serializer):
+    module = serializers.PrimaryKeyRelatedField(queryset=CourseModule.objects.select_related('course'))
+    title = serializers.CharField(max_length=255)
+    description = serializers.CharField(required=False, allow_blank=True, default='')
+    time_limit_minutes = serializers.IntegerField(min_value=1, required=False, allow_null=True, default=None)
+    attempts_allowed = serializers.IntegerField(min_value=1, default=1)
+    passing_score = serializers.IntegerField(min_value=0, max_value=100, default=70)
+    strata = QuizStratumSerializer(many=True, allow_empty=False)
+    seed = serializers.IntegerField(required=False, allow_null=True, default=None)
+    variants = serializers.BooleanField(default=False, help_text="Show each attempt its own draw from the pools.")
+
+    def validate_strata(self, value):
+        tags = [stratum['tag'] for stratum in value]
+        if len(set(tags)) != len(tags):
+            raise serializers.ValidationError("Each tag can only be one stratum.")
+        return value
+
+
+class SimilarQuestionsSerializer(serializers.Serializer):
+    threshold = serializers.FloatField(min_value=0, max_value=1, default=similarity.DEFAULT_THRESHOLD)
+
+
+class CourseCloneSerializer(serializers.Serializer):
+    title = serializers.CharField(max_length=255, required=False)
+    shift_days = serializers.IntegerField(required=False, help_text="Days to move release and due dates by.")
+
+
+class LessonProgressEventSerializer(serializers.Serializer):
+    lesson = serializers.IntegerField()
+    completed = serializers.BooleanField(default=True)
+    occurred_at = serializers.DateTimeField(required=False)
+
+    def validate_occurred_at(self, value):
+        # Offline clocks may run ahead; never record a completion in the future.
+        return min(value, timezone.now())
+
+
+class LessonProgressSyncSerializer(serializers.Serializer):
+    course = serializers.IntegerField()
+    events = LessonProgressEventSerializer(many=True, allow_empty=False, max_length=500)
+
+    def validate(self, attrs):
+        now = timezone.now()
+        attrs['events'] = [
+            (event['lesson'], event['completed'], event.get('occurred_at', now)) for event in attrs['events']
+        ]
+        return attrs
+
+
+class PlaybackHeartbeatSerializer(serializers.Serializer):
+    position_seconds = serializers.IntegerField(min_value=0)
+
+
 class QuizSubmissionAnswerSerializer(serializers.ModelSerializer):
     class Meta:
         model = QuizSubmissionAnswer
@@ -297,12 +513,16 @@ class QuizSubmissionSerializer(serializers.ModelSerializer):
     student = UserSerializer(read_only=True)
     answers = QuizSubmissionAnswerSerializer(many=True, read_only=True)
     quiz = QuizSerializer(read_only=True)
+    quiz_id = serializers.PrimaryKeyRelatedField(
+        queryset=Quiz.objects.select_related('module__course'), write_only=True, source='quiz'
+    )
 
     class Meta:
         model = QuizSubmission
         fields = (
             'id',
             'quiz',
+            'quiz_id',
             'student',
             'submitted_at',
             'attempt_number',
@@ -328,7 +548,7 @@ class EnrollmentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Enrollment
         fields = '__all__'
-        read_only_fields = ('enrolled_at',)
+        read_only_fields = ('enrolled_at', 'completed_lesson_count')
 
 
 class WishlistSerializer(serializers.ModelSerializer):
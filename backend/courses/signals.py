@@ -0,0 +1,309 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import assignments, gradebook, outline, progress, question_bank, search, similarity, stats
+from .models import (
+    Course,
+    CourseModule,
+    Lesson,
+    Assignment,
+    AssignmentSubmission,
+    Quiz,
+    QuizQuestion,
+    QuizChoice,
+    QuizSubmission,
+    QuestionBankEntry,
+    Enrollment,
+    LessonProgress,
+    CourseStats,
+)
+
+INSTRUCTOR_DISPLAY_FIELDS = {'username', 'display_name'}
+OUTLINE_MODELS = (Course, CourseModule, Lesson, Assignment, Quiz, QuizQuestion, QuizChoice)
+
+
+@receiver(post_save, sender=Course)
+def index_course(sender, instance, **kwargs):
+    search.reindex_courses(course_ids=[instance.pk])
+
+
+@receiver(post_delete, sender=Course)
+def unindex_course(sender, instance, **kwargs):
+    search.remove_courses([instance.pk])
+
+
+@receiver(post_init, sender=QuestionBankEntry)
+def remember_bank_entry_tags(sender, instance, **kwargs):
+    instance._saved_tags = instance.__dict__.get('tags')
+    instance._saved_prompt = instance.__dict__.get('prompt')
+
+
+@receiver(post_save, sender=QuestionBankEntry)
+def index_bank_entry(sender, instance, created, **kwargs):
+    if created or instance._saved_tags != instance.tags:
+        question_bank.sync_tags(instance, created=created)
+        instance._saved_tags = instance.tags
+    if created or instance._saved_prompt != instance.prompt:
+        similarity.index_entries([(instance.pk, instance.prompt)])
+        instance._saved_prompt = instance.prompt
+    question_bank.reindex_entries([instance.pk])
+
+
+@receiver(post_delete, sender=QuestionBankEntry)
+def unindex_bank_entry(sender, instance, **kwargs):
+    question_bank.remove_entries([instance.pk])
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def refresh_instructor_courses(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        return
+    if update_fields is not None and not INSTRUCTOR_DISPLAY_FIELDS.intersection(update_fields):
+        return
+    search.reindex_courses(instructor_id=instance.pk)
+    # Course payloads embed the instructor's name.
+    outline.bump_content_version(instructor=instance.pk)
+
+
+def outline_content_saved(sender, instance, created, **kwargs):
+    if sender is Course:
+        if created:
+            return
+        instance.content_updated_at = outline.bump_content_version(pk=instance.pk)
+        instance.content_version += 1
+        return
+    outline.bump_content_version(**outline.course_filter_for(instance))
+
+
+def outline_content_deleted(sender, instance, origin=None, **kwargs):
+    outline.bump_for_deleted(instance, origin)
+
+
+for outline_model in OUTLINE_MODELS:
+    post_save.connect(outline_content_saved, sender=outline_model, dispatch_uid=f'outline-save-{outline_model.__name__}')
+    post_delete.connect(outline_content_deleted, sender=outline_model, dispatch_uid=f'outline-delete-{outline_model.__name__}')
+
+
+def _deleted_with(origin, model):
+    """Whether a delete cascaded from a ``model`` instance or queryset."""
+    if isinstance(origin, QuerySet):
+        return origin.model is model
+    return isinstance(origin, model)
+
+
+def _deleted_with_course(origin):
+    """Whether a delete cascaded from a course, whose stats row goes with it."""
+    return _deleted_with(origin, Course)
+
+
+def _first_of_cascade(origin, key):
+    """
+    Whether this is the first row deleted by ``origin`` for ``key``.
+
+    Every row of a model is gone before its post_delete signals are sent, so
+    work covering all of them only needs to run once per delete.
+    """
+    if origin is None:
+        return True
+    seen = origin.__dict__.setdefault('_curriculum_refreshed', set())
+    if key in seen:
+        return False
+    seen.add(key)
+    return True
+
+
+@receiver(pre_delete, sender=Course)
+def remember_deleted_course(sender, instance, origin=None, **kwargs):
+    # Every pre_delete of a cascade is sent before its first post_delete.
+    if origin is not None:
+        origin.__dict__.setdefault('_deleted_course_ids', set()).add(instance.pk)
+
+
+@receiver(post_save, sender=Course)
+def create_course_stats(sender, instance, created, **kwargs):
+    if created:
+        CourseStats.objects.get_or_create(course=instance)
+
+
+@receiver(post_init, sender=Enrollment)
+def remember_enrollment_progress(sender, instance, **kwargs):
+    instance._stats_progress = instance.__dict__.get('progress')
+
+
+@receiver(post_save, sender=Enrollment)
+def count_enrollment(sender, instance, created, **kwargs):
+    previous = 0 if created else instance._stats_progress
+    if previous is None:
+        return
+    stats.apply_deltas(
+        {'pk': instance.course_id},
+        enrollment_count=1 if created else 0,
+        progress_total=instance.progress - previous,
+        completed_enrollment_count=(instance.progress >= 100) - (previous >= 100),
+    )
+    instance._stats_progress = instance.progress
+
+
+@receiver(post_delete, sender=Enrollment)
+def uncount_enrollment(sender, instance, origin=None, **kwargs):
+    if _deleted_with_course(origin):
+        return
+    stats.apply_deltas(
+        {'pk': instance.course_id},
+        heal=False,
+        enrollment_count=-1,
+        progress_total=-instance.progress,
+        completed_enrollment_count=-(instance.progress >= 100),
+    )
+
+
+@receiver(post_save, sender=LessonProgress)
+def count_lesson_completion(sender, instance, created, **kwargs):
+    if not created:
+        return
+    if instance.lesson.is_published:
+        progress.record_lesson_completions(instance.enrollment_id, 1)
+    else:
+        # Unpublished lessons are left out of progress until they are published.
+        stats.apply_deltas({'enrollments': instance.enrollment_id}, lesson_completion_count=1)
+
+
+@receiver(post_delete, sender=LessonProgress)
+def uncount_lesson_completion(sender, instance, origin=None, **kwargs):
+    if _deleted_with_course(origin) or getattr(origin, 'progress_recounted', False):
+        return
+    if _deleted_with(origin, Lesson) or _deleted_with(origin, CourseModule):
+        # lesson_deleted recounts the whole course.
+        return
+    if origin is not None and not _deleted_with(origin, LessonProgress):
+        # Cascades from an enrollment or a student take the enrollment too,
+        # and its own delete removes its progress from the stats.
+        stats.apply_deltas({'enrollments': instance.enrollment_id}, heal=False, lesson_completion_count=-1)
+        return
+    if instance.lesson.is_published:
+        progress.record_lesson_completions(instance.enrollment_id, -1, heal=False)
+    else:
+        stats.apply_deltas({'enrollments': instance.enrollment_id}, heal=False, lesson_completion_count=-1)
+
+
+@receiver(post_init, sender=Lesson)
+def remember_lesson_published(sender, instance, **kwargs):
+    instance._was_published = instance.__dict__.get('is_published')
+
+
+@receiver(post_save, sender=Lesson)
+def lesson_publish_state_changed(sender, instance, created, **kwargs):
+    was_published = False if created else instance._was_published
+    instance._was_published = instance.is_published
+    if was_published is not None and was_published != instance.is_published:
+        progress.refresh_course_progress(instance.module.course_id)
+
+
+@receiver(post_init, sender=Assignment)
+def remember_due_date(sender, instance, **kwargs):
+    instance._saved_due_date = instance.__dict__.get('due_date')
+
+
+@receiver(post_save, sender=Assignment)
+def due_date_changed(sender, instance, created, **kwargs):
+    saved_due_date = instance._saved_due_date
+    instance._saved_due_date = instance.due_date
+    if not created and saved_due_date != instance.due_date:
+        assignments.refresh_lateness([instance.pk])
+
+
+@receiver(post_delete, sender=Lesson)
+def lesson_deleted(sender, instance, origin=None, **kwargs):
+    if _deleted_with_course(origin) or not _first_of_cascade(origin, instance.module_id):
+        return
+    course_id = instance.module.course_id
+    if course_id in getattr(origin, '_deleted_course_ids', ()):
+        # The course goes in the same cascade, e.g. with its instructor.
+        return
+    # Lesson progress removed with the lessons is recounted here as well.
+    progress.refresh_course_progress(course_id)
+
+
+@receiver(post_init, sender=QuizSubmission)
+def remember_quiz_score(sender, instance, **kwargs):
+    score = instance.__dict__.get('score')
+    instance._stats_score = None if score is None else Decimal(str(score))
+
+
+@receiver(post_save, sender=QuizSubmission)
+def count_quiz_submission(sender, instance, created, **kwargs):
+    previous = 0 if created else instance._stats_score
+    if previous is None:
+        return
+    score = Decimal(str(instance.score))
+    stats.apply_deltas(
+        {'modules__quizzes': instance.quiz_id},
+        quiz_submission_count=1 if created else 0,
+        quiz_score_total=score - previous,
+    )
+    instance._stats_score = score
+
+
+@receiver(post_delete, sender=QuizSubmission)
+def uncount_quiz_submission(sender, instance, origin=None, **kwargs):
+    if not _deleted_with_course(origin):
+        stats.apply_deltas(
+            {'modules__quizzes': instance.quiz_id},
+            heal=False,
+            quiz_submission_count=-1,
+            quiz_score_total=-Decimal(str(instance.score)),
+        )
+
+
+@receiver(post_save, sender=AssignmentSubmission)
+def count_assignment_submission(sender, instance, created, **kwargs):
+    if created:
+        stats.apply_deltas({'modules__assignments': instance.assignment_id}, assignment_submission_count=1)
+
+
+@receiver(post_delete, sender=AssignmentSubmission)
+def uncount_assignment_submission(sender, instance, origin=None, **kwargs):
+    if not _deleted_with_course(origin):
+        stats.apply_deltas(
+            {'modules__assignments': instance.assignment_id}, heal=False, assignment_submission_count=-1
+        )
+
+
+@receiver(post_save, sender=QuizSubmission)
+def grade_quiz_attempt(sender, instance, **kwargs):
+    gradebook.refresh_quiz_entries([(instance.quiz_id, instance.student_id)])
+
+
+@receiver(post_delete, sender=QuizSubmission)
+def ungrade_quiz_attempt(sender, instance, origin=None, **kwargs):
+    # Cascades from a quiz, course or student take the gradebook entries with them.
+    if origin is None or _deleted_with(origin, QuizSubmission):
+        gradebook.refresh_quiz_entries([(instance.quiz_id, instance.student_id)])
+
+
+@receiver(post_init, sender=Assignment)
+def remember_max_points(sender, instance, **kwargs):
+    instance._saved_max_points = instance.__dict__.get('max_points')
+
+
+@receiver(post_save, sender=Assignment)
+def max_points_changed(sender, instance, created, **kwargs):
+    saved_max_points = instance._saved_max_points
+    instance._saved_max_points = instance.max_points
+    if not created and saved_max_points != instance.max_points:
+        gradebook.refresh_assignment(instance.pk)
+
+
+@receiver(post_save, sender=AssignmentSubmission)
+def grade_assignment_submission(sender, instance, **kwargs):
+    gradebook.refresh_assignment_entries([instance.pk])
+
+
+@receiver(post_delete, sender=AssignmentSubmission)
+def ungrade_assignment_submission(sender, instance, origin=None, **kwargs):
+    if origin is None or _deleted_with(origin, AssignmentSubmission):
+        gradebook.remove_assignment_entry(instance.assignment_id, instance.student_id)
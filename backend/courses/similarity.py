@@ -0,0 +1,172 @@
+"""
+Near-duplicate detection for question bank prompts.
+
+Each prompt is normalised, cut into character shingles and reduced to a
+MinHash signature: for each of ``NUM_PERM`` hash functions, the smallest
+hash of any shingle. The share of equal positions in two signatures
+estimates the Jaccard similarity of their shingle sets. The signature is
+also split into ``BANDS`` bands, each hashed to a ``QuestionBankBucket``
+key. Two prompts share a bucket with high probability when they are
+similar and rarely otherwise, so candidates come from an indexed key lookup
+rather than from comparing every pair. ``courses.signals`` reindexes an
+entry when its prompt changes.
+"""
+import hashlib
+import random
+import re
+from array import array
+from itertools import groupby
+
+from .models import QuestionBankBucket, QuestionBankSignature
+
+SHINGLE_SIZE = 5
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+DEFAULT_THRESHOLD = 0.7
+INDEX_BATCH_SIZE = 1000
+
+_PRIME = (1 << 61) - 1
+_random = random.Random(20240611)
+_PERMUTATIONS = [(_random.randrange(1, _PRIME), _random.randrange(_PRIME)) for _ in range(NUM_PERM)]
+
+
+def normalize_prompt(text):
+    return ' '.join(re.findall(r'\w+', (text or '').lower()))
+
+
+def shingles(text):
+    text = normalize_prompt(text)
+    if len(text) <= SHINGLE_SIZE:
+        return {text} if text else set()
+    return {text[index:index + SHINGLE_SIZE] for index in range(len(text) - SHINGLE_SIZE + 1)}
+
+
+def signature(text):
+    """The MinHash signature of ``text`` as an ``array('q')``, or ``None`` for an empty prompt."""
+    hashes = [
+        int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=8).digest(), 'little')
+        for shingle in shingles(text)
+    ]
+    if not hashes:
+        return None
+    return array('q', (min((a * value + b) % _PRIME for value in hashes) for a, b in _PERMUTATIONS))
+
+
+def band_keys(minhash):
+    keys = []
+    for band in range(BANDS):
+        rows = minhash[band * ROWS:(band + 1) * ROWS]
+        digest = hashlib.blake2b(band.to_bytes(2, 'little') + rows.tobytes(), digest_size=8).digest()
+        keys.append(int.from_bytes(digest, 'little', signed=True))
+    return keys
+
+
+def similarity(first, second):
+    """Estimated Jaccard similarity of two signatures."""
+    return sum(a == b for a, b in zip(first, second)) / NUM_PERM
+
+
+def index_entries(entries):
+    """Replace the signatures and buckets of ``(entry_id, prompt)`` pairs."""
+    entries = list(entries)
+    if not entries:
+        return
+    entry_ids = [entry_id for entry_id, _ in entries]
+    QuestionBankBucket.objects.filter(entry_id__in=entry_ids).delete()
+    QuestionBankSignature.objects.filter(entry_id__in=entry_ids).delete()
+    signatures, buckets = [], []
+    for entry_id, prompt in entries:
+        minhash = signature(prompt)
+        if minhash is None:
+            continue
+        signatures.append(QuestionBankSignature(entry_id=entry_id, minhash=minhash.tobytes()))
+        buckets += [QuestionBankBucket(entry_id=entry_id, key=key) for key in band_keys(minhash)]
+    QuestionBankSignature.objects.bulk_create(signatures)
+    QuestionBankBucket.objects.bulk_create(buckets, batch_size=INDEX_BATCH_SIZE)
+
+
+def rebuild_index(entries):
+    """Reindex every entry in the ``entries`` queryset, a batch at a time."""
+    batch = []
+    for row in entries.order_by().values_list('id', 'prompt').iterator(chunk_size=INDEX_BATCH_SIZE):
+        batch.append(row)
+        if len(batch) >= INDEX_BATCH_SIZE:
+            index_entries(batch)
+            batch = []
+    index_entries(batch)
+
+
+def similar_entries(entry, queryset, threshold=DEFAULT_THRESHOLD):
+    """``[(entry_id, similarity)]`` for entries of ``queryset`` like ``entry``, most similar first."""
+    try:
+        minhash = _load(QuestionBankSignature.objects.values_list('minhash', flat=True).get(entry=entry))
+    except QuestionBankSignature.DoesNotExist:
+        return []
+    candidates = (
+        QuestionBankBucket.objects.filter(key__in=band_keys(minhash), entry__in=queryset.order_by().values('pk'))
+        .exclude(entry=entry)
+        .values('entry')
+    )
+    matches = [
+        (entry_id, similarity(minhash, _load(blob)))
+        for entry_id, blob in QuestionBankSignature.objects.filter(entry__in=candidates).values_list('entry', 'minhash')
+    ]
+    return sorted(
+        [(entry_id, score) for entry_id, score in matches if score >= threshold],
+        key=lambda match: (-match[1], match[0]),
+    )
+
+
+def duplicate_groups(queryset, threshold=DEFAULT_THRESHOLD):
+    """
+    Group the entries of ``queryset`` whose prompts are near-duplicates.
+
+    Entries sharing a bucket are compared with the bucket's first entry and
+    merged when similar enough, so the work grows with the number of bucket
+    rows rather than with the number of pairs. Returns lists of
+    ``(entry_id, similarity to the group's first entry)``, smallest ids first.
+    """
+    entry_ids = queryset.order_by().values('pk')
+    signatures = {
+        entry_id: _load(blob)
+        for entry_id, blob in QuestionBankSignature.objects.filter(entry__in=entry_ids)
+        .values_list('entry', 'minhash')
+        .iterator(chunk_size=INDEX_BATCH_SIZE)
+    }
+    parents = {}
+
+    def find(entry_id):
+        root = entry_id
+        while parents.get(root, root) != root:
+            root = parents[root]
+        while entry_id != root:
+            parents[entry_id], entry_id = root, parents[entry_id]
+        return root
+
+    rows = (
+        QuestionBankBucket.objects.filter(entry__in=entry_ids)
+        .order_by('key', 'entry')
+        .values_list('key', 'entry')
+        .iterator(chunk_size=INDEX_BATCH_SIZE)
+    )
+    for _, bucket in groupby(rows, key=lambda row: row[0]):
+        head, *others = [entry_id for _, entry_id in bucket]
+        for entry_id in others:
+            head_root, root = find(head), find(entry_id)
+            if head_root != root and similarity(signatures[head], signatures[entry_id]) >= threshold:
+                parents[max(head_root, root)] = min(head_root, root)
+
+    groups = {}
+    for entry_id in parents:
+        groups.setdefault(find(entry_id), set()).add(entry_id)
+    return [
+        [(entry_id, similarity(signatures[root], signatures[entry_id])) for entry_id in sorted(members | {root})]
+        for root, members in sorted(groups.items())
+    ]
+
+
+def _load(blob):
+    minhash = array('q')
+    minhash.frombytes(bytes(blob))
+    return minhash
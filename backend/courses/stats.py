@@ -0,0 +1,152 @@
+"""
+Maintenance of the denormalized ``CourseStats`` counters.
+
+``courses.signals`` applies F-expression deltas as enrollments, lesson
+progress and submissions change. ``compute_course_stats`` recomputes the same
+numbers from the source tables, which the ``rebuild_course_stats`` command
+uses to rebuild counters and report drift.
+"""
+from decimal import Decimal
+
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from .models import (
+    Course,
+    CourseStats,
+    Enrollment,
+    Lesson,
+    LessonProgress,
+    QuizSubmission,
+    AssignmentSubmission,
+)
+
+COUNTER_FIELDS = (
+    'enrollment_count',
+    'completed_enrollment_count',
+    'progress_total',
+    'published_lesson_count',
+    'lesson_completion_count',
+    'quiz_submission_count',
+    'quiz_score_total',
+    'assignment_submission_count',
+)
+
+
+def apply_deltas(course_filter, heal=True, **deltas):
+    """
+    Add ``deltas`` to the stats of the courses matching ``course_filter``.
+
+    When no stats row exists yet and ``heal`` is set, the row is rebuilt from
+    the source tables instead (which already include the change).
+    """
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    changes = {field: F(field) + delta for field, delta in deltas.items()}
+    updated = stats_for(course_filter).update(updated_at=timezone.now(), **changes)
+    if not updated and heal:
+        rebuild_course_stats(Course.objects.filter(**course_filter).values_list('pk', flat=True))
+
+
+def compute_course_stats(course_ids=None):
+    """Recompute every counter from the source tables, keyed by course id."""
+    courses = Course.objects.all()
+    if course_ids is not None:
+        courses = courses.filter(pk__in=list(course_ids))
+    results = {
+        course_id: {field: 0 for field in COUNTER_FIELDS}
+        for course_id in courses.values_list('pk', flat=True)
+    }
+    if not results:
+        return results
+    ids = list(results)
+
+    def merge(rows):
+        for row in rows:
+            course_id = row.pop('course_id')
+            results[course_id].update({field: value or 0 for field, value in row.items()})
+
+    merge(
+        Enrollment.objects.filter(course_id__in=ids)
+        .values('course_id')
+        .annotate(
+            enrollment_count=Count('pk'),
+            completed_enrollment_count=Count('pk', filter=Q(progress__gte=100)),
+            progress_total=Sum('progress'),
+        )
+        .order_by()
+    )
+    merge(
+        Lesson.objects.filter(module__course_id__in=ids, is_published=True)
+        .values(course_id=F('module__course_id'))
+        .annotate(published_lesson_count=Count('pk'))
+        .order_by()
+    )
+    merge(
+        LessonProgress.objects.filter(enrollment__course_id__in=ids)
+        .values(course_id=F('enrollment__course_id'))
+        .annotate(lesson_completion_count=Count('pk'))
+        .order_by()
+    )
+    merge(
+        QuizSubmission.objects.filter(quiz__module__course_id__in=ids)
+        .values(course_id=F('quiz__module__course_id'))
+        .annotate(quiz_submission_count=Count('pk'), quiz_score_total=Sum('score'))
+        .order_by()
+    )
+    merge(
+        AssignmentSubmission.objects.filter(assignment__module__course_id__in=ids)
+        .values(course_id=F('assignment__module__course_id'))
+        .annotate(assignment_submission_count=Count('pk'))
+        .order_by()
+    )
+    for counters in results.values():
+        counters['quiz_score_total'] = Decimal(counters['quiz_score_total']).quantize(Decimal('0.01'))
+    return results
+
+
+def course_stats_drift(course_ids=None):
+    """
+    Compare stored counters with the source tables.
+
+    Returns ``(course_id, field, stored, actual)`` tuples; ``stored`` is
+    ``None`` when the course has no stats row.
+    """
+    expected = compute_course_stats(course_ids)
+    stored = {
+        row['course_id']: row
+        for row in CourseStats.objects.filter(course_id__in=list(expected)).values('course_id', *COUNTER_FIELDS)
+    }
+    drift = []
+    for course_id, counters in expected.items():
+        row = stored.get(course_id)
+        for field in COUNTER_FIELDS:
+            current = row[field] if row else None
+            if current != counters[field]:
+                drift.append((course_id, field, current, counters[field]))
+    return drift
+
+
+def rebuild_course_stats(course_ids=None):
+    expected = compute_course_stats(course_ids)
+    now = timezone.now()
+    CourseStats.objects.bulk_create(
+        [CourseStats(course_id=course_id, updated_at=now, **counters) for course_id, counters in expected.items()],
+        update_conflicts=True,
+        unique_fields=['course'],
+        update_fields=[*COUNTER_FIELDS, 'updated_at'],
+        batch_size=500,
+    )
+    return len(expected)
+
+
+def ensure_course_stats(courses):
+    """Build stats rows for any of ``courses`` that predate them."""
+    missing = list(courses.filter(stats__isnull=True).values_list('pk', flat=True))
+    if missing:
+        rebuild_course_stats(missing)
+
+
+def stats_for(course_filter):
+    return CourseStats.objects.filter(**{f'course__{key}': value for key, value in course_filter.items()})
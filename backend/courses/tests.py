@@ -0,0 +1,1498 @@
+import datetime
+import io
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient, APITestCase
+
+from accounts.models import User
+from .models import (
+    Course,
+    CourseModule,
+    Lesson,
+    Assignment,
+    AssignmentSubmission,
+    Quiz,
+    QuizQuestion,
+    QuizChoice,
+    QuizSubmission,
+    QuizSubmissionAnswer,
+    QuizAttemptCounter,
+    GradebookEntry,
+    QuestionBankEntry,
+    QuestionBankTag,
+    Enrollment,
+    LessonProgress,
+    Wishlist,
+    CourseStats,
+    LessonPlayback,
+)
+
+
+class CourseListQueryCountTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.instructor = User.objects.create_user(
+            'instructor', 'instructor@example.com', 'password', role='instructor'
+        )
+        cls.student = User.objects.create_user(
+            'student', 'student@example.com', 'password', role='student'
+        )
+        for index in range(20):
+            course = Course.objects.create(
+                title=f'Course {index}',
+                description='Description',
+                instructor=cls.instructor,
+                status='published',
+            )
+            module = CourseModule.objects.create(course=course, title='Module', order=1)
+            Lesson.objects.create(module=module, title='Lesson', order=1)
+            if index % 2:
+                Enrollment.objects.create(student=cls.student, course=course)
+            else:
+                Wishlist.objects.create(student=cls.student, course=course)
+
+    def test_anonymous_list(self):
+        # count + page
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/courses/')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(any(course['is_enrolled'] for course in response.data['results']))
+
+    def test_student_list(self):
+        self.client.force_authenticate(self.student)
+        # enrolled ids + wishlist ids + count + page
+        with self.assertNumQueries(4):
+            response = self.client.get('/api/courses/')
+        self.assertEqual(response.status_code, 200)
+        results = response.data['results']
+        self.assertEqual(sum(course['is_enrolled'] for course in results), 10)
+        self.assertEqual(sum(course['is_in_wishlist'] for course in results), 10)
+
+    def test_instructor_list(self):
+        self.client.force_authenticate(self.instructor)
+        with self.assertNumQueries(4):
+            response = self.client.get('/api/courses/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_fields_without_flags_skip_flag_queries(self):
+        self.client.force_authenticate(self.student)
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/courses/?fields=id,title')
+        self.assertEqual(set(response.data['results'][0]), {'id', 'title'})
+
+    def test_default_list_is_compact(self):
+        course = self.client.get('/api/courses/').data['results'][0]
+        self.assertEqual(
+            set(course),
+            {'id', 'title', 'thumbnail', 'price', 'category', 'instructor', 'is_enrolled', 'is_in_wishlist'},
+        )
+
+    def test_expand_adds_optional_and_nested_fields(self):
+        course = self.client.get('/api/courses/?expand=description,status,modules').data['results'][0]
+        self.assertEqual((course['description'], course['status']), ('Description', 'published'))
+        self.assertEqual([module['title'] for module in course['modules']], ['Module'])
+        self.assertNotIn('created_at', course)
+
+        course = self.client.get('/api/courses/?fields=id,description,updated_at').data['results'][0]
+        self.assertEqual(set(course), {'id', 'description', 'updated_at'})
+
+
+class CursorPaginationTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.instructor = User.objects.create_user(
+            'instructor', 'instructor@example.com', 'password', role='instructor'
+        )
+        cls.course_ids = [
+            Course.objects.create(
+                title=f'Course {index}', description='', instructor=cls.instructor, status='published'
+            ).id
+            for index in range(45)
+        ]
+        # Identical timestamps force the id tie-breaker to do the work.
+        Course.objects.update(created_at=Course.objects.first().created_at)
+
+    def test_walks_every_row_once_without_count(self):
+        seen = []
+        url = '/api/courses/?pagination=cursor&fields=id'
+        while url:
+            with self.assertNumQueries(1):
+                response = self.client.get(url)
+            self.assertNotIn('count', response.data)
+            seen.extend(course['id'] for course in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(seen, sorted(self.course_ids, reverse=True))
+
+    def test_previous_link_returns_prior_page(self):
+        first = self.client.get('/api/courses/?pagination=cursor&fields=id').data
+        second = self.client.get(first['next']).data
+        back = self.client.get(second['previous']).data
+        self.assertEqual(back['results'], first['results'])
+        self.assertIsNone(back['previous'])
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/courses/?cursor=garbage')
+        self.assertEqual(response.status_code, 404)
+
+    def test_response_schema_keeps_count_for_page_numbers(self):
+        from learning_platform.pagination import KeysetPagination
+
+        schema = KeysetPagination().get_paginated_response_schema({'type': 'array'})
+        self.assertIn('count', schema['properties'])
+
+
+class CourseSearchTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.instructor = User.objects.create_user(
+            'instructor', 'instructor@example.com', 'password', role='instructor', display_name='Ada Lovelace'
+        )
+        cls.title_match = Course.objects.create(
+            title='Django for Beginners', description='Build web apps.',
+            instructor=cls.instructor, status='published',
+        )
+        cls.description_match = Course.objects.create(
+            title='Web Development', description='Covers <b>Django</b> and Flask.',
+            instructor=cls.instructor, status='published',
+        )
+        cls.other = Course.objects.create(
+            title='Watercolour Basics', description='Painting.', category='Art',
+            instructor=cls.instructor, status='published',
+        )
+
+    def search(self, text):
+        response = self.client.get('/api/courses/', {'search': text})
+        self.assertEqual(response.status_code, 200)
+        return response.data['results']
+
+    def test_ranks_title_matches_first_with_prefix_terms(self):
+        results = self.search('djan')
+        self.assertEqual([course['id'] for course in results], [self.title_match.id, self.description_match.id])
+
+    def test_searches_keep_relevance_order_in_cursor_mode(self):
+        response = self.client.get('/api/courses/', {'search': 'djan', 'pagination': 'cursor'})
+        self.assertEqual(
+            [course['id'] for course in response.data['results']], [self.title_match.id, self.description_match.id]
+        )
+        self.assertEqual(response.data['count'], 2)
+
+    def test_matches_category_and_instructor(self):
+        self.assertEqual([course['id'] for course in self.search('art')], [self.other.id])
+        self.assertEqual(len(self.search('lovelace')), 3)
+
+    def test_highlight_is_escaped(self):
+        highlight = {course['id']: course['search_highlight'] for course in self.search('django')}
+        self.assertIn('<mark>Django</mark>', highlight[self.description_match.id])
+        self.assertIn('&lt;b&gt;', highlight[self.description_match.id])
+
+    def test_index_follows_course_and_instructor_changes(self):
+        self.other.title = 'Oil Painting'
+        self.other.save()
+        self.assertEqual([course['id'] for course in self.search('oil')], [self.other.id])
+        self.other.delete()
+        self.assertEqual(self.search('oil'), [])
+
+        self.instructor.display_name = 'Grace Hopper'
+        self.instructor.save()
+        self.assertEqual(len(self.search('hopper')), 2)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'outline-tests'}})
+class CourseOutlineCacheTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.instructor = User.objects.create_user(
+            'instructor', 'instructor@example.com', 'password', role='instructor'
+        )
+        cls.student = User.objects.create_user(
+            'student', 'student@example.com', 'password', role='student'
+        )
+        cls.course = Course.objects.create(
+            title='Course', description='', instructor=cls.instructor, status='published'
+        )
+        cls.module = CourseModule.objects.create(course=cls.course, title='Module', order=1)
+        cls.lessons = [
+            Lesson.objects.create(module=cls.module, title=f'Lesson {index}', order=index)
+            for index in range(1, 4)
+        ]
+        cls.quiz = Quiz.objects.create(module=cls.module, title='Quiz')
+        cls.question = QuizQuestion.objects.create(quiz=cls.quiz, prompt='Q', question_type='multiple_choice')
+        cls.choice = QuizChoice.objects.create(question=cls.question, text='A', is_correct=True)
+        enrollment = Enrollment.objects.create(student=cls.student, course=cls.course)
+        LessonProgress.objects.create(enrollment=enrollment, lesson=cls.lessons[0])
+
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()
+
+    def get_modules(self):
+        response = self.client.get(f'/api/courses/{self.course.id}/')
+        self.assertEqual(response.status_code, 200)
+        return response.data['modules']
+
+    def test_warm_outline_skips_tree_queries(self):
+        self.get_modules()
+        # course row only
+        with self.assertNumQueries(1):
+            modules = self.get_modules()
+        self.assertEqual(len(modules[0]['lessons']), 3)
+
+    def test_content_changes_invalidate_outline(self):
+        self.get_modules()
+        self.choice.text = 'Updated'
+        self.choice.save()
+        self.assertEqual(self.get_modules()[0]['quizzes'][0]['questions'][0]['choices'][0]['text'], 'Updated')
+
+        self.lessons[2].delete()
+        self.assertEqual(len(self.get_modules()[0]['lessons']), 2)
+
+    def test_queryset_delete_bumps_version_once(self):
+        version = Course.objects.get(pk=self.course.pk).content_version
+        self.module.lessons.all().delete()
+        self.assertEqual(Course.objects.get(pk=self.course.pk).content_version, version + 1)
+
+    def test_completion_is_overlaid_per_user(self):
+        self.assertFalse(any(lesson['is_completed'] for lesson in self.get_modules()[0]['lessons']))
+        self.client.force_authenticate(self.student)
+        completed = [lesson['is_completed'] for lesson in self.get_modules()[0]['lessons']]
+        self.assertEqual(completed, [True, False, False])
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'etag-tests'}})
+class ConditionalReadTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.instructor = User.objects.create_user(
+            'instructor', 'instructor@example.com', 'password', role='instructor'
+        )
+        cls.student = User.objects.create_user(
+            'student', 'student@example.com', 'password', role='student'
+        )
+        cls.course = Course.objects.create(
+            title='Course', description='', instructor=cls.instructor, status='published'
+        )
+        cls.module = CourseModule.objects.create(course=cls.course, title='Module', order=1)
+        cls.lesson = Lesson.objects.create(module=cls.module, title='Lesson', order=1)
+        cls.enrollment = Enrollment.objects.create(student=cls.student, course=cls.course)
+
+    def test_course_detail_revalidates_without_serializing(self):
+        url = f'/api/courses/{self.course.id}/'
+        response = self.client.get(url)
+        self.assertIn('Last-Modified', response)
+        etag = response['ETag']
+
+        # course row only; no outline, flag or serializer work
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.lesson.title = 'Renamed'
+        self.lesson.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_lists_revalidate_by_etag_only(self):
+        other = Course.objects.create(title='Other', description='', instructor=self.instructor, status='published')
+        response = self.client.get('/api/courses/')
+        self.assertNotIn('Last-Modified', response)
+        etag = response['ETag']
+
+        other.status = 'draft'
+        other.save()
+        future = 'Fri, 01 Jan 2100 00:00:00 GMT'
+        self.assertEqual(self.client.get('/api/courses/', HTTP_IF_MODIFIED_SINCE=future).status_code, 200)
+        response = self.client.get('/api/courses/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([course['id'] for course in response.data['results']], [self.course.id])
+
+    def test_list_etag_tracks_user_state(self):
+        self.client.force_authenticate(self.student)
+        url = f'/api/lessons/?module={self.module.id}'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        LessonProgress.objects.create(enrollment=self.enrollment, lesson=self.lesson)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['results'][0]['is_completed'])
+        self.assertNotIn('Last-Modified', response)
+
+
+class CourseStatsTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin', 'admin@example.com', 'password', role='admin')
+        cls.instructor = User.objects.create_user(
+            'instructor', 'instructor@example.com', 'password', role='instructor'
+        )
+        cls.student = User.objects.create_user(
+            'student', 'student@example.com', 'password', role='student'
+        )
+        cls.course = Course.objects.create(
+            title='Course', description='', instructor=cls.instructor, status='published', price=10
+        )
+        cls.module = CourseModule.objects.create(course=cls.course, title='Module', order=1)
+        cls.lessons = [
+            Lesson.objects.create(module=cls.module, title=f'Lesson {index}', order=index)
+            for index in (1, 2)
+        ]
+        cls.quiz = Quiz.objects.create(module=cls.module, title='Quiz', attempts_allowed=3)
+        question = QuizQuestion.objects.create(quiz=cls.quiz, prompt='Q', question_type='multiple_choice')
+        cls.correct = QuizChoice.objects.create(question=question, text='A', is_correct=True)
+        cls.question = question
+
+    def assertNoDrift(self):
+        from .stats import course_stats_drift
+
+        self.assertEqual(course_stats_drift(), [])
+
+    def test_counters_follow_student_activity(self):
+        self.client.force_authenticate(self.student)
+        self.client.post(f'/api/courses/{self.course.id}/enroll/')
+        self.client.post(f'/api/lessons/{self.lessons[0].id}/complete/')
+        submission = QuizSubmission.objects.create(quiz=self.quiz, student=self.student)
+        submission.score = 100
+        submission.save(update_fields=['score'])
+
+        stats = Course.objects.get(pk=self.course.pk).stats
+        self.assertEqual(stats.enrollment_count, 1)
+        self.assertEqual(stats.progress_total, 50)
+        self.assertEqual(stats.lesson_completion_count, 1)
+        self.assertEqual(stats.quiz_submission_count, 1)
+        self.assertEqual(stats.average_quiz_score, 100.0)
+        self.assertEqual(stats.published_lesson_count, 2)
+        self.assertNoDrift()
+
+        self.lessons[1].is_published = False
+        self.lessons[1].save()
+        self.client.post(f'/api/lessons/{self.lessons[0].id}/uncomplete/')
+        Enrollment.objects.filter(student=self.student).delete()
+        self.assertNoDrift()
+
+    def test_analytics_use_stats(self):
+        Enrollment.objects.create(student=self.student, course=self.course)
+        self.client.force_authenticate(self.admin)
+        summary = self.client.get('/api/analytics/admin/').data['summary']
+        self.assertEqual(summary['total_enrollments'], 1)
+        self.assertEqual(summary['estimated_revenue'], 10.0)
+
+        self.client.force_authenticate(self.instructor)
+        courses = self.client.get('/api/analytics/instructor/').data['courses']
+        self.assertEqual(courses[0]['enrollments'], 1)
+        self.assertEqual(courses[0]['revenue'], 10.0)
+
+
+class LessonProgressCounterTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        instructor = User.objects.create_user('instructor', 'instructor@example.com', 'password', role='instructor')
+        cls.student = User.objects.create_user('student', 'student@example.com', 'password', role='student')
+        cls.course = Course.objects.create(title='Course', description='', instructor=instructor, status='published')
+        module = CourseModule.objects.create(course=cls.course, title='Module', order=1)
+        cls.lessons = [
+            Lesson.objects.create(module=module, title=f'Lesson {index}', order=index) for index in (1, 2, 3)
+        ]
+        cls.enrollment = Enrollment.objects.create(student=cls.student, course=cls.course)
+
+    def setUp(self):
+        self.client.force_authenticate(self.student)
+
+    def test_complete_updates_counters_without_aggregates(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(f'/api/lessons/{self.lessons[0].id}/complete/')
+        self.assertEqual(response.data['enrollment']['progress'], 33)
+        self.assertEqual(response.data['enrollment']['completed_lesson_count'], 1)
+        writes = [query['sql'] for query in queries if query['sql'].startswith('UPDATE')]
+        self.assertFalse(any('COUNT(' in sql for sql in writes))
+
+        self.client.post(f'/api/lessons/{self.lessons[1].id}/complete/')
+        self.client.post(f'/api/lessons/{self.lessons[2].id}/complete/')
+        self.client.post(f'/api/lessons/{self.lessons[2].id}/complete/')
+        enrollment = Enrollment.objects.get(pk=self.enrollment.pk)
+        self.assertEqual((enrollment.completed_lesson_count, enrollment.progress), (3, 100))
+        self.assertEqual(CourseStats.objects.get(pk=self.course.pk).completed_enrollment_count, 1)
+
+        response = self.client.post(f'/api/lessons/{self.lessons[2].id}/uncomplete/')
+        self.assertEqual(response.data['enrollment']['progress'], 66)
+        enrollment = Enrollment.objects.get(pk=self.enrollment.pk)
+        enrollment.recalculate_progress()
+        self.assertEqual((enrollment.completed_lesson_count, enrollment.progress), (2, 66))
+
+        from .stats import course_stats_drift
+
+        self.assertEqual(course_stats_drift(), [])
+
+    def test_curriculum_changes_recompute_course_progress(self):
+        from .progress import refresh_course_progress
+
+        other = User.objects.create_user('other', 'other@example.com', 'password', role='student')
+        other_enrollment = Enrollment.objects.create(student=other, course=self.course)
+        for enrollment in (self.enrollment, other_enrollment):
+            LessonProgress.objects.create(enrollment=enrollment, lesson=self.lessons[0])
+
+        def progress():
+            return sorted(Enrollment.objects.filter(course=self.course).values_list('progress', flat=True))
+
+        self.assertEqual(progress(), [33, 33])
+        self.lessons[2].is_published = False
+        self.lessons[2].save()
+        self.assertEqual(progress(), [50, 50])
+
+        Lesson.objects.filter(pk=self.lessons[0].pk).delete()
+        self.assertEqual(progress(), [0, 0])
+        self.assertEqual(CourseStats.objects.get(pk=self.course.pk).lesson_completion_count, 0)
+
+        Enrollment.objects.filter(course=self.course).update(progress=7, completed_lesson_count=7)
+        refresh_course_progress(self.course.pk, chunk_size=1)
+        self.assertEqual(progress(), [0, 0])
+
+        from .stats import course_stats_drift
+
+        self.assertEqual(course_stats_drift(), [])
+
+    def test_unpublishing_a_completed_lesson_keeps_progress_in_range(self):
+        for lesson in self.lessons:
+            LessonProgress.objects.create(enrollment=self.enrollment, lesson=lesson)
+        self.lessons[0].is_published = False
+        self.lessons[0].save()
+
+        enrollment = Enrollment.objects.get(pk=self.enrollment.pk)
+        self.assertEqual((enrollment.completed_lesson_count, enrollment.progress), (2, 100))
+        enrollment.recalculate_progress()
+        self.assertEqual((enrollment.completed_lesson_count, enrollment.progress), (2, 100))
+        self.assertEqual(CourseStats.objects.get(pk=self.course.pk).completed_enrollment_count, 1)
+
+        self.lessons[0].is_published = True
+        self.lessons[0].save()
+        enrollment = Enrollment.objects.get(pk=self.enrollment.pk)
+        self.assertEqual((enrollment.completed_lesson_count, enrollment.progress), (3, 100))
+
+        from .stats import course_stats_drift
+
+        self.assertEqual(course_stats_drift(), [])
+
+    def test_completions_of_unpublished_lessons_are_not_counted(self):
+        self.lessons[2].is_published = False
+        self.lessons[2].save()
+        for lesson in self.lessons:
+            LessonProgress.objects.create(enrollment=self.enrollment, lesson=lesson)
+
+        enrollment = Enrollment.objects.get(pk=self.enrollment.pk)
+        self.assertEqual((enrollment.completed_lesson_count, enrollment.progress), (2, 100))
+        stats = CourseStats.objects.get(pk=self.course.pk)
+        self.assertEqual((stats.completed_enrollment_count, stats.lesson_completion_count), (1, 3))
+
+        LessonProgress.objects.filter(lesson=self.lessons[2]).delete()
+        enrollment = Enrollment.objects.get(pk=self.enrollment.pk)
+        self.assertEqual((enrollment.completed_lesson_count, enrollment.progress), (2, 100))
+
+        from .stats import course_stats_drift
+
+        self.assertEqual(course_stats_drift(), [])
+
+    def test_deleting_a_student_keeps_course_stats_in_step(self):
+        student = User.objects.create_user('leaver', 'leaver@example.com', 'password', role='student')
+        Enrollment.objects.create(student=student, course=self.course)
+        self.client.force_authenticate(student)
+        self.client.post(f'/api/lessons/{self.lessons[0].id}/complete/')
+        self.client.post(f'/api/lessons/{self.lessons[1].id}/complete/')
+
+        student.delete()
+
+        from .stats import course_stats_drift
+
+        self.assertEqual(course_stats_drift(), [])
+
+    def test_deleting_an_instructor_deletes_their_courses(self):
+        instructor = User.objects.create_user('owner', 'owner@example.com', 'password', role='instructor')
+        course = Course.objects.create(title='Owned', description='', instructor=instructor, status='published')
+        module = CourseModule.objects.create(course=course, title='Module', order=1)
+        Lesson.objects.create(module=module, title='Lesson', order=1)
+        Enrollment.objects.create(student=self.student, course=course)
+
+        instructor.delete()
+        self.assertFalse(Course.objects.filter(pk=course.pk).exists())
+        self.assertFalse(CourseStats.objects.filter(pk=course.pk).exists())
+
+        from .stats import course_stats_drift
+
+        self.assertEqual(course_stats_drift(), [])
+
+    def test_completion_state_is_loaded_once_per_request(self):
+        for lesson in self.lessons[:2]:
+            LessonProgress.objects.create(enrollment=self.enrollment, lesson=lesson)
+
+        # Count, lessons, completed lesson ids.
+        with self.assertNumQueries(3):
+            lessons = self.client.get('/api/lessons/', {'module': self.lessons[0].module_id}).data
+        lessons = lessons.get('results', lessons)
+        self.assertEqual([lesson['is_completed'] for lesson in lessons], [True, True, False])
+
+        self.client.get('/api/enrollments/')  # Warm the outline cache.
+        # Count, enrollments, lesson progress, lessons, enrolled and wishlisted courses, completed lesson ids.
+        with self.assertNumQueries(7):
+            enrollments = self.client.get('/api/enrollments/').data
+        enrollments = enrollments.get('results', enrollments)
+        progress = enrollments[0]['lesson_progress']
+        self.assertEqual([record['lesson']['is_completed'] for record in progress], [True, True])
+
+    def test_sync_applies_offline_events_in_one_pass(self):
+        LessonProgress.objects.create(enrollment=self.enrollment, lesson=self.lessons[2])
+        self.lessons[1].is_published = False
+        self.lessons[1].save()
+        response = self.client.post('/api/enrollments/sync/', {
+            'course': self.course.id,
+            'events': [
+                {'lesson': self.lessons[0].id, 'completed': True, 'occurred_at': '2026-01-01T10:00:00Z'},
+                {'lesson': self.lessons[0].id, 'completed': False, 'occurred_at': '2026-01-01T09:00:00Z'},
+                {'lesson': self.lessons[1].id, 'completed': True},
+                {'lesson': self.lessons[2].id, 'completed': False},
+            ],
+        }, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['completed'], [self.lessons[0].id])
+        self.assertEqual(response.data['uncompleted'], [self.lessons[2].id])
+        self.assertEqual(response.data['rejected'], [self.lessons[1].id])
+        self.assertEqual((response.data['progress'], response.data['completed_lesson_count']), (50, 1))
+        record = LessonProgress.objects.get(enrollment=self.enrollment)
+        self.assertEqual(record.completed_at.isoformat(), '2026-01-01T10:00:00+00:00')
+
+        from .stats import course_stats_drift
+
+        self.assertEqual(course_stats_drift(), [])
+
+
+    def test_sync_uncompletes_lessons_unpublished_since(self):
+        LessonProgress.objects.create(enrollment=self.enrollment, lesson=self.lessons[0])
+        self.lessons[0].is_published = False
+        self.lessons[0].save()
+        response = self.client.post('/api/enrollments/sync/', {
+            'course': self.course.id,
+            'events': [{'lesson': self.lessons[0].id, 'completed': False}],
+        }, format='json')
+
+        self.assertEqual(response.data['uncompleted'], [self.lessons[0].id])
+        self.assertFalse(LessonProgress.objects.filter(enrollment=self.enrollment).exists())
+
+        from .stats import course_stats_drift
+
+        self.assertEqual(course_stats_drift(), [])
+
+@override_settings(PLAYBACK_FLUSH_INTERVAL=0, PLAYBACK_BUFFER_SIZE=2)
+class PlaybackHeartbeatTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        instructor = User.objects.create_user('instructor', 'instructor@example.com', 'password', role='instructor')
+        cls.student = User.objects.create_user('student', 'student@example.com', 'password', role='student')
+        course = Course.objects.create(title='Course', description='', instructor=instructor, status='published')
+        module = CourseModule.objects.create(course=course, title='Module', order=1)
+        cls.lessons = [
+            Lesson.objects.create(module=module, title=f'Lesson {index}', order=index) for index in (1, 2, 3)
+        ]
+        cls.enrollment = Enrollment.objects.create(student=cls.student, course=course)
+
+    def setUp(self):
+        from . import playback
+
+        self.buffer = playback.PlaybackBuffer()
+        patcher = mock.patch.object(playback, 'buffer', self.buffer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client.force_authenticate(self.student)
+
+    def heartbeat(self, lesson, position):
+        return self.client.post(f'/api/lessons/{lesson.id}/playback/', {'position_seconds': position}, format='json')
+
+    def test_heartbeats_are_coalesced_and_flushed_in_bulk(self):
+        with self.assertNumQueries(3):
+            for position in (5, 10, 15):
+                self.assertEqual(self.heartbeat(self.lessons[0], position).status_code, 202)
+        self.heartbeat(self.lessons[1], 30)
+        self.heartbeat(self.lessons[2], 45)
+        self.assertEqual(self.buffer.metrics['coalesced'], 2)
+        self.assertEqual(self.buffer.metrics['dropped'], 1)
+
+        # Reads see buffered positions before they are written.
+        self.assertEqual(self.client.get(f'/api/lessons/{self.lessons[0].id}/playback/').data['position_seconds'], 15)
+
+        with self.assertLogs('courses.playback', 'WARNING'):
+            self.assertEqual(self.buffer.flush(), 2)
+        self.assertEqual(
+            dict(LessonPlayback.objects.values_list('lesson_id', 'position_seconds')),
+            {self.lessons[0].id: 15, self.lessons[1].id: 30},
+        )
+        self.assertIsNotNone(Enrollment.objects.get(pk=self.enrollment.pk).last_accessed)
+
+        self.heartbeat(self.lessons[0], 20)
+        self.buffer.flush()
+        self.assertEqual(LessonPlayback.objects.get(lesson=self.lessons[0]).position_seconds, 20)
+        self.assertEqual(self.client.get(f'/api/lessons/{self.lessons[0].id}/playback/').data['position_seconds'], 20)
+
+
+class CourseTransferTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.instructor = User.objects.create_user(
+            'instructor', 'instructor@example.com', 'password', role='instructor'
+        )
+        cls.course = Course.objects.create(
+            title='Source', description='Exported', instructor=cls.instructor, price='12.50', category='Data'
+        )
+        for module_order in (1, 2):
+            module = CourseModule.objects.create(course=cls.course, title=f'Module {module_order}', order=module_order)
+            for lesson_order in (1, 2):
+                Lesson.objects.create(module=module, title=f'Lesson {lesson_order}', order=lesson_order)
+            quiz = Quiz.objects.create(module=module, title='Quiz')
+            question = QuizQuestion.objects.create(quiz=quiz, prompt='Q', question_type='multiple_choice')
+            QuizChoice.objects.create(question=question, text='A', is_correct=True)
+            QuizChoice.objects.create(question=question, text='B')
+
+    def setUp(self):
+        self.client.force_authenticate(self.instructor)
+
+    def export(self):
+        response = self.client.get(f'/api/courses/{self.course.id}/export/')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        return b''.join(response.streaming_content)
+
+    def test_export_round_trips_through_import(self):
+        Course.objects.filter(pk=self.course.pk).update(status='published')
+        body = self.export()
+        self.assertEqual(len(body.splitlines()), 1 + 1 + 2 + 4 + 2 + 2 + 4)
+
+        # Course, then one bulk insert per content model.
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.generic('POST', '/api/courses/import/', body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 201)
+        inserts = [query['sql'] for query in queries if query['sql'].startswith('INSERT INTO "courses_lesson"')]
+        self.assertEqual(len(inserts), 1)
+
+        copy = Course.objects.get(pk=response.data['id'])
+        self.assertNotEqual(copy.pk, self.course.pk)
+        self.assertEqual((copy.title, copy.price, copy.instructor), ('Source', Decimal('12.50'), self.instructor))
+        self.assertEqual(copy.status, 'draft')
+        self.assertEqual(Lesson.objects.filter(module__course=copy).count(), 4)
+        self.assertEqual(
+            sorted(QuizChoice.objects.filter(question__quiz__module__course=copy).values_list('text', 'is_correct')),
+            [('A', True), ('A', True), ('B', False), ('B', False)],
+        )
+        self.assertEqual(copy.stats.published_lesson_count, 4)
+
+    def test_invalid_import_writes_nothing(self):
+        lines = self.export().splitlines()
+        lines.append(b'{"type": "lesson", "id": 999, "parent": 12345, "fields": {"title": "Orphan"}}')
+        response = self.client.generic(
+            'POST', '/api/courses/import/', b'\n'.join(lines), content_type='application/x-ndjson'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('unknown module', response.data['detail'])
+        self.assertEqual(Course.objects.count(), 1)
+
+    def test_import_reports_constraint_violations(self):
+        lines = self.export().splitlines()
+        index, record = next(
+            (index, json.loads(line)) for index, line in enumerate(lines) if json.loads(line).get('type') == 'module'
+        )
+        record['id'] = 999  # A second module with the same order.
+        lines.insert(index + 1, json.dumps(record).encode())
+        response = self.client.generic(
+            'POST', '/api/courses/import/', b'\n'.join(lines), content_type='application/x-ndjson'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('module rows conflict', response.data['detail'])
+        self.assertEqual(Course.objects.count(), 1)
+
+    def test_clone_copies_content_with_one_insert_per_level(self):
+        module = self.course.modules.get(order=1)
+        module.release_date = datetime.date(2026, 1, 5)
+        module.save()
+        Assignment.objects.create(
+            module=module, title='Essay', instructions='Write',
+            due_date=datetime.datetime(2026, 1, 12, tzinfo=datetime.timezone.utc),
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                f'/api/courses/{self.course.id}/clone/', {'title': 'Spring', 'shift_days': 91}, format='json'
+            )
+        self.assertEqual(response.status_code, 201)
+        for table in ('coursemodule', 'lesson', 'assignment', 'quiz', 'quizquestion', 'quizchoice'):
+            inserts = [query for query in queries if query['sql'].startswith(f'INSERT INTO "courses_{table}"')]
+            self.assertEqual(len(inserts), 1, table)
+
+        copy = Course.objects.get(pk=response.data['id'])
+        self.assertEqual((copy.title, copy.status), ('Spring', 'draft'))
+        self.assertEqual(copy.modules.get(order=1).release_date, datetime.date(2026, 4, 6))
+        self.assertEqual(
+            Assignment.objects.get(module__course=copy).due_date,
+            datetime.datetime(2026, 4, 13, tzinfo=datetime.timezone.utc),
+        )
+        self.assertEqual(QuizChoice.objects.filter(question__quiz__module__course=copy, is_correct=True).count(), 2)
+        self.assertEqual(Lesson.objects.filter(module__course=self.course).count(), 4)
+
+
+class QuizNestedUpdateTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.instructor = User.objects.create_user(
+            'instructor', 'instructor@example.com', 'password', role='instructor'
+        )
+        student = User.objects.create_user('student', 'student@example.com', 'password', role='student')
+        course = Course.objects.create(title='Course', description='', instructor=cls.instructor)
+        module = CourseModule.objects.create(course=course, title='Module', order=1)
+        cls.quiz = Quiz.objects.create(module=module, title='Quiz')
+        cls.questions = [
+            QuizQuestion.objects.create(quiz=cls.quiz, prompt=f'Q{order}', question_type='multiple_choice', order=order)
+            for order in (1, 2, 3)
+        ]
+        cls.choices = {
+            question.pk: [
+                QuizChoice.objects.create(question=question, text='right', is_correct=True),
+                QuizChoice.objects.create(question=question, text='wrong'),
+            ]
+            for question in cls.questions
+        }
+        submission = QuizSubmission.objects.create(quiz=cls.quiz, student=student)
+        cls.answer = QuizSubmissionAnswer.objects.create(
+            submission=submission, question=cls.questions[0], selected_choice=cls.choices[cls.questions[0].pk][0]
+        )
+
+    def payload(self, question, **changes):
+        data = {
+            'id': question.pk,
+            'prompt': question.prompt,
+            'question_type': question.question_type,
+            'order': question.order,
+            'points': question.points,
+        }
+        data.update(changes)
+        return data
+
+    def test_update_applies_a_diff_and_keeps_answer_history(self):
+        first, second, third = self.questions
+        right, wrong = self.choices[first.pk]
+        questions = [
+            # Swap the first two questions' order and reword one choice.
+            self.payload(first, order=2, choices=[
+                {'id': right.pk, 'text': 'right!', 'is_correct': True},
+                {'id': wrong.pk, 'text': 'wrong', 'is_correct': False},
+                {'text': 'also wrong', 'is_correct': False},
+            ]),
+            self.payload(second, order=1),
+            {'prompt': 'Q4', 'question_type': 'true_false', 'order': 4, 'choices': [{'text': 'True', 'is_correct': True}]},
+        ]
+        self.client.force_authenticate(self.instructor)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(f'/api/quizzes/{self.quiz.id}/', {'questions': questions}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        writes = [query for query in queries if query['sql'].split()[0] in ('INSERT', 'UPDATE', 'DELETE')]
+        self.assertLess(len(writes), 15)
+
+        self.assertFalse(QuizQuestion.objects.filter(pk=third.pk).exists())
+        self.assertEqual(
+            list(self.quiz.questions.values_list('prompt', 'order')), [('Q2', 1), ('Q1', 2), ('Q4', 4)]
+        )
+        self.answer.refresh_from_db()
+        self.assertEqual(self.answer.selected_choice_id, right.pk)
+        self.assertEqual(QuizChoice.objects.get(pk=right.pk).text, 'right!')
+        self.assertEqual(QuizChoice.objects.filter(question=first).count(), 3)
+        self.assertEqual(QuizChoice.objects.filter(question=second).count(), 2)
+
+    def test_unknown_ids_are_rejected_without_writing(self):
+        other = self.payload(self.questions[0], id=999999, prompt='Changed')
+        self.client.force_authenticate(self.instructor)
+        response = self.client.patch(
+            f'/api/quizzes/{self.quiz.id}/', {'title': 'Renamed', 'questions': [other]}, format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.quiz.refresh_from_db()
+        self.assertEqual(self.quiz.title, 'Quiz')
+        self.assertEqual(self.quiz.questions.count(), 3)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'grading'}})
+class QuizGradingTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        instructor = User.objects.create_user('instructor', 'instructor@example.com', 'password', role='instructor')
+        cls.student = User.objects.create_user('student', 'student@example.com', 'password', role='student')
+        course = Course.objects.create(title='Course', description='', instructor=instructor, status='published')
+        module = CourseModule.objects.create(course=course, title='Module', order=1)
+        Enrollment.objects.create(student=cls.student, course=course)
+        cls.quiz = Quiz.objects.create(module=module, title='Quiz', attempts_allowed=5, passing_score=50)
+        cls.correct = {}
+        for order in range(1, 21):
+            question = QuizQuestion.objects.create(
+                quiz=cls.quiz, prompt=f'Q{order}', question_type='multiple_choice', order=order, points=2
+            )
+            cls.correct[question.pk] = QuizChoice.objects.create(question=question, text='right', is_correct=True)
+            QuizChoice.objects.create(question=question, text='wrong')
+        cls.short = QuizQuestion.objects.create(
+            quiz=cls.quiz, prompt='Explain', question_type='short_answer', order=21, points=10
+        )
+
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()
+        self.client.force_authenticate(self.student)
+
+    def submit(self, answers):
+        return self.client.post('/api/quiz-submissions/', {'quiz_id': self.quiz.id, 'answers': answers}, format='json')
+
+    def test_grading_cost_does_not_grow_with_questions(self):
+        answers = {str(question_id): {'choice': choice.pk} for question_id, choice in self.correct.items()}
+        answers[str(self.short.pk)] = {'text': 'Because.'}
+        first_choice = next(iter(self.correct.values()))
+        # Answering with another question's choice counts as no answer.
+        answers[str(first_choice.question_id)] = {'choice': self.correct[max(self.correct)].pk}
+        self.submit(answers)  # Compiles and caches the answer key.
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.submit(answers)
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertLess(len(queries), 15)
+        self.assertEqual(response.data['score'], '76.00')
+        self.assertTrue(response.data['passed'])
+        self.assertEqual(response.data['attempt_number'], 2)
+        answers = {answer['question']: answer for answer in response.data['answers']}
+        self.assertEqual(len(answers), 21)
+        self.assertIsNone(answers[first_choice.question_id]['selected_choice'])
+        self.assertEqual(answers[self.short.pk]['text_response'], 'Because.')
+
+    def test_answer_key_follows_content_changes(self):
+        question_id, choice = next(iter(self.correct.items()))
+        self.assertEqual(self.submit({str(question_id): {'choice': choice.pk}}).data['score'], '4.00')
+        choice.is_correct = False
+        choice.save()
+        self.assertEqual(self.submit({str(question_id): {'choice': choice.pk}}).data['score'], '0.00')
+
+
+class QuizItemAnalysisTests(APITestCase):
+    # Rows are students, columns whether they answered each question correctly.
+    RESPONSES = [(1, 1, 0), (1, 1, 1), (1, 0, 0), (0, 0, 1), (1, 1, 0)]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.instructor = User.objects.create_user('instructor', 'instructor@example.com', 'password', role='instructor')
+        course = Course.objects.create(title='Course', description='', instructor=cls.instructor, status='published')
+        module = CourseModule.objects.create(course=course, title='Module', order=1)
+        cls.quiz = Quiz.objects.create(module=module, title='Quiz', attempts_allowed=2)
+        cls.questions = []
+        for order in range(1, 4):
+            question = QuizQuestion.objects.create(
+                quiz=cls.quiz, prompt=f'Q{order}', question_type='multiple_choice', order=order
+            )
+            right = QuizChoice.objects.create(question=question, text='right', is_correct=True)
+            wrong = QuizChoice.objects.create(question=question, text='wrong')
+            cls.questions.append((question, right, wrong))
+        QuizQuestion.objects.create(quiz=cls.quiz, prompt='Explain', question_type='short_answer', order=4)
+        cls.students = [
+            User.objects.create_user(f'student{index}', f's{index}@example.com', 'password', role='student')
+            for index in range(len(cls.RESPONSES) + 1)
+        ]
+
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()
+
+    def submit(self, student, row):
+        answers = {
+            str(question.pk): {'choice': (right if correct else wrong).pk}
+            for (question, right, wrong), correct in zip(self.questions, row)
+        }
+        self.client.force_authenticate(student)
+        response = self.client.post('/api/quiz-submissions/', {'quiz_id': self.quiz.id, 'answers': answers}, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+
+    def analyse(self):
+        self.client.force_authenticate(self.instructor)
+        return self.client.get(f'/api/quizzes/{self.quiz.id}/item-analysis/')
+
+    def test_statistics_match_direct_computation(self):
+        for student, row in zip(self.students, self.RESPONSES):
+            self.submit(student, row)
+        self.submit(self.students[0], (0, 0, 0))  # Second attempts are not analysed.
+
+        response = self.analyse()
+        self.assertEqual(response.status_code, 200)
+        report = response.data
+        self.assertEqual(report['submissions'], 5)
+        self.assertEqual([item['difficulty'] for item in report['questions']], [0.8, 0.6, 0.4])
+        first = report['questions'][0]
+        self.assertEqual([(choice['is_correct'], choice['count']) for choice in first['choices']], [(True, 4), (False, 1)])
+
+        totals = [sum(row) for row in self.RESPONSES]
+        n = len(totals)
+
+        def variance(values):
+            mean = sum(values) / n
+            return sum((value - mean) ** 2 for value in values) / n
+
+        def correlation(xs, ys):
+            mean_x, mean_y = sum(xs) / n, sum(ys) / n
+            covariance = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / n
+            return covariance / (variance(xs) * variance(ys)) ** 0.5
+
+        for index, item in enumerate(report['questions']):
+            column = [row[index] for row in self.RESPONSES]
+            rest = [total - x for total, x in zip(totals, column)]
+            self.assertAlmostEqual(item['discrimination'], correlation(column, rest), places=4)
+        columns = list(zip(*self.RESPONSES))
+        alpha = 3 / 2 * (1 - sum(variance(column) for column in columns) / variance(totals))
+        self.assertAlmostEqual(report['cronbach_alpha'], alpha, places=4)
+
+    def test_new_submissions_are_folded_into_cached_sums(self):
+        for student, row in zip(self.students, self.RESPONSES):
+            self.submit(student, row)
+        self.analyse()
+
+        self.submit(self.students[-1], (0, 0, 0))
+        with CaptureQueriesContext(connection) as queries:
+            report = self.analyse().data
+        self.assertEqual(report['submissions'], 6)
+        self.assertEqual(report['questions'][0]['difficulty'], round(4 / 6, 4))
+        # The folded submissions are counted without the answer table, then only
+        # the new submission's answers are read.
+        answer_reads = [query for query in queries if 'courses_quizsubmissionanswer' in query['sql']]
+        self.assertEqual(len(answer_reads), 1)
+
+    def test_attempts_without_analysed_answers_are_folded(self):
+        for student, row in zip(self.students, self.RESPONSES):
+            self.submit(student, row)
+        unanswered = QuizSubmission.objects.create(
+            quiz=self.quiz, student=self.students[-1], attempt_number=1, score=0
+        )
+        self.assertEqual(self.analyse().data['submissions'], 5)
+
+        # The cached sums are not rebuilt: only rows after the unanswered attempt are read.
+        with CaptureQueriesContext(connection) as queries:
+            report = self.analyse().data
+        self.assertEqual(report['submissions'], 5)
+        answer_reads = [query['sql'] for query in queries if 'courses_quizsubmissionanswer' in query['sql']]
+        self.assertEqual(len(answer_reads), 1)
+        self.assertIn(f'"courses_quizsubmission"."id" > {unanswered.pk}', answer_reads[0])
+
+    def test_submissions_below_the_folded_id_trigger_a_rebuild(self):
+        for student, row in zip(self.students, self.RESPONSES):
+            self.submit(student, row)
+        first = QuizSubmission.objects.filter(quiz=self.quiz).order_by('pk').first()
+        first_id, answers = first.pk, list(first.answers.all())
+        first.delete()
+        self.assertEqual(self.analyse().data['submissions'], 4)
+
+        # A submission with a lower id than those already folded becomes visible late.
+        first.pk = first_id
+        first.save(force_insert=True)
+        for answer in answers:
+            answer.pk = None
+            answer.save(force_insert=True)
+        report = self.analyse().data
+        self.assertEqual(report['submissions'], 5)
+        self.assertEqual([item['difficulty'] for item in report['questions']], [0.8, 0.6, 0.4])
+
+        QuizSubmission.objects.filter(pk=first_id).delete()
+        self.assertEqual(self.analyse().data['submissions'], 4)
+
+    def test_students_cannot_view_analysis(self):
+        Enrollment.objects.create(student=self.students[0], course=self.quiz.module.course)
+        self.client.force_authenticate(self.students[0])
+        self.assertEqual(self.client.get(f'/api/quizzes/{self.quiz.id}/item-analysis/').status_code, 403)
+
+
+class QuestionBankTagTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.instructor = User.objects.create_user('instructor', 'instructor@example.com', 'password', role='instructor')
+        other = User.objects.create_user('other', 'other@example.com', 'password', role='instructor')
+        cls.loops = cls.entry('How do loops terminate?', 'Python, Loops')
+        cls.closures = cls.entry('What does a closure capture?', 'python,  functions ')
+        cls.joins = cls.entry('Which join keeps unmatched rows?', 'SQL, joins')
+        QuestionBankEntry.objects.create(owner=other, prompt='Private loops question', tags='python, loops')
+
+    @classmethod
+    def entry(cls, prompt, tags):
+        return QuestionBankEntry.objects.create(owner=cls.instructor, prompt=prompt, question_type='short_answer', tags=tags)
+
+    def setUp(self):
+        self.client.force_authenticate(self.instructor)
+
+    def ids(self, **params):
+        response = self.client.get('/api/question-bank/', params)
+        self.assertEqual(response.status_code, 200)
+        return {entry['id'] for entry in response.data['results']}
+
+    def test_tags_are_normalised_into_rows(self):
+        self.assertEqual(
+            set(QuestionBankTag.objects.filter(entry=self.closures).values_list('name', flat=True)),
+            {'python', 'functions'},
+        )
+        self.closures.tags = 'Python, closures'
+        self.closures.save()
+        self.assertEqual(
+            set(QuestionBankTag.objects.filter(entry=self.closures).values_list('name', flat=True)),
+            {'python', 'closures'},
+        )
+
+    def test_tag_intersection_and_union(self):
+        self.assertEqual(self.ids(tags='python,loops'), {self.loops.id})
+        self.assertEqual(self.ids(tags='PYTHON'), {self.loops.id, self.closures.id})
+        self.assertEqual(self.ids(tags='loops,sql', tag_mode='any'), {self.loops.id, self.joins.id})
+        self.assertEqual(self.ids(tags='loops,sql'), set())
+
+    def test_tag_counts_cover_visible_entries(self):
+        response = self.client.get('/api/question-bank/tags/')
+        self.assertEqual(response.data[0], {'name': 'python', 'count': 2})
+        self.assertEqual(len(response.data), 5)
+        response = self.client.get('/api/question-bank/tags/', {'tags': 'python'})
+        self.assertEqual([tag['name'] for tag in response.data], ['python', 'functions', 'loops'])
+
+    def test_prompt_search(self):
+        self.assertEqual(self.ids(search='closure'), {self.closures.id})
+        self.assertEqual(self.ids(search='unmatched row'), {self.joins.id})
+        self.joins.prompt = 'Which join drops rows?'
+        self.joins.save()
+        self.assertEqual(self.ids(search='unmatched'), set())
+
+    def test_serializer_normalises_tags(self):
+        response = self.client.post(
+            '/api/question-bank/',
+            {'prompt': 'Explain recursion', 'question_type': 'short_answer', 'tags': ' Python ,Recursion,python'},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['tags'], 'python, recursion')
+        self.assertEqual(self.ids(tags='recursion'), {response.data['id']})
+
+
+class QuestionBankSimilarityTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.instructor = User.objects.create_user('instructor', 'instructor@example.com', 'password', role='instructor')
+        other = User.objects.create_user('other', 'other@example.com', 'password', role='instructor')
+        prompt = 'Which HTTP status code means the requested resource was not found on the server?'
+        cls.original = cls.entry(prompt)
+        cls.reworded = cls.entry(prompt.replace('Which', 'What').replace('server', 'server.'))
+        cls.unrelated = cls.entry('Explain how a B-tree index keeps range scans efficient.')
+        cls.foreign = QuestionBankEntry.objects.create(owner=other, prompt=prompt, question_type='short_answer')
+
+    @classmethod
+    def entry(cls, prompt):
+        return QuestionBankEntry.objects.create(owner=cls.instructor, prompt=prompt, question_type='short_answer')
+
+    def setUp(self):
+        self.client.force_authenticate(self.instructor)
+
+    def similar(self, entry, **params):
+        response = self.client.get(f'/api/question-bank/{entry.id}/similar/', params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return [(item['id'], item['similarity']) for item in response.data]
+
+    def test_similar_questions_come_from_own_bank(self):
+        matches = self.similar(self.original)
+        self.assertEqual([entry_id for entry_id, _ in matches], [self.reworded.id])
+        self.assertGreater(matches[0][1], 0.7)
+        self.assertEqual(self.similar(self.unrelated), [])
+
+    def test_signature_follows_prompt_edits(self):
+        self.unrelated.prompt = self.original.prompt
+        self.unrelated.save()
+        self.assertEqual(self.similar(self.original, threshold=0.99)[0], (self.unrelated.id, 1.0))
+
+    def test_duplicate_report_groups_near_duplicates(self):
+        out = io.StringIO()
+        call_command('question_bank_duplicates', '--owner', 'instructor', stdout=out)
+        self.assertIn('2 similar questions:', out.getvalue())
+        self.assertIn('1 group(s) covering 2 question(s).', out.getvalue())
+        out = io.StringIO()
+        call_command('question_bank_duplicates', '--rebuild', stdout=out)
+        self.assertIn('3 similar questions:', out.getvalue())
+
+
+class QuizGenerationTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.instructor = User.objects.create_user('instructor', 'instructor@example.com', 'password', role='instructor')
+        cls.student = User.objects.create_user('student', 'student@example.com', 'password', role='student')
+        cls.course = Course.objects.create(title='Course', description='', instructor=cls.instructor, status='published')
+        cls.module = CourseModule.objects.create(course=cls.course, title='Module', order=1)
+        Enrollment.objects.create(student=cls.student, course=cls.course)
+        for tag, total in (('loops', 6), ('sql', 3)):
+            for index in range(total):
+                QuestionBankEntry.objects.create(
+                    owner=cls.instructor,
+                    course=cls.course,
+                    prompt=f'{tag} {index}',
+                    tags=tag,
+                    choices=[{'text': 'right', 'is_correct': True}, {'text': 'wrong', 'is_correct': False}],
+                )
+        QuestionBankEntry.objects.create(owner=cls.instructor, prompt='Elsewhere', tags='sql', question_type='short_answer')
+
+    def setUp(self):
+        self.client.force_authenticate(self.instructor)
+
+    def generate(self, strata, **options):
+        return self.client.post(
+            '/api/quizzes/generate/',
+            {'module': self.module.id, 'title': 'Generated', 'strata': strata, **options},
+            format='json',
+        )
+
+    def test_draws_each_stratum_without_random_ordering(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.generate([{'tag': 'Loops', 'count': 3}, {'tag': 'sql', 'count': 2}], seed=7)
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertFalse(any('RANDOM' in query['sql'].upper() for query in queries))
+        strata = [question['stratum'] for question in response.data['questions']]
+        self.assertEqual(strata, ['loops'] * 3 + ['sql'] * 2)
+        self.assertEqual(len({question['prompt'] for question in response.data['questions']}), 5)
+        self.assertTrue(all(len(question['choices']) == 2 for question in response.data['questions']))
+        self.assertIsNone(response.data['variant_strata'])
+
+        again = self.generate([{'tag': 'loops', 'count': 3}, {'tag': 'sql', 'count': 2}], seed=7)
+        self.assertEqual(
+            [question['prompt'] for question in again.data['questions']],
+            [question['prompt'] for question in response.data['questions']],
+        )
+
+    def test_rejects_strata_larger_than_the_bank(self):
+        response = self.generate([{'tag': 'sql', 'count': 4}])
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Quiz.objects.exists())
+
+    def test_attempts_are_graded_on_their_own_variant(self):
+        response = self.generate(
+            [{'tag': 'loops', 'count': 2, 'pool': 6}, {'tag': 'sql', 'count': 1}], variants=True, attempts_allowed=3
+        )
+        self.assertEqual(response.status_code, 201, response.data)
+        quiz_id = response.data['id']
+        self.assertEqual(response.data['variant_strata'], {'loops': 2, 'sql': 1})
+        self.assertEqual(len(response.data['questions']), 7)
+
+        self.client.force_authenticate(self.student)
+        for attempt in (1, 2):
+            variant = self.client.get(f'/api/quizzes/{quiz_id}/variant/').data
+            self.assertEqual(variant['attempt_number'], attempt)
+            self.assertEqual(self.client.get(f'/api/quizzes/{quiz_id}/variant/').data, variant)
+            questions = variant['questions']
+            self.assertEqual(sorted(question['stratum'] for question in questions), ['loops', 'loops', 'sql'])
+            answers = {str(question['id']): {'choice': question['choices'][0]['id']} for question in questions}
+            submission = self.client.post('/api/quiz-submissions/', {'quiz_id': quiz_id, 'answers': answers}, format='json')
+            self.assertEqual(submission.status_code, 201, submission.data)
+            self.assertEqual(submission.data['score'], '100.00')
+            self.assertEqual(
+                {answer['question'] for answer in submission.data['answers']},
+                {question['id'] for question in questions},
+            )
+
+
+class BulkGradingTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.instructor = User.objects.create_user('instructor', 'instructor@example.com', 'password', role='instructor')
+        other = User.objects.create_user('other', 'other@example.com', 'password', role='instructor')
+        course = Course.objects.create(title='Course', description='', instructor=cls.instructor, status='published')
+        foreign_course = Course.objects.create(title='Other', description='', instructor=other, status='published')
+        module = CourseModule.objects.create(course=course, title='Module', order=1)
+        assignment = Assignment.objects.create(module=module, title='Essay', instructions='')
+        foreign_module = CourseModule.objects.create(course=foreign_course, title='Module', order=1)
+        foreign_assignment = Assignment.objects.create(module=foreign_module, title='Essay', instructions='')
+        cls.submissions = [
+            AssignmentSubmission.objects.create(
+                assignment=assignment,
+                student=User.objects.create_user(f'student{index}', f's{index}@example.com', 'password', role='student'),
+            )
+            for index in range(8)
+        ]
+        cls.foreign = AssignmentSubmission.objects.create(assignment=foreign_assignment, student=cls.submissions[0].student)
+
+    def setUp(self):
+        self.client.force_authenticate(self.instructor)
+
+    def bulk_grade(self, items):
+        return self.client.post('/api/assignment-submissions/bulk-grade/', {'submissions': items}, format='json')
+
+    def test_grades_many_submissions_in_constant_queries(self):
+        items = [{'id': submission.id, 'grade': '8.50', 'feedback': 'Good'} for submission in self.submissions]
+        items[0] = {'id': self.submissions[0].id, 'status': 'in_review'}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.bulk_grade(items + [{'id': self.foreign.id, 'grade': 1}])
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertLessEqual(len(queries), 6)
+
+        results = response.data['results']
+        self.assertEqual(results[0], {'id': self.submissions[0].id, 'ok': True, 'grade': None, 'status': 'in_review'})
+        self.assertEqual(results[1], {'id': self.submissions[1].id, 'ok': True, 'grade': '8.50', 'status': 'graded'})
+        self.assertEqual(results[-1], {'id': self.foreign.id, 'ok': False, 'error': 'Not found.'})
+
+        graded = AssignmentSubmission.objects.get(pk=self.submissions[1].id)
+        self.assertEqual((graded.grade, graded.feedback, graded.reviewed_by), (Decimal('8.50'), 'Good', self.instructor))
+        self.assertIsNone(AssignmentSubmission.objects.get(pk=self.foreign.id).grade)
+
+    def test_rejects_malformed_batches(self):
+        submission_id = self.submissions[0].id
+        self.assertEqual(self.bulk_grade([{'id': submission_id}]).status_code, 400)
+        self.assertEqual(self.bulk_grade([{'id': submission_id, 'status': 'lost'}]).status_code, 400)
+        self.assertEqual(self.bulk_grade([{'id': submission_id, 'grade': 1}] * 2).status_code, 400)
+        self.client.force_authenticate(self.submissions[0].student)
+        self.assertEqual(self.bulk_grade([{'id': submission_id, 'grade': 1}]).status_code, 403)
+
+
+class AssignmentLatenessTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        instructor = User.objects.create_user('instructor', 'instructor@example.com', 'password', role='instructor')
+        cls.student = User.objects.create_user('student', 'student@example.com', 'password', role='student')
+        course = Course.objects.create(title='Course', description='', instructor=instructor, status='published')
+        module = CourseModule.objects.create(course=course, title='Module', order=1)
+        cls.assignment = Assignment.objects.create(
+            module=module, title='Essay', instructions='', due_date=timezone.now() - datetime.timedelta(days=1)
+        )
+
+    def test_late_submission_is_written_once(self):
+        self.client.force_authenticate(self.student)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                '/api/assignment-submissions/',
+                {'assignment_id': self.assignment.id, 'text_response': 'Essay'},
+                format='json',
+            )
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertTrue(response.data['is_late'])
+        writes = [
+            query['sql'] for query in queries
+            if 'courses_assignmentsubmission' in query['sql'] and not query['sql'].startswith('SELECT')
+        ]
+        self.assertEqual(len(writes), 1)
+        self.assertTrue(writes[0].startswith('INSERT'))
+
+    def test_moving_the_due_date_reevaluates_submissions(self):
+        late = AssignmentSubmission.objects.create(assignment=self.assignment, student=self.student)
+        on_time = AssignmentSubmission.objects.create(
+            assignment=self.assignment,
+            student=User.objects.create_user('early', 'early@example.com', 'password', role='student'),
+            submitted_at=self.assignment.due_date - datetime.timedelta(hours=1),
+        )
+        self.assertEqual((late.is_late, on_time.is_late), (True, False))
+
+        self.assignment.due_date = timezone.now() + datetime.timedelta(days=1)
+        self.assignment.save()
+        self.assertFalse(AssignmentSubmission.objects.filter(is_late=True).exists())
+
+        self.assignment.due_date = on_time.submitted_at - datetime.timedelta(hours=1)
+        self.assignment.save()
+        self.assertEqual(AssignmentSubmission.objects.filter(is_late=True).count(), 2)
+
+        self.assignment.due_date = None
+        self.assignment.save()
+        self.assertFalse(AssignmentSubmission.objects.filter(is_late=True).exists())
+
+
+def hammer(work, threads=8):
+    """
+    Run ``work(index)`` on ``threads`` threads released together, each with
+    its own database connection, and return the results in index order.
+    """
+    barrier = threading.Barrier(threads)
+
+    def run(index):
+        try:
+            barrier.wait()
+            return work(index)
+        finally:
+            connections.close_all()
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        return list(executor.map(run, range(threads)))
+
+
+class QuizAttemptConcurrencyTests(TransactionTestCase):
+    def setUp(self):
+        instructor = User.objects.create_user('instructor', 'instructor@example.com', 'password', role='instructor')
+        self.student = User.objects.create_user('student', 'student@example.com', 'password', role='student')
+        course = Course.objects.create(title='Course', description='', instructor=instructor, status='published')
+        module = CourseModule.objects.create(course=course, title='Module', order=1)
+        self.quiz = Quiz.objects.create(module=module, title='Quiz', attempts_allowed=3)
+        question = QuizQuestion.objects.create(quiz=self.quiz, prompt='Q', question_type='true_false', order=1)
+        self.choice = QuizChoice.objects.create(question=question, text='True', is_correct=True)
+
+    def submit(self, index):
+        client = APIClient()
+        client.force_authenticate(self.student)
+        response = client.post(
+            '/api/quiz-submissions/',
+            {'quiz_id': self.quiz.id, 'answers': {str(self.choice.question_id): {'choice': self.choice.pk}}},
+            format='json',
+        )
+        return response.status_code, response.data.get('attempt_number')
+
+    def test_concurrent_submissions_get_distinct_attempts_within_limit(self):
+        results = hammer(self.submit, threads=8)
+
+        statuses = sorted(status for status, _ in results)
+        self.assertEqual(statuses, [201] * 3 + [403] * 5)
+        self.assertEqual(sorted(number for status, number in results if status == 201), [1, 2, 3])
+        self.assertEqual(QuizSubmission.objects.filter(quiz=self.quiz, student=self.student).count(), 3)
+        self.assertEqual(QuizAttemptCounter.objects.get(quiz=self.quiz, student=self.student).attempts_used, 3)
+
+    def test_counter_starts_from_existing_submissions(self):
+        QuizSubmission.objects.create(quiz=self.quiz, student=self.student, attempt_number=1, score=0)
+
+        self.assertEqual(self.submit(0), (201, 2))
+        self.assertEqual(self.submit(1), (201, 3))
+        self.assertEqual(self.submit(2)[0], 403)
+
+
+class GradebookTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.instructor = User.objects.create_user('instructor', 'instructor@example.com', 'password', role='instructor')
+        cls.ann = User.objects.create_user('ann', 'ann@example.com', 'password', role='student')
+        cls.bob = User.objects.create_user('bob', 'bob@example.com', 'password', role='student')
+        cls.course = Course.objects.create(title='Course', description='', instructor=cls.instructor, status='published')
+        module = CourseModule.objects.create(course=cls.course, title='Module', order=1)
+        cls.assignment = Assignment.objects.create(module=module, title='Essay', instructions='', max_points=50)
+        cls.quiz = Quiz.objects.create(module=module, title='Quiz')
+        QuizQuestion.objects.create(quiz=cls.quiz, prompt='One', question_type='short_answer', points=3, order=1)
+        QuizQuestion.objects.create(quiz=cls.quiz, prompt='Two', question_type='short_answer', points=2, order=2)
+        for student in (cls.ann, cls.bob):
+            Enrollment.objects.create(student=student, course=cls.course)
+
+    def setUp(self):
+        self.client.force_authenticate(self.instructor)
+
+    def gradebook(self):
+        response = self.client.get(f'/api/courses/{self.course.id}/gradebook/')
+        self.assertEqual(response.status_code, 200, getattr(response, 'data', None))
+        return response.data
+
+    def test_tracks_best_quiz_scores_and_regrades(self):
+        AssignmentSubmission.objects.create(assignment=self.assignment, student=self.ann, grade=Decimal('40'))
+        bob_submission = AssignmentSubmission.objects.create(assignment=self.assignment, student=self.bob)
+        QuizSubmission.objects.create(quiz=self.quiz, student=self.ann, attempt_number=1, score=90)
+        second = QuizSubmission.objects.create(quiz=self.quiz, student=self.ann, attempt_number=2, score=60)
+
+        with CaptureQueriesContext(connection) as queries:
+            data = self.gradebook()
+        self.assertLessEqual(len(queries), 6)
+        self.assertEqual(
+            [(item['key'], item['weight']) for item in data['items']],
+            [(f'assignment:{self.assignment.id}', 50), (f'quiz:{self.quiz.id}', 5)],
+        )
+        ann, bob = data['results']
+        self.assertEqual(
+            ann['scores'], {f'assignment:{self.assignment.id}': Decimal('80.00'), f'quiz:{self.quiz.id}': Decimal('90.00')}
+        )
+        self.assertEqual(ann['total'], Decimal('80.91'))
+        self.assertEqual((bob['scores'], bob['total']), ({f'assignment:{self.assignment.id}': None}, Decimal('0.00')))
+
+        self.client.post(
+            '/api/assignment-submissions/bulk-grade/',
+            {'submissions': [{'id': bob_submission.id, 'grade': '25'}]},
+            format='json',
+        )
+        QuizSubmission.objects.filter(score=90).delete()
+        second.score = 70
+        second.save()
+        ann, bob = self.gradebook()['results']
+        self.assertEqual(ann['scores'][f'quiz:{self.quiz.id}'], Decimal('70.00'))
+        self.assertEqual(bob['scores'], {f'assignment:{self.assignment.id}': Decimal('50.00')})
+        entries = sorted(GradebookEntry.objects.values_list('student', 'assignment', 'quiz', 'score'), key=str)
+        call_command('rebuild_gradebook', stdout=io.StringIO())
+        self.assertEqual(sorted(GradebookEntry.objects.values_list('student', 'assignment', 'quiz', 'score'), key=str), entries)
+
+        second.delete()
+        self.assertFalse(GradebookEntry.objects.filter(quiz=self.quiz).exists())
+
+    def test_changing_max_points_rescales_assignment_cells(self):
+        AssignmentSubmission.objects.create(assignment=self.assignment, student=self.ann, grade=Decimal('40'))
+        self.assignment.max_points = 80
+        self.assignment.save()
+        ann = self.gradebook()['results'][0]
+        self.assertEqual(ann['scores'][f'assignment:{self.assignment.id}'], Decimal('50.00'))
+        self.assertEqual(ann['total'], Decimal('47.06'))
+
+    def test_pagination_modes_list_students_in_enrollment_order(self):
+        Enrollment.objects.filter(student=self.ann).update(enrolled_at=timezone.now() + datetime.timedelta(days=1))
+        url = f'/api/courses/{self.course.id}/gradebook/'
+        by_page = self.client.get(url, {'page_size': 1})
+        by_cursor = self.client.get(url, {'page_size': 1, 'pagination': 'cursor'})
+        self.assertEqual(by_page.data['results'][0]['student']['username'], 'bob')
+        self.assertEqual(by_cursor.data['results'][0]['student']['username'], 'bob')
+        second = self.client.get(by_cursor.data['next'])
+        self.assertEqual([row['student']['username'] for row in second.data['results']], ['ann'])
+
+    def test_only_course_staff_see_the_gradebook(self):
+        self.client.force_authenticate(self.ann)
+        self.assertEqual(self.client.get(f'/api/courses/{self.course.id}/gradebook/').status_code, 403)
+
+
+
+class CsvExportTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.instructor = User.objects.create_user('instructor', 'instructor@example.com', 'password', role='instructor')
+        cls.ann = User.objects.create_user('ann', 'ann@example.com', 'password', role='student')
+        cls.bob = User.objects.create_user('=bob', 'bob@example.com', 'password', role='student')
+        cls.course = Course.objects.create(title='Course', description='', instructor=cls.instructor, status='published')
+        module = CourseModule.objects.create(course=cls.course, title='Module', order=1)
+        cls.assignment = Assignment.objects.create(module=module, title='Essay, part 1', instructions='', max_points=20)
+        cls.quiz = Quiz.objects.create(module=module, title='Quiz')
+        QuizQuestion.objects.create(quiz=cls.quiz, prompt='One', question_type='short_answer', points=4, order=1)
+        for student in (cls.ann, cls.bob):
+            Enrollment.objects.create(student=student, course=cls.course)
+        AssignmentSubmission.objects.create(assignment=cls.assignment, student=cls.ann, grade=Decimal('15'))
+        QuizSubmission.objects.create(quiz=cls.quiz, student=cls.ann, attempt_number=1, score=40)
+        QuizSubmission.objects.create(quiz=cls.quiz, student=cls.bob, attempt_number=1, score=80)
+
+    def setUp(self):
+        self.client.force_authenticate(self.instructor)
+
+    def export(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        return b''.join(response.streaming_content).decode().splitlines()
+
+    def test_exports_submissions(self):
+        header, row = self.export(f'/api/assignment-submissions/export/?course={self.course.id}')
+        self.assertTrue(header.startswith('id,course_id,assignment_id,assignment,student_id,student,'))
+        self.assertIn(f'"Essay, part 1",{self.ann.id},ann,', row)
+        self.assertIn(',15.00,20,', row)
+
+        lines = self.export(f'/api/quiz-submissions/export/?quiz={self.quiz.id}')
+        self.assertEqual(len(lines), 3)
+        self.assertIn(f",{self.bob.id},'=bob,1,", lines[2])
+
+    def test_exports_gradebook(self):
+        lines = self.export(f'/api/courses/{self.course.id}/gradebook/export/')
+        self.assertEqual(
+            lines,
+            [
+                f'student_id,student,"Essay, part 1 (assignment:{self.assignment.id})",Quiz (quiz:{self.quiz.id}),total',
+                f'{self.ann.id},ann,75.00,40.00,69.17',
+                f"{self.bob.id},'=bob,,80.00,13.33",
+            ],
+        )
+
+    def test_students_cannot_export(self):
+        self.client.force_authenticate(self.ann)
+        for url in (
+            '/api/assignment-submissions/export/',
+            '/api/quiz-submissions/export/',
+            f'/api/courses/{self.course.id}/gradebook/export/',
+        ):
+            self.assertEqual(self.client.get(url).status_code, 403)
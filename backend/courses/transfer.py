@@ -0,0 +1,237 @@
+"""
+Course content export and import as NDJSON.
+
+An export is a header line followed by one line per row: the course, then
+its modules, lessons, assignments, quizzes, questions and choices, each
+model in turn, so every row's parent precedes it. Rows are read with
+``.iterator()`` and written as they are read. The importer reads line by
+line and inserts rows with ``bulk_create`` in batches. It keeps only a map
+from exported to new ids for models that have children. Enrollments,
+submissions and other student data are not exported.
+
+``clone_course`` copies a course within the database with the same model
+walk, one ``bulk_create`` per model.
+
+File fields (course thumbnails, assignment attachments) are exported and
+cloned as storage paths; the files themselves are not copied.
+"""
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+
+from . import outline, stats
+from .models import Course, CourseModule, Lesson, Assignment, Quiz, QuizQuestion, QuizChoice
+
+FORMAT = 'course-content'
+VERSION = 1
+IMPORT_BATCH_SIZE = 500
+
+# (record type, model, parent field, parent record type, lookup from the model to its course)
+# in dependency order.
+CONTENT_MODELS = (
+    ('module', CourseModule, 'course', 'course', 'course'),
+    ('lesson', Lesson, 'module', 'module', 'module__course'),
+    ('assignment', Assignment, 'module', 'module', 'module__course'),
+    ('quiz', Quiz, 'module', 'module', 'module__course'),
+    ('question', QuizQuestion, 'quiz', 'quiz', 'quiz__module__course'),
+    ('choice', QuizChoice, 'question', 'question', 'question__quiz__module__course'),
+)
+PARENT_TYPES = {spec[3] for spec in CONTENT_MODELS}
+# Dates moved by ``clone_course``'s ``shift``.
+SCHEDULE_FIELDS = {CourseModule: 'release_date', Assignment: 'due_date'}
+
+
+class CourseImportError(Exception):
+    pass
+
+
+def exported_fields(model):
+    """Editable concrete fields other than the key, relations and timestamps."""
+    return [
+        field
+        for field in model._meta.concrete_fields
+        if field.editable
+        and not field.primary_key
+        and not field.is_relation
+        and not getattr(field, 'auto_now', False)
+        and not getattr(field, 'auto_now_add', False)
+    ]
+
+
+def export_course(course):
+    """Yield the NDJSON lines of ``course``'s content."""
+    yield _line({'format': FORMAT, 'version': VERSION})
+    course_fields = [field.name for field in exported_fields(Course)]
+    yield _line({
+        'type': 'course',
+        'id': course.pk,
+        'fields': Course.objects.filter(pk=course.pk).values(*course_fields).get(),
+    })
+
+    for record_type, model, parent_field, _, course_lookup in CONTENT_MODELS:
+        fields = [field.name for field in exported_fields(model)]
+        rows = (
+            model.objects.filter(**{course_lookup: course})
+            .order_by('pk')
+            .values('pk', f'{parent_field}_id', *fields)
+            .iterator(chunk_size=IMPORT_BATCH_SIZE)
+        )
+        for row in rows:
+            yield _line({
+                'type': record_type,
+                'id': row.pop('pk'),
+                'parent': row.pop(f'{parent_field}_id'),
+                'fields': row,
+            })
+
+
+@transaction.atomic
+def import_course(lines, instructor):
+    """
+    Create a draft course owned by ``instructor`` from exported NDJSON ``lines``.
+
+    Raises ``CourseImportError`` for malformed input, including rows that
+    break a constraint (two modules with the same order, say); nothing is
+    written then.
+    """
+    specs = {spec[0]: spec for spec in CONTENT_MODELS}
+    new_ids = {record_type: {} for record_type in PARENT_TYPES}
+    course = None
+    pending_type, pending = None, []
+
+    def flush():
+        if not pending:
+            return
+        try:
+            created = specs[pending_type][1].objects.bulk_create([instance for _, instance in pending])
+        except IntegrityError as exc:
+            raise CourseImportError(f'The {pending_type} rows conflict with each other: {exc}') from exc
+        if pending_type in PARENT_TYPES:
+            new_ids[pending_type].update((old_id, instance.pk) for (old_id, _), instance in zip(pending, created))
+        pending.clear()
+
+    records = _records(lines)
+    header = next(records, None)
+    if not header or header.get('format') != FORMAT or header.get('version') != VERSION:
+        raise CourseImportError(f'Expected a {FORMAT} version {VERSION} export.')
+
+    for number, record in records:
+        record_type = record.get('type')
+        if record_type == 'course':
+            if course is not None:
+                raise CourseImportError(f'Line {number}: an export holds a single course.')
+            fields = _fields(Course, record, number)
+            fields['status'] = 'draft'
+            course = Course.objects.create(instructor=instructor, **fields)
+            new_ids['course'][record.get('id')] = course.pk
+            continue
+        if record_type not in specs:
+            raise CourseImportError(f'Line {number}: unknown record type {record_type!r}.')
+
+        if record_type != pending_type:
+            flush()
+            pending_type = record_type
+        _, model, parent_field, parent_type, _ = specs[record_type]
+        parent_id = new_ids[parent_type].get(record.get('parent'))
+        if parent_id is None:
+            raise CourseImportError(f'Line {number}: {record_type} refers to an unknown {parent_type}.')
+        instance = model(**{f'{parent_field}_id': parent_id}, **_fields(model, record, number))
+        pending.append((record.get('id'), instance))
+        if len(pending) >= IMPORT_BATCH_SIZE:
+            flush()
+    flush()
+
+    if course is None:
+        raise CourseImportError('The export contains no course.')
+    # bulk_create sends no signals; bring the derived state up to date once.
+    outline.bump_content_version(pk=course.pk)
+    stats.rebuild_course_stats([course.pk])
+    course.refresh_from_db()
+    return course
+
+
+@transaction.atomic
+def clone_course(course, instructor, title=None, shift=None):
+    """
+    Copy ``course`` and its content to a new draft course owned by ``instructor``.
+
+    Each content model is copied with one ``bulk_create``, remapping parents
+    through the ids created for the level above. ``shift`` (a ``timedelta``)
+    moves module release dates and assignment due dates.
+    """
+    fields = {field.name: getattr(course, field.attname) for field in exported_fields(Course)}
+    fields.update(title=title or f'{course.title} (copy)', status='draft')
+    copy = Course.objects.create(instructor=instructor, **fields)
+
+    new_ids = {'course': {course.pk: copy.pk}}
+    for record_type, model, parent_field, parent_type, course_lookup in CONTENT_MODELS:
+        names = [field.name for field in exported_fields(model)]
+        rows = list(
+            model.objects.filter(**{course_lookup: course})
+            .order_by('pk')
+            .values('pk', f'{parent_field}_id', *names)
+        )
+        schedule_field = SCHEDULE_FIELDS.get(model)
+        instances = []
+        for row in rows:
+            row[f'{parent_field}_id'] = new_ids[parent_type][row[f'{parent_field}_id']]
+            if shift and schedule_field and row[schedule_field] is not None:
+                row[schedule_field] += shift
+            instances.append(model(**{name: value for name, value in row.items() if name != 'pk'}))
+        created = model.objects.bulk_create(instances)
+        if record_type in PARENT_TYPES:
+            new_ids[record_type] = {row['pk']: instance.pk for row, instance in zip(rows, created)}
+
+    outline.bump_content_version(pk=copy.pk)
+    stats.rebuild_course_stats([copy.pk])
+    copy.refresh_from_db()
+    return copy
+
+
+def _records(lines):
+    """Yield the header, then ``(line number, record)`` pairs, from byte or text lines."""
+    header_seen = False
+    for number, line in enumerate(lines, start=1):
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            raise CourseImportError(f'Line {number}: invalid JSON.')
+        if not isinstance(record, dict):
+            raise CourseImportError(f'Line {number}: expected an object.')
+        if header_seen:
+            yield number, record
+        else:
+            header_seen = True
+            yield record
+
+
+_field_maps = {}
+
+
+def _fields(model, record, number):
+    """The record's field values, converted and checked against ``model``."""
+    if model not in _field_maps:
+        _field_maps[model] = {field.name: field for field in exported_fields(model)}
+    field_map = _field_maps[model]
+    values = record.get('fields')
+    if not isinstance(values, dict):
+        raise CourseImportError(f'Line {number}: missing fields.')
+    converted = {}
+    for name, value in values.items():
+        if name not in field_map:
+            raise CourseImportError(f'Line {number}: unknown {model.__name__} field {name!r}.')
+        try:
+            converted[name] = field_map[name].to_python(value)
+        except ValidationError as exc:
+            raise CourseImportError(f'Line {number}: {model.__name__}.{name}: {" ".join(exc.messages)}')
+    return converted
+
+
+def _line(record):
+    return json.dumps(record, cls=DjangoJSONEncoder) + '\n'
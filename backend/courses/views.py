@@ -3,12 +3,19 @@ from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from django.db import models
-from django.db.models import Avg, Count, Sum, Q
+from datetime import timedelta
+from django.db import models, transaction
+from django.db.models import prefetch_related_objects
+from django.http import StreamingHttpResponse
+from django.db.models import Count, Sum, Q
 from django.utils import timezone
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import NotFound, PermissionDenied
 from accounts.permissions import IsInstructorOrAdmin, IsAdmin
 from accounts.models import User
+from learning_platform.pagination import GradebookPagination, KeysetPagination
+from . import analysis, assignments, exports, generation, gradebook, grading, playback, progress, question_bank, search, similarity, transfer
+from .conditional import ConditionalReadMixin
+from .stats import ensure_course_stats
 from .models import (
     Course,
     CourseModule,
@@ -18,13 +25,22 @@ from .models import (
     Quiz,
     QuizSubmission,
     LessonProgress,
-    QuizSubmissionAnswer,
     Enrollment,
     Wishlist,
     QuestionBankEntry,
+    CourseStats,
+    LessonPlayback,
 )
 from .serializers import (
+    parse_fieldset,
+    user_course_flags,
     CourseSerializer,
+    CourseListSerializer,
+    CourseCloneSerializer,
+    SimilarQuestionsSerializer,
+    BulkSubmissionReviewSerializer,
+    QuizGenerationSerializer,
+    QuizQuestionSerializer,
     CourseModuleSerializer,
     LessonSerializer,
     LessonProgressSerializer,
@@ -34,21 +50,22 @@ from .serializers import (
     QuizSerializer,
     QuizSubmissionSerializer,
     EnrollmentSerializer,
+    LessonProgressSyncSerializer,
+    PlaybackHeartbeatSerializer,
     WishlistSerializer,
     QuestionBankEntrySerializer,
 )
 
 
-class CourseViewSet(viewsets.ModelViewSet):
+class CourseViewSet(ConditionalReadMixin, viewsets.ModelViewSet):
     serializer_class = CourseSerializer
     permission_classes = [AllowAny]  # Allow anyone to view courses
+    pagination_class = KeysetPagination
+    cursor_ordering = ('-created_at', '-id')
 
     def get_queryset(self):
-        base_queryset = Course.objects.all().prefetch_related(
-            'modules__lessons',
-            'modules__assignments',
-            'modules__quizzes__questions__choices'
-        )
+        # The module tree comes from the outline cache, so nothing is prefetched.
+        base_queryset = Course.objects.select_related('instructor')
 
         # Show published courses to everyone, or draft/archived courses to their instructor
         user = self.request.user
@@ -65,17 +82,70 @@ class CourseViewSet(viewsets.ModelViewSet):
             queryset = base_queryset.filter(status='published')
 
         category = self.request.query_params.get('category', None)
-        search = self.request.query_params.get('search', None)
+        search_text = self.request.query_params.get('search', None)
 
         if category and category != 'All':
             queryset = queryset.filter(category=category)
-        if search:
-            queryset = queryset.filter(title__icontains=search)
+        if search_text:
+            queryset = search.search_courses(queryset, search_text)
 
         return queryset
 
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return CourseListSerializer
+        return super().get_serializer_class()
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fields'], context['expand'] = self._fieldsets()
+        if self._renders_field('is_enrolled') or self._renders_field('is_in_wishlist'):
+            context.update(user_course_flags(self.request.user))
+        context['search_snippets'] = getattr(self, '_search_snippets', {})
+        return context
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        search_text = self.request.query_params.get('search')
+        if page is not None and search_text and self._renders_field('search_highlight'):
+            self._search_snippets = search.course_snippets(search_text, [course.id for course in page])
+        return page
+
+    def get_user_state(self, rows, context):
+        user = self.request.user
+        if not user.is_authenticated:
+            return None
+        course_ids = {course.pk for course in rows}
+        state = (
+            user.pk,
+            tuple(sorted(course_ids & context.get('enrolled_course_ids', set()))),
+            tuple(sorted(course_ids & context.get('wishlist_course_ids', set()))),
+        )
+        if self._renders_field('modules'):
+            state += super().get_user_state(rows, context)
+        return state
+
+    def _fieldsets(self):
+        if self.request.method != 'GET':
+            return None, None
+        params = self.request.query_params
+        fields, expand = parse_fieldset(params.get('fields')), parse_fieldset(params.get('expand'))
+        if self.action == 'list' and params.get('search'):
+            expand = (expand or set()) | {'search_highlight'}
+        return fields, expand
+
+    def _renders_field(self, name):
+        """Whether the serializer for this request will render ``name``."""
+        fields, expand = self._fieldsets()
+        meta = self.get_serializer_class().Meta
+        if name in getattr(meta, 'expandable_fields', ()):
+            return name in (expand or ())
+        if name in getattr(meta, 'optional_fields', ()):
+            return name in (expand or ()) or name in (fields or ())
+        return fields is None or name in fields
+
     def get_permissions(self):
-        if self.action in ['create', 'update', 'partial_update', 'destroy']:
+        if self.action in ['create', 'update', 'partial_update', 'destroy', 'export_content', 'import_content', 'clone', 'gradebook', 'gradebook_export']:
             return [IsInstructorOrAdmin()]
         return [AllowAny()]
 
@@ -127,13 +197,91 @@ class CourseViewSet(viewsets.ModelViewSet):
         Wishlist.objects.filter(student=request.user, course=course).delete()
         return Response({'message': 'Removed from wishlist'}, status=status.HTTP_200_OK)
 
+    @action(detail=True, methods=['post'])
+    def clone(self, request, pk=None):
+        """Copy the course and its content to a new draft for another term."""
+        course = self.get_object()
+        if request.user.role != 'admin' and course.instructor != request.user:
+            raise PermissionDenied("You do not have permission to clone this course.")
+        serializer = CourseCloneSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        shift_days = serializer.validated_data.get('shift_days')
+        copy = transfer.clone_course(
+            course,
+            request.user,
+            title=serializer.validated_data.get('title'),
+            shift=timedelta(days=shift_days) if shift_days else None,
+        )
+        return Response(
+            CourseSerializer(copy, context=self.get_serializer_context()).data, status=status.HTTP_201_CREATED
+        )
 
-class CourseModuleViewSet(viewsets.ModelViewSet):
+    @action(detail=True, methods=['get'], url_path='export')
+    def export_content(self, request, pk=None):
+        """Stream the course content as NDJSON (see ``courses.transfer``)."""
+        course = self.get_object()
+        if request.user.role != 'admin' and course.instructor != request.user:
+            raise PermissionDenied("You do not have permission to export this course.")
+        response = StreamingHttpResponse(transfer.export_course(course), content_type='application/x-ndjson')
+        response['Content-Disposition'] = f'attachment; filename="course-{course.pk}.ndjson"'
+        return response
+
+    @action(detail=True, methods=['get'])
+    def gradebook(self, request, pk=None):
+        """
+        A page of the course gradebook: the graded items with their weights
+        and one row of scores and weighted total per enrolled student.
+        """
+        course = self.get_object()
+        if request.user.role != 'admin' and course.instructor != request.user:
+            raise PermissionDenied("You do not have permission to view this gradebook.")
+        # Both pagination modes list students in the paginator's keyset order.
+        enrollments = (
+            Enrollment.objects.filter(course=course).select_related('student').order_by(*GradebookPagination.ordering)
+        )
+        paginator = GradebookPagination()
+        page = paginator.paginate_queryset(enrollments, request)
+        items = gradebook.gradebook_items(course)
+        rows = gradebook.gradebook_rows(course, [enrollment.student for enrollment in page], items)
+        response = paginator.get_paginated_response(rows)
+        response.data['items'] = items
+        return response
+
+    @action(detail=True, methods=['get'], url_path='gradebook/export')
+    def gradebook_export(self, request, pk=None):
+        """Stream the whole gradebook as CSV, one line per enrolled student."""
+        course = self.get_object()
+        if request.user.role != 'admin' and course.instructor != request.user:
+            raise PermissionDenied("You do not have permission to export this gradebook.")
+        return exports.csv_response(exports.export_gradebook(course), f'course-{course.pk}-gradebook.csv')
+
+    @action(detail=False, methods=['post'], url_path='import')
+    def import_content(self, request):
+        """
+        Create a course owned by the requesting user from an NDJSON export,
+        sent as the request body or as a ``file`` upload.
+        """
+        if request.content_type.startswith('multipart/'):
+            lines = request.FILES.get('file')
+        else:
+            lines = request.stream
+        if lines is None:
+            return Response({'detail': 'No export was provided.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            course = transfer.import_course(lines, request.user)
+        except transfer.CourseImportError as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = CourseSerializer(course, context=self.get_serializer_context())
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class CourseModuleViewSet(ConditionalReadMixin, viewsets.ModelViewSet):
     serializer_class = CourseModuleSerializer
     permission_classes = [IsAuthenticated]
+    course_path = 'course'
 
     def get_queryset(self):
-        queryset = CourseModule.objects.all()
+        queryset = CourseModule.objects.select_related('course')
         course_id = self.request.query_params.get('course')
         if course_id:
             queryset = queryset.filter(course_id=course_id)
@@ -168,12 +316,13 @@ class CourseModuleViewSet(viewsets.ModelViewSet):
             raise PermissionDenied("You do not have permission to delete this module.")
 
 
-class LessonViewSet(viewsets.ModelViewSet):
+class LessonViewSet(ConditionalReadMixin, viewsets.ModelViewSet):
     serializer_class = LessonSerializer
     permission_classes = [IsAuthenticated]
+    course_path = 'module__course'
 
     def get_queryset(self):
-        queryset = Lesson.objects.all()
+        queryset = Lesson.objects.select_related('module__course')
         module_id = self.request.query_params.get('module')
         if module_id:
             queryset = queryset.filter(module_id=module_id)
@@ -211,9 +360,10 @@ class LessonViewSet(viewsets.ModelViewSet):
         if not enrollment:
             return Response({'detail': 'You are not enrolled in this course.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        progress, created = LessonProgress.objects.get_or_create(enrollment=enrollment, lesson=lesson)
+        _, created = LessonProgress.objects.get_or_create(enrollment=enrollment, lesson=lesson)
         if created:
-            enrollment.recalculate_progress()
+            # Progress counters are updated in SQL by courses.signals.
+            enrollment = Enrollment.objects.get(pk=enrollment.pk)
 
         serializer = LessonSerializer(lesson, context={'request': request})
         enrollment_serializer = EnrollmentSerializer(enrollment, context={'request': request})
@@ -232,8 +382,9 @@ class LessonViewSet(viewsets.ModelViewSet):
         if not enrollment:
             return Response({'detail': 'You are not enrolled in this course.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        LessonProgress.objects.filter(enrollment=enrollment, lesson=lesson).delete()
-        enrollment.recalculate_progress()
+        deleted, _ = LessonProgress.objects.filter(enrollment=enrollment, lesson=lesson).delete()
+        if deleted:
+            enrollment = Enrollment.objects.get(pk=enrollment.pk)
 
         serializer = LessonSerializer(lesson, context={'request': request})
         enrollment_serializer = EnrollmentSerializer(enrollment, context={'request': request})
@@ -245,6 +396,43 @@ class LessonViewSet(viewsets.ModelViewSet):
             }
         )
 
+    @action(detail=True, methods=['get', 'post'], permission_classes=[IsAuthenticated])
+    def playback(self, request, pk=None):
+        """
+        Record a player heartbeat (POST) or read the position to resume from (GET).
+
+        Heartbeats are buffered and written in batches by ``courses.playback``;
+        reads see this process's buffered position before it is flushed.
+        """
+        try:
+            lesson_id = int(pk)
+        except ValueError:
+            raise NotFound()
+        enrollment_id = (
+            Enrollment.objects.filter(student=request.user, course__modules__lessons=lesson_id)
+            .values_list('pk', flat=True)
+            .first()
+        )
+        if enrollment_id is None:
+            return Response({'detail': 'You are not enrolled in this course.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if request.method == 'POST':
+            serializer = PlaybackHeartbeatSerializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            position_seconds = serializer.validated_data['position_seconds']
+            playback.buffer.record(enrollment_id, lesson_id, position_seconds, timezone.now())
+            return Response(status=status.HTTP_202_ACCEPTED)
+
+        heartbeat = playback.buffer.pending(enrollment_id, lesson_id)
+        if heartbeat is None:
+            heartbeat = (
+                LessonPlayback.objects.filter(enrollment_id=enrollment_id, lesson_id=lesson_id)
+                .values_list('position_seconds', 'updated_at')
+                .first()
+            )
+        position_seconds, updated_at = heartbeat or (0, None)
+        return Response({'lesson': lesson_id, 'position_seconds': position_seconds, 'updated_at': updated_at})
+
 
 class AssignmentViewSet(viewsets.ModelViewSet):
     serializer_class = AssignmentSerializer
@@ -291,6 +479,8 @@ class AssignmentViewSet(viewsets.ModelViewSet):
 class AssignmentSubmissionViewSet(viewsets.ModelViewSet):
     serializer_class = AssignmentSubmissionSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    cursor_ordering = ('-submitted_at', '-id')
 
     def get_queryset(self):
         queryset = AssignmentSubmission.objects.select_related('assignment', 'student')
@@ -305,6 +495,15 @@ class AssignmentSubmissionViewSet(viewsets.ModelViewSet):
             return queryset.filter(assignment__module__course__instructor=user)
         return queryset.filter(student=user)
 
+    @action(detail=False, methods=['get'], permission_classes=[IsInstructorOrAdmin])
+    def export(self, request):
+        """Stream the submissions you grade as CSV (``?assignment=``, ``?course=``)."""
+        queryset = self.get_queryset()
+        course_id = request.query_params.get('course')
+        if course_id:
+            queryset = queryset.filter(assignment__module__course_id=course_id)
+        return exports.csv_response(exports.export_assignment_submissions(queryset), 'assignment-submissions.csv')
+
     def perform_create(self, serializer):
         assignment = serializer.validated_data['assignment']
         user = self.request.user
@@ -349,6 +548,13 @@ class AssignmentSubmissionViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(submission)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['post'], url_path='bulk-grade', permission_classes=[IsInstructorOrAdmin])
+    def bulk_grade(self, request):
+        serializer = BulkSubmissionReviewSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = assignments.review_submissions(request.user, serializer.validated_data['submissions'])
+        return Response({'results': results})
+
     @action(detail=True, methods=['post'], permission_classes=[IsInstructorOrAdmin])
     def set_status(self, request, pk=None):
         submission = self.get_object()
@@ -405,10 +611,47 @@ class QuizViewSet(viewsets.ModelViewSet):
         else:
             raise PermissionDenied("You do not have permission to delete this quiz.")
 
+    @action(detail=False, methods=['post'])
+    def generate(self, request):
+        serializer = QuizGenerationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        options = dict(serializer.validated_data)
+        module = options.pop('module')
+        if request.user.role != 'admin' and module.course.instructor_id != request.user.id:
+            raise PermissionDenied("You do not have permission to add quizzes to this module.")
+        quiz = generation.generate_quiz(module, **options)
+        quiz = Quiz.objects.prefetch_related('questions__choices').get(pk=quiz.pk)
+        return Response(self.get_serializer(quiz).data, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['get'])
+    def variant(self, request, pk=None):
+        """The questions of the requesting student's next attempt."""
+        quiz = self.get_object()
+        attempt_number = grading.next_attempt_number(quiz, request.user)
+        question_ids = generation.variant_question_ids(quiz, request.user.id, attempt_number)
+        questions = quiz.questions.prefetch_related('choices')
+        if question_ids is not None:
+            questions = questions.filter(pk__in=question_ids)
+        return Response({
+            'quiz': quiz.pk,
+            'attempt_number': attempt_number,
+            'questions': QuizQuestionSerializer(questions, many=True).data,
+        })
+
+    @action(detail=True, methods=['get'], url_path='item-analysis')
+    def item_analysis(self, request, pk=None):
+        quiz = self.get_object()
+        user = request.user
+        if user.role != 'admin' and quiz.module.course.instructor_id != user.id:
+            raise PermissionDenied("Only the course instructor can view item analysis.")
+        return Response(analysis.analyse_quiz(quiz))
+
 
 class QuizSubmissionViewSet(viewsets.ModelViewSet):
     serializer_class = QuizSubmissionSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    cursor_ordering = ('-submitted_at', '-id')
     http_method_names = ['get', 'post', 'head', 'options']
 
     def get_serializer_context(self):
@@ -429,6 +672,15 @@ class QuizSubmissionViewSet(viewsets.ModelViewSet):
             return queryset.filter(quiz__module__course__instructor=user)
         return queryset.filter(student=user)
 
+    @action(detail=False, methods=['get'], permission_classes=[IsInstructorOrAdmin])
+    def export(self, request):
+        """Stream the attempts at your quizzes as CSV (``?quiz=``, ``?course=``)."""
+        queryset = self.get_queryset()
+        course_id = request.query_params.get('course')
+        if course_id:
+            queryset = queryset.filter(quiz__module__course_id=course_id)
+        return exports.csv_response(exports.export_quiz_submissions(queryset), 'quiz-submissions.csv')
+
     def perform_create(self, serializer):
         quiz = serializer.validated_data['quiz']
         user = self.request.user
@@ -436,53 +688,24 @@ class QuizSubmissionViewSet(viewsets.ModelViewSet):
         if user.role != 'student':
             raise PermissionDenied("Only students can submit quizzes.")
 
-        # enforce attempt limit
-        attempts = QuizSubmission.objects.filter(quiz=quiz, student=user).count()
-        if attempts >= quiz.attempts_allowed:
-            raise PermissionDenied("You have reached the maximum number of attempts for this quiz.")
-
-        submission = serializer.save(student=user, attempt_number=attempts + 1)
-
-        answers_payload = self.request.data.get('answers', {})
-
-        # Basic auto-grading for multiple choice / true_false questions
-        total_points = 0
-        earned_points = 0
-
-        for question in quiz.questions.all():
-            total_points += question.points
-            answer_data = answers_payload.get(str(question.id), {})
-            selected_choice_id = answer_data.get('choice')
-            text_response = answer_data.get('text', '')
-
-            selected_choice = None
-            if selected_choice_id:
-                selected_choice = question.choices.filter(id=selected_choice_id).first()
-
-            is_correct = False
-            if question.question_type in ['multiple_choice', 'true_false'] and selected_choice:
-                is_correct = selected_choice.is_correct
-            elif question.question_type == 'short_answer':
-                # auto grading stub - always zero, instructor can update
-                is_correct = False
-
-            points_awarded = question.points if is_correct else 0
-            earned_points += points_awarded
-
-            QuizSubmissionAnswer.objects.create(
-                submission=submission,
-                question=question,
-                selected_choice=selected_choice,
-                text_response=text_response,
-                is_correct=is_correct,
-                points_awarded=points_awarded,
+        with transaction.atomic():
+            # enforce attempt limit
+            attempt_number = grading.allocate_attempt(quiz, user)
+            if attempt_number is None:
+                raise PermissionDenied("You have reached the maximum number of attempts for this quiz.")
+            graded = grading.grade(
+                quiz,
+                self.request.data.get('answers', {}),
+                generation.variant_question_ids(quiz, user.id, attempt_number),
             )
-
-        if total_points > 0:
-            submission.score = round((earned_points / total_points) * 100, 2)
-            submission.passed = submission.score >= quiz.passing_score
-            submission.save(update_fields=['score', 'passed'])
-
+            submission = serializer.save(
+                student=user,
+                attempt_number=attempt_number,
+                score=graded.score or 0,
+                passed=graded.passed,
+            )
+            grading.save_answers(submission, graded.answers)
+        prefetch_related_objects([submission], 'answers', 'quiz__questions__choices')
         return submission
 
 
@@ -496,13 +719,33 @@ class QuestionBankEntryViewSet(viewsets.ModelViewSet):
         if user.is_admin:
             queryset = QuestionBankEntry.objects.all()
         course_id = self.request.query_params.get('course')
-        search = self.request.query_params.get('search')
         if course_id:
             queryset = queryset.filter(course_id=course_id)
-        if search:
-            queryset = queryset.filter(prompt__icontains=search)
+        tags = self.request.query_params.get('tags')
+        if tags:
+            match_all = self.request.query_params.get('tag_mode', 'all') != 'any'
+            queryset = question_bank.filter_by_tags(queryset, tags.split(','), match_all=match_all)
+        search_text = self.request.query_params.get('search')
+        if search_text:
+            queryset = question_bank.search_entries(queryset, search_text)
         return queryset
 
+    @action(detail=False, methods=['get'])
+    def tags(self, request):
+        return Response(question_bank.tag_counts(self.get_queryset()))
+
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        entry = self.get_object()
+        params = SimilarQuestionsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        matches = similarity.similar_entries(entry, self.get_queryset(), params.validated_data['threshold'])
+        entries = QuestionBankEntry.objects.select_related('owner').in_bulk([entry_id for entry_id, _ in matches])
+        return Response([
+            {**self.get_serializer(entries[entry_id]).data, 'similarity': round(score, 3)}
+            for entry_id, score in matches
+        ])
+
     def perform_create(self, serializer):
         user = self.request.user
         course = serializer.validated_data.get('course')
@@ -532,7 +775,57 @@ class EnrollmentViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return Enrollment.objects.filter(student=self.request.user)
+        return (
+            Enrollment.objects.filter(student=self.request.user)
+            .select_related('student', 'course__instructor')
+            .prefetch_related('lesson_progress__lesson')
+        )
+
+    @action(detail=False, methods=['post'])
+    def sync(self, request):
+        """
+        Apply a batch of lesson completion events from the course player and
+        return the resulting progress rather than the whole enrollment.
+        """
+        serializer = LessonProgressSyncSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        course_id = serializer.validated_data['course']
+        events = serializer.validated_data['events']
+
+        enrollment = Enrollment.objects.filter(student=request.user, course_id=course_id).first()
+        if not enrollment:
+            return Response({'detail': 'You are not enrolled in this course.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        lessons = dict(
+            Lesson.objects.filter(module__course_id=course_id, pk__in={event[0] for event in events})
+            .values_list('pk', 'is_published')
+        )
+        # Lessons unpublished or removed while the player was offline cannot be completed.
+        accepted = [
+            (lesson_id, completed, occurred_at)
+            for lesson_id, completed, occurred_at in events
+            if lesson_id in lessons and (lessons[lesson_id] or not completed)
+        ]
+        rejected = sorted({event[0] for event in events} - {event[0] for event in accepted})
+
+        completed, uncompleted = progress.sync_lesson_completions(enrollment, accepted)
+        enrollment.refresh_from_db(fields=['progress', 'completed_lesson_count'])
+        return Response(
+            {
+                'enrollment': enrollment.pk,
+                'course': course_id,
+                'progress': enrollment.progress,
+                'completed_lesson_count': enrollment.completed_lesson_count,
+                'completed': completed,
+                'uncompleted': uncompleted,
+                'rejected': rejected,
+            }
+        )
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context.update(user_course_flags(self.request.user))
+        return context
 
 
 class WishlistViewSet(viewsets.ReadOnlyModelViewSet):
@@ -542,6 +835,11 @@ class WishlistViewSet(viewsets.ReadOnlyModelViewSet):
     def get_queryset(self):
         return Wishlist.objects.filter(student=self.request.user)
 
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context.update(user_course_flags(self.request.user))
+        return context
+
 
 class InstructorAnalyticsView(APIView):
     permission_classes = [IsAuthenticated]
@@ -563,10 +861,8 @@ class InstructorAnalyticsView(APIView):
         else:
             courses = Course.objects.filter(instructor=user)
 
-        courses = courses.prefetch_related(
-            "modules__assignments__submissions",
-            "modules__quizzes__submissions",
-        )
+        ensure_course_stats(courses)
+        courses = courses.select_related("stats")
 
         summary = {
             "total_courses": courses.count(),
@@ -581,16 +877,11 @@ class InstructorAnalyticsView(APIView):
         detailed_courses = []
 
         for course in courses:
-            enrollments = Enrollment.objects.filter(course=course)
-            enrollment_count = enrollments.count()
-            completed_count = enrollments.filter(progress__gte=100).count()
-            avg_progress = enrollments.aggregate(avg=Avg("progress"))["avg"] or 0
-            assignment_submissions = AssignmentSubmission.objects.filter(assignment__module__course=course).count()
-            quiz_submissions = QuizSubmission.objects.filter(quiz__module__course=course)
-            avg_quiz_score = quiz_submissions.aggregate(avg=Avg("score"))["avg"] or 0
-
-            completion_rate = (completed_count / enrollment_count * 100) if enrollment_count else 0
-            revenue = float(course.price) * enrollment_count if course.price else 0.0
+            stats = course.stats
+            enrollment_count = stats.enrollment_count
+            completion_rate = stats.completion_rate
+            avg_quiz_score = stats.average_quiz_score
+            revenue = stats.revenue
 
             summary["total_enrollments"] += enrollment_count
             summary["total_revenue"] += revenue
@@ -605,10 +896,10 @@ class InstructorAnalyticsView(APIView):
                 "status": course.status,
                 "enrollments": enrollment_count,
                 "completion_rate": round(completion_rate, 2),
-                "average_progress": round(avg_progress, 2),
-                "average_quiz_score": round(avg_quiz_score or 0, 2),
-                "assignment_submissions": assignment_submissions,
-                "quiz_submissions": quiz_submissions.count(),
+                "average_progress": round(stats.average_progress, 2),
+                "average_quiz_score": round(avg_quiz_score, 2),
+                "assignment_submissions": stats.assignment_submission_count,
+                "quiz_submissions": stats.quiz_submission_count,
                 "revenue": round(revenue, 2),
                 "updated_at": course.updated_at,
             })
@@ -635,18 +926,26 @@ class AdminAnalyticsView(APIView):
         total_users = User.objects.count()
         total_students = User.objects.filter(role="student").count()
         total_instructors = User.objects.filter(Q(role="instructor") | Q(role="admin")).count()
-        total_courses = Course.objects.count()
-        total_enrollments = Enrollment.objects.count()
-        total_assignments = AssignmentSubmission.objects.count()
-        total_quiz_submissions = QuizSubmission.objects.count()
-
-        revenue = Enrollment.objects.aggregate(
-            total=Sum(models.F("course__price"))
-        )["total"] or 0
+        ensure_course_stats(Course.objects.all())
+        totals = CourseStats.objects.aggregate(
+            courses=Count("pk"),
+            enrollments=Sum("enrollment_count"),
+            assignments=Sum("assignment_submission_count"),
+            quiz_submissions=Sum("quiz_submission_count"),
+            revenue=Sum(
+                models.F("enrollment_count") * models.F("course__price"),
+                output_field=models.DecimalField(),
+            ),
+        )
+        total_courses = totals["courses"]
+        total_enrollments = totals["enrollments"] or 0
+        total_assignments = totals["assignments"] or 0
+        total_quiz_submissions = totals["quiz_submissions"] or 0
+        revenue = totals["revenue"] or 0
 
         category_breakdown = Course.objects.values("category").annotate(
             course_count=Count("id"),
-            enrollments=Count("enrollments"),
+            enrollments=Sum("stats__enrollment_count"),
         ).order_by("-enrollments")[:10]
 
         return Response({
@@ -0,0 +1,157 @@
+"""
+Pagination classes shared by the API apps.
+"""
+import base64
+import json
+from functools import reduce
+from operator import or_
+
+from django.db.models import Q
+from django.utils.encoding import force_str
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(PageNumberPagination):
+    """
+    Page-number pagination with an opt-in keyset (cursor) mode.
+
+    Requests with ``?pagination=cursor`` or a ``?cursor=`` token are paged by
+    seeking on the view's ``cursor_ordering`` (for example
+    ``('-submitted_at', '-id')``), so they never run ``COUNT(*)`` or
+    ``OFFSET`` scans. Everything else keeps the usual page-number behaviour,
+    including searches (``ranked_query_params``): their results are ordered by
+    relevance, which has no keyset to seek on. The last ordering field must be
+    unique so it can break ties.
+    """
+
+    cursor_query_param = 'cursor'
+    mode_query_param = 'pagination'
+    ordering = ('-created_at', '-id')
+    invalid_cursor_message = 'Invalid cursor.'
+    ranked_query_params = (api_settings.SEARCH_PARAM,)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.use_cursor = (
+            self.cursor_query_param in request.query_params
+            or request.query_params.get(self.mode_query_param) == 'cursor'
+        ) and not any(request.query_params.get(param) for param in self.ranked_query_params)
+        if not self.use_cursor:
+            return super().paginate_queryset(queryset, request, view)
+
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.ordering = tuple(getattr(view, 'cursor_ordering', self.ordering))
+        self.model = queryset.model
+
+        values, reverse = self.decode_cursor(request)
+        ordering = self._reversed(self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(self._seek_filter(ordering, values))
+
+        results = list(queryset[:page_size + 1])
+        has_more = len(results) > page_size
+        results = results[:page_size]
+        if reverse:
+            results.reverse()
+            self.has_next, self.has_previous = values is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, values is not None
+        self.page_results = results
+        return results
+
+    def get_paginated_response(self, data):
+        if not self.use_cursor:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['count']['description'] = 'Only present in page-number mode.'
+        return response_schema
+
+    def get_next_link(self):
+        if not self.use_cursor:
+            return super().get_next_link()
+        if not self.has_next or not self.page_results:
+            return None
+        return self._link(self.page_results[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.use_cursor:
+            return super().get_previous_link()
+        if not self.has_previous or not self.page_results:
+            return None
+        return self._link(self.page_results[0], reverse=True)
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token.encode('ascii')).decode('utf-8'))
+            raw_values = payload['v']
+            reverse = bool(payload.get('r'))
+            if len(raw_values) != len(self.ordering):
+                raise ValueError
+            values = [
+                self._field(name).to_python(raw)
+                for name, raw in zip(self._field_names(self.ordering), raw_values)
+            ]
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+        return values, reverse
+
+    def encode_cursor(self, values, reverse):
+        payload = {'v': [None if value is None else force_str(value) for value in values]}
+        if reverse:
+            payload['r'] = 1
+        data = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+        return base64.urlsafe_b64encode(data).decode('ascii')
+
+    def _link(self, instance, reverse):
+        values = [getattr(instance, self._field(name).attname) for name in self._field_names(self.ordering)]
+        url = remove_query_param(self.base_url, self.mode_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(values, reverse))
+
+    def _seek_filter(self, ordering, values):
+        """Lexicographic "comes after ``values``" filter for ``ordering``."""
+        clauses = []
+        for index, term in enumerate(ordering):
+            name = term.lstrip('-')
+            lookup = 'lt' if term.startswith('-') else 'gt'
+            equal = {field.lstrip('-'): value for field, value in zip(ordering[:index], values[:index])}
+            clauses.append(Q(**equal) & Q(**{f'{name}__{lookup}': values[index]}))
+        return reduce(or_, clauses)
+
+    def _field(self, name):
+        return self.model._meta.get_field(name)
+
+    @staticmethod
+    def _field_names(ordering):
+        return [term.lstrip('-') for term in ordering]
+
+    @staticmethod
+    def _reversed(ordering):
+        return tuple(term[1:] if term.startswith('-') else f'-{term}' for term in ordering)
+
+
+class GradebookPagination(KeysetPagination):
+    """Pages of gradebook rows (course enrollments); larger by default, since each row is one student."""
+
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = ('enrolled_at', 'id')
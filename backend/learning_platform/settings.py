@@ -79,6 +79,9 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # A file rather than shared-cache memory, so concurrent test writers
+        # wait for SQLite's lock instead of failing with "table is locked".
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
@@ -161,3 +164,7 @@ CORS_ALLOWED_ORIGINS = [
 
 CORS_ALLOW_CREDENTIALS = True
 
+
+# Player heartbeats are buffered per process and written in batches.
+PLAYBACK_FLUSH_INTERVAL = 5  # seconds; 0 disables the background flush
+PLAYBACK_BUFFER_SIZE = 10000  # pending (enrollment, lesson) pairs
@@ -71,6 +71,9 @@ class Message(models.Model):
 
     class Meta:
         ordering = ["created_at"]
+        indexes = [
+            models.Index(fields=["conversation", "created_at", "id"], name="message_conv_created_idx"),
+        ]
 
     def __str__(self):
         return f"Message #{self.pk} from {self.sender}"
@@ -6,6 +6,7 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
 from accounts.models import User
+from learning_platform.pagination import KeysetPagination
 from courses.models import Enrollment
 from .models import Conversation, ConversationParticipant, Message, MessageRead
 from .serializers import (
@@ -114,6 +115,8 @@ class ConversationViewSet(viewsets.ModelViewSet):
 class MessageViewSet(viewsets.ModelViewSet):
     serializer_class = MessageSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    cursor_ordering = ("created_at", "id")
 
     def get_queryset(self):
         conversation_id = self.request.query_params.get("conversation")
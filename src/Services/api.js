@@ -170,6 +170,16 @@ export const coursesAPI = {
     const response = await api.delete(`/courses/${id}/remove_from_wishlist/`);
     return response.data;
   },
+
+  gradebook: async (id, params = {}) => {
+    const response = await api.get(`/courses/${id}/gradebook/`, { params });
+    return response.data;
+  },
+
+  exportGradebook: async (id) => {
+    const response = await api.get(`/courses/${id}/gradebook/export/`, { responseType: 'blob' });
+    return response.data;
+  },
 };
 
 export const modulesAPI = {
@@ -216,6 +226,13 @@ export const lessonsAPI = {
     const response = await api.post(`/lessons/${id}/uncomplete/`);
     return response.data;
   },
+  getPlayback: async (id) => {
+    const response = await api.get(`/lessons/${id}/playback/`);
+    return response.data;
+  },
+  heartbeat: async (id, positionSeconds) => {
+    await api.post(`/lessons/${id}/playback/`, { position_seconds: Math.floor(positionSeconds) });
+  },
 };
 
 export const assignmentsAPI = {
@@ -286,6 +303,14 @@ export const assignmentSubmissionsAPI = {
     const response = await api.post(`/assignment-submissions/${id}/set_status/`, { status });
     return response.data;
   },
+  bulkGrade: async (submissions) => {
+    const response = await api.post('/assignment-submissions/bulk-grade/', { submissions });
+    return response.data;
+  },
+  exportCsv: async (params = {}) => {
+    const response = await api.get('/assignment-submissions/export/', { params, responseType: 'blob' });
+    return response.data;
+  },
 };
 
 export const questionBankAPI = {
@@ -324,6 +349,14 @@ export const quizzesAPI = {
     const response = await api.delete(`/quizzes/${id}/`);
     return response.data;
   },
+  generate: async (payload) => {
+    const response = await api.post('/quizzes/generate/', payload);
+    return response.data;
+  },
+  variant: async (id) => {
+    const response = await api.get(`/quizzes/${id}/variant/`);
+    return response.data;
+  },
 };
 
 export const quizSubmissionsAPI = {
@@ -339,6 +372,10 @@ export const quizSubmissionsAPI = {
     const response = await api.post('/quiz-submissions/', payload);
     return response.data;
   },
+  exportCsv: async (params = {}) => {
+    const response = await api.get('/quiz-submissions/export/', { params, responseType: 'blob' });
+    return response.data;
+  },
 };
 
 export const analyticsAPI = {
@@ -358,6 +395,16 @@ export const enrollmentsAPI = {
     const response = await api.get('/enrollments/');
     return response.data;
   },
+  // events: [{ lesson, completed, occurred_at }], e.g. queued while offline.
+  syncProgress: async (courseId, events) => {
+    const response = await api.post('/enrollments/sync/', { course: courseId, events });
+    return response.data;
+  },
+  markComplete: async (courseId, lessonId) => {
+    return enrollmentsAPI.syncProgress(courseId, [
+      { lesson: lessonId, completed: true, occurred_at: new Date().toISOString() },
+    ]);
+  },
 };
 
 // Wishlist API
@@ -37,8 +37,8 @@ export default function EnhancedCoursePlayer() {
 
   const markContentComplete = async (contentId) => {
     try {
-      await enrollmentsAPI.markComplete(courseId, contentId);
-      setProgress(prev => Math.min(prev + (100 / course.contents.length), 100));
+      const delta = await enrollmentsAPI.markComplete(courseId, contentId);
+      setProgress(delta.progress);
     } catch (error) {
       console.error('Error marking content complete:', error);
     }
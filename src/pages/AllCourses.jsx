@@ -12,7 +12,7 @@ export default function AllCourses() {
     useEffect(() => {
         const fetchCourses = async () => {
             try {
-                const params = {};
+                const params = { expand: "description" };
                 if (selectedCategory !== "All") {
                     params.category = selectedCategory;
                 }
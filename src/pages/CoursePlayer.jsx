@@ -5,6 +5,7 @@ import {
   lessonsAPI,
   assignmentSubmissionsAPI,
   quizSubmissionsAPI,
+  quizzesAPI,
   enrollmentsAPI,
   API_ORIGIN,
 } from "../Services/api";
@@ -68,6 +69,7 @@ export default function CoursePlayer() {
   const [submissionState, setSubmissionState] = useState({});
   const [quizResponses, setQuizResponses] = useState({});
   const [quizResults, setQuizResults] = useState({});
+  const [quizVariants, setQuizVariants] = useState({});
   const [enrollment, setEnrollment] = useState(null);
   const [completedLessons, setCompletedLessons] = useState(new Set());
   const [loading, setLoading] = useState(true);
@@ -81,6 +83,25 @@ export default function CoursePlayer() {
 
   const progressPercentage = enrollment?.progress ?? 0;
 
+  const loadQuizVariant = async (quiz) => {
+    if (!quiz.variant_strata) return;
+    try {
+      const variant = await quizzesAPI.variant(quiz.id);
+      setQuizVariants((prev) => ({
+        ...prev,
+        [quiz.id]: variant.questions.map((question) => question.id),
+      }));
+    } catch (error) {
+      console.error("Failed to load quiz variant", error);
+    }
+  };
+
+  const questionsForAttempt = (quiz) => {
+    const questionIds = quizVariants[quiz.id];
+    const questions = quiz.questions || [];
+    return questionIds ? questions.filter((question) => questionIds.includes(question.id)) : questions;
+  };
+
   const loadQuizResults = async (courseData) => {
     if (!courseData?.modules) {
       setQuizResults({});
@@ -95,6 +116,7 @@ export default function CoursePlayer() {
     const prefillResponses = {};
     await Promise.all(
       quizzes.map(async (quiz) => {
+        await loadQuizVariant(quiz);
         try {
           const response = await quizSubmissionsAPI.list({ quiz: quiz.id });
           const submissions = Array.isArray(response) ? response : response.results || [];
@@ -226,7 +248,7 @@ export default function CoursePlayer() {
   const handleQuizSubmit = async (quiz) => {
     const quizId = quiz.id;
     const responsePayload = quizResponses[quizId] || {};
-    const unanswered = (quiz.questions || []).filter((question) => {
+    const unanswered = questionsForAttempt(quiz).filter((question) => {
       const answer = responsePayload[question.id];
       if (!answer) return true;
       if (question.question_type === "short_answer") {
@@ -243,7 +265,7 @@ export default function CoursePlayer() {
 
     try {
       const submission = await quizSubmissionsAPI.submit({
-        quiz: quizId,
+        quiz_id: quizId,
         answers: responsePayload,
       });
       setQuizResults((prev) => ({
@@ -254,6 +276,7 @@ export default function CoursePlayer() {
         ...prev,
         [quizId]: {},
       }));
+      await loadQuizVariant(quiz);
       setFeedbackMessage("Quiz submitted! Great job.");
       setTimeout(() => setFeedbackMessage(""), 2500);
     } catch (error) {
@@ -566,8 +589,8 @@ export default function CoursePlayer() {
                           </div>
 
                           <div className="space-y-4">
-                            {quiz.questions && quiz.questions.length > 0 ? (
-                              quiz.questions.map((question) => {
+                            {questionsForAttempt(quiz).length > 0 ? (
+                              questionsForAttempt(quiz).map((question) => {
                                 const savedAnswer = answerMap[question.id];
                                 const currentChoice =
                                   responses[question.id]?.choice ?? savedAnswer?.selected_choice ?? null;
@@ -692,7 +715,7 @@ export default function CoursePlayer() {
                                 </span>
                               </div>
                               <div className="space-y-2 text-sm">
-                                {quiz.questions.map((question) => {
+                                {quiz.questions.filter((question) => answerMap[question.id]).map((question) => {
                                   const reviewAnswer = answerMap[question.id];
                                   const selectedChoiceId = reviewAnswer?.selected_choice;
                                   const selectedChoice = (question.choices || []).find(
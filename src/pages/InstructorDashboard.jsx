@@ -202,7 +202,7 @@ export default function InstructorDashboard() {
   };
 
   const loadCourses = async (currentUser) => {
-    const response = await coursesAPI.getAll();
+    const response = await coursesAPI.getAll({ expand: "description,status,updated_at" });
     const list = Array.isArray(response) ? response : response.results || [];
     const instructorCourses = list.filter(
       (course) => course.instructor?.id === currentUser.id || currentUser.role === "admin"
@@ -109,7 +109,7 @@ export default function ManageCourses() {
   const loadCourses = async () => {
     try {
       setLoading(true);
-      const data = await coursesAPI.getAll();
+      const data = await coursesAPI.getAll({ expand: "modules,description,status,estimated_hours,created_at" });
       const list = Array.isArray(data) ? data : data.results || [];
       const instructorCourses = list.filter(
         (course) => course.instructor?.id === user?.id || user?.role === "admin"
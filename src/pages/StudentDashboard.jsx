@@ -44,7 +44,7 @@ export default function StudentDashboard() {
     const loadCourses = async () => {
       try {
         setLoading(true);
-        const rawCourses = await coursesAPI.getAll();
+        const rawCourses = await coursesAPI.getAll({ expand: "description" });
         const list = Array.isArray(rawCourses) ? rawCourses : rawCourses.results || [];
 
         let enrollments = [];